@@ -4,19 +4,65 @@ Provides singleton instances of services to be shared across blueprints
 """
 import sys
 import os
+import atexit
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from database.db_manager import CSVDatabase
+from database.sqlite_db import SQLiteDatabase
+from database.action_db import ActionAuditQueue
+from database.conversation_db import ConversationDB, MessageDB, TranscriptCache
+from backend.utils.config import Config
+from backend.utils.http_client import http_clients
 from backend.services.auth_service import AuthService
+from backend.services.session_store import create_session_store
 from backend.services.llm_service import LLMService
 from backend.services.stt_service import STTService
 from backend.services.tts_service import TTSService
+from backend.services.tts_prefetcher import TTSPrefetcher
 from backend.services.vocab_service import VocabService
 
-db = CSVDatabase()
+if Config.DB_BACKEND == 'sqlite':
+    db = SQLiteDatabase(Config.SQLITE_PATH)
+else:
+    db = CSVDatabase(cache=Config.DB_CACHE)
 
-auth_service = AuthService(db)
-llm_service = LLMService(db)
-stt_service = STTService(db)
-tts_service = TTSService(db)
-vocab_service = VocabService(db)
+audit_queue = None
+if Config.AUDIT_MODE == 'async':
+    audit_queue = ActionAuditQueue(
+        db,
+        max_size=Config.AUDIT_QUEUE_SIZE,
+        batch_size=Config.AUDIT_BATCH_SIZE,
+        flush_interval=Config.AUDIT_FLUSH_INTERVAL
+    )
+    atexit.register(audit_queue.close)
+
+transcript_cache = None
+if Config.MESSAGE_CACHE_SIZE > 0:
+    transcript_cache = TranscriptCache(Config.MESSAGE_CACHE_SIZE, Config.MESSAGE_CACHE_TTL)
+
+# Registered before the services so the shared HTTP pools are closed last
+atexit.register(http_clients.close)
+
+conversation_db = ConversationDB(db)
+message_db = MessageDB(db, transcript_cache)
+
+# Printed on import, so workers started by gunicorn/uvicorn show them too
+for warning in Config.multi_worker_warnings():
+    print(f"Warning: {warning}")
+
+session_store = create_session_store()
+session_store.start_sweeper(Config.SESSION_SWEEP_INTERVAL)
+atexit.register(session_store.close)
+
+auth_service = AuthService(db, session_store=session_store)
+llm_service = LLMService(db, audit_queue)
+stt_service = STTService(db, audit_queue)
+tts_service = TTSService(db, audit_queue)
+tts_prefetcher = TTSPrefetcher(
+    tts_service,
+    Config.TTS_PREFETCH_MODES,
+    max_workers=Config.TTS_PREFETCH_WORKERS,
+    max_pending=Config.TTS_PREFETCH_QUEUE
+)
+atexit.register(tts_prefetcher.close)
+vocab_service = VocabService(db, audit_queue)
@@ -0,0 +1,260 @@
+"""
+ASGI entry point (async serving mode)
+
+    uvicorn backend.asgi:app --host 127.0.0.1 --port 5000
+
+The endpoints that mostly wait on third-party APIs are served natively on
+the event loop, using the services' async variants:
+
+    POST /api/conversation/message/send    (text and audio messages)
+    GET  /api/conversation/message/tts/<id>
+    POST /api/vocab/lookup
+
+While one of these waits for the LLM, ElevenLabs or the Dictionary API no
+thread is held, so a single process can keep hundreds of them in flight.
+They share their validation and responses with the Flask routes
+(backend/routes/common.py), whose blocking helpers run on the bounded
+storage executor (ASYNC_STORAGE_WORKERS). Every other request is passed to the Flask app
+through asgiref's WSGI adapter and behaves exactly as under `python -m
+backend.main`.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import re
+from io import BytesIO
+from typing import Dict, Optional
+
+from werkzeug.formparser import parse_form_data
+from werkzeug.wrappers import Request
+
+from backend.main import app as flask_app
+from backend.app_context import auth_service, llm_service, stt_service, tts_service, tts_prefetcher, vocab_service
+from backend.routes.common import (error, bearer_token, parse_text_message, start_text_message,
+                                   finish_text_message, parse_audio_message, transcript_response,
+                                   get_owned_ai_message, tts_response, parse_lookup, lookup_response)
+from backend.utils.async_storage import run_storage
+from backend.utils.http_client import http_clients
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    ASGIREF_AVAILABLE = True
+except ImportError:
+    ASGIREF_AVAILABLE = False
+    print("Warning: asgiref not installed. Only the async endpoints will work under ASGI.")
+
+class ASGIRequest:
+    """The parts of an HTTP request the async handlers need"""
+    
+    def __init__(self, scope: Dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope.get('headers', [])
+        }
+        self.body = body
+    
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('content-type', '')
+    
+    def get_json(self) -> Optional[Dict]:
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            return None
+    
+    def get_form(self):
+        """Parse a multipart body; returns (form, files) like request.form / request.files"""
+        environ = {
+            'REQUEST_METHOD': self.method,
+            'CONTENT_TYPE': self.content_type,
+            'CONTENT_LENGTH': str(len(self.body)),
+            'wsgi.input': BytesIO(self.body)
+        }
+        _, form, files = parse_form_data(environ)
+        return form, files
+    
+    def session_token(self) -> Optional[str]:
+        """Token from the Authorization header, or from the Flask session cookie"""
+        token = self.headers.get('authorization')
+        if not token:
+            # Let Flask's session interface read its own cookie
+            environ = {
+                'REQUEST_METHOD': self.method,
+                'PATH_INFO': self.path,
+                'HTTP_COOKIE': self.headers.get('cookie', '')
+            }
+            session = flask_app.session_interface.open_session(flask_app, Request(environ))
+            token = session.get('token') if session is not None else None
+        return bearer_token(token)
+
+async def get_current_user(request: ASGIRequest):
+    token = request.session_token()
+    if not token:
+        return None
+    if auth_service.tokens.is_signed(token):
+        return auth_service.authenticate(token)
+    return await run_storage(auth_service.authenticate, token)
+
+async def send_message(request: ASGIRequest):
+    user = await get_current_user(request)
+    if not user:
+        return error('Unauthorized', 401)
+    
+    if 'multipart/form-data' in request.content_type:
+        return await handle_audio_message(request, user)
+    
+    conversation, message_text, error_response = await run_storage(
+        parse_text_message, user, request.get_json()
+    )
+    if error_response:
+        return error_response
+    
+    user_msg, history = await run_storage(start_text_message, conversation, message_text)
+    
+    llm_result = await llm_service.achat_completion(
+        messages=[{"role": "user", "content": message_text}],
+        conversation_history=history,
+        conversation_id=conversation.ConversationID
+    )
+    
+    return await run_storage(finish_text_message, user, conversation, user_msg, llm_result)
+
+async def handle_audio_message(request: ASGIRequest, user):
+    """Handle audio message (Speech-to-Text)"""
+    form, files = request.get_form()
+    audio_content, audio_format, error_response = await run_storage(
+        parse_audio_message, user, form, files
+    )
+    if error_response:
+        return error_response
+    
+    stt_result = await stt_service.atranscribe_audio(audio_content, audio_format)
+    
+    return transcript_response(stt_result)
+
+async def text_to_speech(request: ASGIRequest, message_id: str):
+    """Convert AI message to speech"""
+    user = await get_current_user(request)
+    if not user:
+        return error('Unauthorized', 401)
+    
+    ai_msg, conversation, error_response = await run_storage(
+        get_owned_ai_message, user, int(message_id)
+    )
+    if error_response:
+        return error_response
+    
+    await tts_prefetcher.aclaim(conversation.ConversationID, conversation.Mode, ai_msg.Message)
+    tts_result = await tts_service.asynthesize_speech(ai_msg.Message)
+    
+    return await run_storage(tts_response, tts_result)
+
+async def lookup(request: ASGIRequest):
+    """Tra cứu từ vựng"""
+    user = await get_current_user(request)
+    if not user:
+        return error('Unauthorized', 401)
+    
+    word, error_response = parse_lookup(request.get_json())
+    if error_response:
+        return error_response
+    
+    result = await vocab_service.alookup_word(word, user.UserID)
+    
+    return lookup_response(result)
+
+ROUTES = [
+    ('POST', re.compile(r'^/api/conversation/message/send$'), send_message),
+    ('GET', re.compile(r'^/api/conversation/message/tts/(\d+)$'), text_to_speech),
+    ('POST', re.compile(r'^/api/vocab/lookup$'), lookup),
+]
+
+class AsyncApp:
+    """Serves ROUTES on the event loop and everything else through the Flask app"""
+    
+    def __init__(self, wsgi_app):
+        self.fallback = WsgiToAsgi(wsgi_app) if ASGIREF_AVAILABLE else None
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        
+        if scope['type'] == 'http':
+            for method, pattern, handler in ROUTES:
+                match = pattern.match(scope['path'])
+                if match and scope['method'] == method:
+                    return await self.handle(handler, match.groups(), scope, receive, send)
+        
+        if self.fallback:
+            return await self.fallback(scope, receive, send)
+        
+        await self.send_json(send, scope, {
+            'success': False,
+            'error': 'asgiref not installed. Run: pip install asgiref'
+        }, 501)
+    
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await http_clients.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def handle(self, handler, args, scope, receive, send):
+        # Same limit Flask applies to the requests it serves
+        max_length = flask_app.config.get('MAX_CONTENT_LENGTH')
+        request = ASGIRequest(scope, b'')
+        try:
+            declared = int(request.headers.get('content-length', 0))
+        except ValueError:
+            declared = 0
+        if max_length and declared > max_length:
+            return await self.send_json(send, scope, *error('Request too large', 413))
+        
+        chunks = []
+        received = 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            received += len(chunk)
+            if max_length and received > max_length:
+                return await self.send_json(send, scope, *error('Request too large', 413))
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        request.body = b''.join(chunks)
+        
+        try:
+            data, status = await handler(request, *args)
+        except Exception as e:
+            data, status = {'success': False, 'error': str(e)}, 500
+        await self.send_json(send, scope, data, status)
+    
+    async def send_json(self, send, scope, data: Dict, status: int):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode())
+        ]
+        
+        # Same CORS headers flask-cors adds with supports_credentials=True
+        origin = dict(scope.get('headers', [])).get(b'origin')
+        if origin:
+            headers += [
+                (b'access-control-allow-origin', origin),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin')
+            ]
+        
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+app = AsyncApp(flask_app)
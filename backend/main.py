@@ -3,12 +3,16 @@ import os
 
 sys.path.append(os.path.dirname(__file__))
 
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from backend.utils.config import Config
+from backend.utils.http_client import http_clients
+from backend.utils.security import password_hasher
 from backend.routes.auth import auth_bp
-from backend.routes.conversation import conversation_bp
+from backend.routes.common import error
+from backend.routes.conversation import conversation_bp, get_current_user
 from backend.routes.vocab import vocab_bp
+from backend.app_context import audit_queue, auth_service, transcript_cache, tts_service, tts_prefetcher, vocab_service
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FRONTEND_DIR = os.path.join(BASE_DIR, 'frontend')
@@ -17,6 +21,7 @@ app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
 
 app.config['SECRET_KEY'] = Config.SECRET_KEY
 app.config['DEBUG'] = Config.DEBUG
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 
 CORS(app, supports_credentials=True)
 
@@ -24,6 +29,14 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(conversation_bp)
 app.register_blueprint(vocab_bp)
 
+@app.before_request
+def limit_body():
+    # Answer before a route reads the body; its except clause would turn
+    # Flask's RequestEntityTooLarge into a 500
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        data, status = error('Request too large', 413)
+        return jsonify(data), status
+
 @app.route('/')
 def index():
     return send_from_directory(FRONTEND_DIR, 'index.html')
@@ -40,6 +53,34 @@ def serve_static(path):
 def health():
     return {'status': 'ok', 'message': 'English Chat AI is running'}
 
+@app.route('/api/metrics')
+def metrics():
+    """Internal counters; admin accounts only"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    if not user.is_admin():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    return {
+        'audit': audit_queue.stats() if audit_queue else None,
+        'sessions': auth_service.sessions.stats(),
+        'session_users': auth_service.user_cache_stats(),
+        'password_hasher': password_hasher.stats(),
+        'login_throttle': auth_service.throttle.stats(),
+        'signed_tokens': auth_service.tokens.stats(),
+        'transcript_cache': transcript_cache.stats() if transcript_cache else None,
+        'tts_cache': tts_service.audio_cache.stats(),
+        'tts_prefetch': tts_prefetcher.stats(),
+        'dictionary_cache': vocab_service.dictionary_cache.stats(),
+        'dictionary_index': vocab_service.dictionary_index.stats(),
+        'http_pools': http_clients.stats(),
+        'single_flight': {
+            'tts': tts_service.single_flight.stats(),
+            'dictionary': vocab_service.single_flight.stats()
+        }
+    }
+
 if __name__ == '__main__':
     warnings = Config.validate()
     if warnings:
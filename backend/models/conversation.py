@@ -116,3 +116,40 @@ class AIMessage:
             Createtime=data['Createtime'],
             ActionID=data.get('ActionID') if data.get('ActionID') else None
         )
+
+class ConversationSummary:
+    """Rolling summary of the older turns of a conversation"""
+    
+    def __init__(self, ConversationID: int, Summary: str, CoveredMessages: int, Updatetime: str):
+        self.ConversationID = int(ConversationID)
+        self.Summary = Summary
+        self.CoveredMessages = int(CoveredMessages) if CoveredMessages else 0  # Messages folded into Summary
+        self.Updatetime = Updatetime
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary"""
+        return {
+            'ConversationID': self.ConversationID,
+            'Summary': self.Summary,
+            'CoveredMessages': self.CoveredMessages,
+            'Updatetime': self.Updatetime
+        }
+    
+    def to_csv_dict(self) -> Dict:
+        """Convert to dictionary for CSV storage"""
+        return {
+            'ConversationID': str(self.ConversationID),
+            'Summary': self.Summary,
+            'CoveredMessages': str(self.CoveredMessages),
+            'Updatetime': self.Updatetime
+        }
+    
+    @staticmethod
+    def from_csv_dict(data: Dict) -> 'ConversationSummary':
+        """Create ConversationSummary object from CSV dictionary"""
+        return ConversationSummary(
+            ConversationID=data['ConversationID'],
+            Summary=data['Summary'],
+            CoveredMessages=data.get('CoveredMessages'),
+            Updatetime=data['Updatetime']
+        )
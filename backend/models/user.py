@@ -65,3 +65,21 @@ class User:
     def is_active(self) -> bool:
         """Check if user account is active"""
         return self.active
+
+class TokenUser:
+    """The user identity carried by a signed auth token, read without storage"""
+    
+    def __init__(self, UserID: int, RoleID: int, active: bool):
+        self.UserID = int(UserID)
+        self.RoleID = int(RoleID)
+        self.active = bool(active)
+    
+    @staticmethod
+    def from_claims(claims: Dict) -> 'TokenUser':
+        return TokenUser(UserID=claims['uid'], RoleID=claims['rid'], active=claims['act'])
+    
+    def is_admin(self) -> bool:
+        return self.RoleID == 1
+    
+    def is_active(self) -> bool:
+        return self.active
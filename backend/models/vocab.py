@@ -54,3 +54,49 @@ class Vocabulary:
             Audio=data['Audio'],
             Time=data['Time']
         )
+
+class DictionaryEntry:
+    """Dictionary definition shared by every user's lookups of a word"""
+    
+    def __init__(self, Word: str, ActionID: Optional[int], Meaning: str, 
+                 Pronunciation: str, Audio: str, Time: str):
+        self.Word = Word
+        self.ActionID = int(ActionID) if ActionID else None  # Action that fetched the definition
+        self.Meaning = Meaning
+        self.Pronunciation = Pronunciation
+        self.Audio = Audio
+        self.Time = Time
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary"""
+        return {
+            'Word': self.Word,
+            'ActionID': self.ActionID,
+            'Meaning': self.Meaning,
+            'Pronunciation': self.Pronunciation,
+            'Audio': self.Audio,
+            'Time': self.Time
+        }
+    
+    def to_csv_dict(self) -> Dict:
+        """Convert to dictionary for CSV storage"""
+        return {
+            'Word': self.Word,
+            'ActionID': str(self.ActionID) if self.ActionID else '',
+            'Meaning': self.Meaning,
+            'Pronunciation': self.Pronunciation,
+            'Audio': self.Audio,
+            'Time': self.Time
+        }
+    
+    @staticmethod
+    def from_csv_dict(data: Dict) -> 'DictionaryEntry':
+        """Create DictionaryEntry object from CSV dictionary"""
+        return DictionaryEntry(
+            Word=data['Word'],
+            ActionID=data.get('ActionID') if data.get('ActionID') else None,
+            Meaning=data['Meaning'],
+            Pronunciation=data['Pronunciation'],
+            Audio=data['Audio'],
+            Time=data['Time']
+        )
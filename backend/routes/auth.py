@@ -8,6 +8,12 @@ from backend.app_context import auth_service
 # Create blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+def throttled(result):
+    """429 response telling the client when to try again"""
+    response = jsonify(result)
+    response.headers['Retry-After'] = str(int(result['retry_after']))
+    return response, 429
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -30,6 +36,8 @@ def register():
         
         if result['success']:
             return jsonify(result), 201
+        elif result.get('retry_after'):
+            return throttled(result)
         else:
             return jsonify(result), 400
             
@@ -56,11 +64,13 @@ def login():
                 'error': 'Vui lòng điền đầy đủ thông tin'
             }), 400
         
-        result = auth_service.login(tai_khoan, mat_khau)
+        result = auth_service.login(tai_khoan, mat_khau, request.remote_addr)
         
         if result['success']:
             session['token'] = result['token']
             return jsonify(result), 200
+        elif result.get('retry_after'):
+            return throttled(result)
         else:
             return jsonify(result), 401
             
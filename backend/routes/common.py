@@ -0,0 +1,152 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from typing import Dict, Optional
+import base64
+
+from backend.app_context import tts_prefetcher, tts_service, conversation_db, message_db
+from backend.utils.validators import validate_message
+
+# Request handling shared by the Flask routes and the ASGI handlers
+# (backend/asgi.py). Everything here is blocking; the async handlers call
+# these helpers on the storage executor. Responses are (data, status)
+# pairs, which the Flask routes pass through jsonify.
+
+def error(message: str, status: int) -> tuple:
+    return {'success': False, 'error': message}, status
+
+def bearer_token(token: Optional[str]) -> Optional[str]:
+    """Token from an Authorization header value or the session"""
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    return token or None
+
+def parse_text_message(user, data: Optional[Dict]) -> tuple:
+    """Validate a text message request; returns (conversation, text, error_response)"""
+    if not data:
+        return None, None, error('No data provided', 400)
+    
+    conversation_id = data.get('conversation_id')
+    message_text = data.get('message', '').strip()
+    
+    if not conversation_id or not message_text:
+        return None, None, error('Missing required fields', 400)
+    
+    valid, message = validate_message(message_text)
+    if not valid:
+        return None, None, error(message, 400)
+    
+    conversation = conversation_db.get_conversation(conversation_id)
+    if not conversation or conversation.UserID != user.UserID:
+        return None, None, error('Invalid conversation', 403)
+    
+    return conversation, message_text, None
+
+def build_history(conversation_id):
+    """Previous turns of a conversation, excluding the message just saved"""
+    messages = message_db.get_conversation_messages(conversation_id)
+    history = []
+    for msg in messages[:-1]:
+        if msg['type'] == 'user':
+            history.append({"role": "user", "content": msg['message'].Message})
+        else:
+            history.append({"role": "assistant", "content": msg['message'].Message})
+    return history
+
+def start_text_message(conversation, message_text: str) -> tuple:
+    """Save the user message; returns (user_msg, history) for the LLM call"""
+    user_msg = message_db.create_user_message(conversation.ConversationID, message_text)
+    return user_msg, build_history(conversation.ConversationID)
+
+def finish_text_message(user, conversation, user_msg, llm_result: Dict) -> tuple:
+    """Save the AI reply and queue its audio"""
+    if not llm_result['success']:
+        return error(llm_result['error'], 500)
+    
+    ai_msg = message_db.create_ai_message(
+        conversation.ConversationID,
+        llm_result['response'],
+        llm_result.get('action_id')
+    )
+    tts_prefetcher.prefetch(conversation.ConversationID, user.UserID, conversation.Mode, ai_msg.Message)
+    
+    return {
+        'success': True,
+        'user_message': user_msg.to_dict(),
+        'ai_message': ai_msg.to_dict()
+    }, 200
+
+def parse_audio_message(user, form, files) -> tuple:
+    """Validate an audio message upload; returns (audio_content, audio_format, error_response)"""
+    conversation_id = form.get('conversation_id')
+    audio_file = files.get('audio')
+    
+    if not conversation_id or not audio_file:
+        return None, None, error('Missing required fields', 400)
+    
+    conversation = conversation_db.get_conversation(int(conversation_id))
+    if not conversation or conversation.UserID != user.UserID:
+        return None, None, error('Invalid conversation', 403)
+    
+    audio_content = audio_file.read()
+    
+    audio_format = audio_file.filename.split('.')[-1] if '.' in audio_file.filename else 'wav'
+    
+    return audio_content, audio_format, None
+
+def transcript_response(stt_result: Dict) -> tuple:
+    if not stt_result['success']:
+        return error(stt_result['error'], 500)
+    
+    return {
+        'success': True,
+        'transcript': stt_result['transcript'],
+        'action_id': stt_result.get('action_id')
+    }, 200
+
+def get_owned_ai_message(user, message_id: int) -> tuple:
+    """AI message of one of the user's conversations; returns (ai_msg, conversation, error_response)"""
+    ai_msg = message_db.get_ai_message(message_id)
+    if not ai_msg:
+        return None, None, error('Message not found', 404)
+    
+    conversation = conversation_db.get_conversation(ai_msg.ConversationID)
+    if not conversation or conversation.UserID != user.UserID:
+        return None, None, error('Forbidden', 403)
+    
+    return ai_msg, conversation, None
+
+def tts_response(tts_result: Dict) -> tuple:
+    """Read the synthesized audio as base64 and unpin it"""
+    if not tts_result['success']:
+        return error(tts_result['error'], 500)
+    
+    try:
+        audio_content = tts_service.get_audio_content(tts_result['audio_path'])
+    finally:
+        tts_service.release_audio(tts_result)
+    
+    if not audio_content:
+        return error('Failed to read audio file', 500)
+    
+    return {
+        'success': True,
+        'audio': base64.b64encode(audio_content).decode('utf-8'),
+        'audio_path': tts_result['audio_path']
+    }, 200
+
+def parse_lookup(data: Optional[Dict]) -> tuple:
+    """Validate a lookup request; returns (word, error_response)"""
+    if not data:
+        return None, error('No data provided', 400)
+    
+    word = data.get('word', '').strip()
+    
+    if not word:
+        return None, error('Word is required', 400)
+    
+    return word, None
+
+def lookup_response(result: Dict) -> tuple:
+    return result, 200 if result['success'] else 400
@@ -2,27 +2,25 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from flask import Blueprint, request, jsonify, session
-from backend.app_context import auth_service, llm_service, stt_service, tts_service, db
-from database.conversation_db import ConversationDB, MessageDB
-from backend.utils.validators import validate_message
-import base64
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context, send_file
+from backend.app_context import auth_service, llm_service, stt_service, tts_service, tts_prefetcher, conversation_db, message_db
+from backend.routes.common import (bearer_token, parse_text_message, start_text_message,
+                                   finish_text_message, parse_audio_message, transcript_response,
+                                   get_owned_ai_message, tts_response)
+from backend.services.speech_pipeline import SpeechPipeline
+from backend.utils.config import Config
+import json
+import re
 
 conversation_bp = Blueprint('conversation', __name__, url_prefix='/api/conversation')
 
-conversation_db = ConversationDB(db)
-message_db = MessageDB(db)
-
 def get_current_user():
     """Helper function to get current user from session"""
-    token = request.headers.get('Authorization') or session.get('token')
+    token = bearer_token(request.headers.get('Authorization') or session.get('token'))
     if not token:
         return None
     
-    if token.startswith('Bearer '):
-        token = token[7:]
-    
-    return auth_service.verify_session(token)
+    return auth_service.authenticate(token)
 
 @conversation_bp.route('/new', methods=['POST'])
 def new_conversation():
@@ -39,6 +37,9 @@ def new_conversation():
         
         conversation = conversation_db.create_conversation(user.UserID, mode)
         
+        # The user has moved on; stop preparing audio for their other conversations
+        tts_prefetcher.cancel_user(user.UserID, keep_conversation_id=conversation.ConversationID)
+        
         return jsonify({
             'success': True,
             'conversation': conversation.to_dict()
@@ -79,6 +80,8 @@ def get_conversation(conversation_id):
         if conversation.UserID != user.UserID:
             return jsonify({'success': False, 'error': 'Forbidden'}), 403
         
+        tts_prefetcher.cancel_user(user.UserID, keep_conversation_id=conversation_id)
+        
         # Get messages
         messages = message_db.get_conversation_messages(conversation_id)
         
@@ -114,83 +117,125 @@ def send_message():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 def handle_text_message(user):
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'success': False, 'error': 'No data provided'}), 400
-    
-    conversation_id = data.get('conversation_id')
-    message_text = data.get('message', '').strip()
-    
-    if not conversation_id or not message_text:
-        return jsonify({'success': False, 'error': 'Missing required fields'}), 400
-    
-    valid, error = validate_message(message_text)
-    if not valid:
-        return jsonify({'success': False, 'error': error}), 400
+    conversation, message_text, error_response = parse_text_message(user, request.get_json())
+    if error_response:
+        return jsonify(error_response[0]), error_response[1]
     
-    conversation = conversation_db.get_conversation(conversation_id)
-    if not conversation or conversation.UserID != user.UserID:
-        return jsonify({'success': False, 'error': 'Invalid conversation'}), 403
-    
-    user_msg = message_db.create_user_message(conversation_id, message_text)
-    
-    messages = message_db.get_conversation_messages(conversation_id)
-    history = []
-    for msg in messages[:-1]:
-        if msg['type'] == 'user':
-            history.append({"role": "user", "content": msg['message'].Message})
-        else:
-            history.append({"role": "assistant", "content": msg['message'].Message})
+    user_msg, history = start_text_message(conversation, message_text)
     
     llm_result = llm_service.chat_completion(
         messages=[{"role": "user", "content": message_text}],
-        conversation_history=history
+        conversation_history=history,
+        conversation_id=conversation.ConversationID
     )
     
-    if not llm_result['success']:
-        return jsonify({'success': False, 'error': llm_result['error']}), 500
-    
-    ai_msg = message_db.create_ai_message(
-        conversation_id,
-        llm_result['response'],
-        llm_result.get('action_id')
-    )
+    data, status = finish_text_message(user, conversation, user_msg, llm_result)
+    return jsonify(data), status
+
+def sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def audio_event(segment: dict) -> str:
+    if not segment['success']:
+        return sse_event({'type': 'audio_error', 'index': segment['index'], 'error': segment['error']})
     
-    return jsonify({
-        'success': True,
-        'user_message': user_msg.to_dict(),
-        'ai_message': ai_msg.to_dict()
-    }), 200
+    return sse_event({
+        'type': 'audio',
+        'index': segment['index'],
+        'text': segment['text'],
+        'url': f"{conversation_bp.url_prefix}/audio/{segment['cache_key']}"
+    })
 
-def handle_audio_message(user):
-    """Handle audio message (Speech-to-Text)"""
-    conversation_id = request.form.get('conversation_id')
-    audio_file = request.files.get('audio')
+@conversation_bp.route('/message/stream', methods=['POST'])
+def stream_message():
+    """
+    Send a text message and relay the AI reply as server-sent events.
     
-    if not conversation_id or not audio_file:
-        return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+    Events: 'user_message' once the user message is saved, 'token' for each
+    piece of the reply, then 'done' with the saved AI message, or 'error'.
     
-    conversation = conversation_db.get_conversation(int(conversation_id))
-    if not conversation or conversation.UserID != user.UserID:
-        return jsonify({'success': False, 'error': 'Invalid conversation'}), 403
+    With "speak": true in the body, each sentence is also synthesized as soon
+    as it is complete and announced, in order, by an 'audio' event whose url
+    serves the segment (or an 'audio_error' event if synthesis failed).
+    """
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        conversation, message_text, error_response = parse_text_message(user, request.get_json())
+        if error_response:
+            return jsonify(error_response[0]), error_response[1]
+        
+        conversation_id = conversation.ConversationID
+        speak = bool(request.get_json().get('speak'))
+        
+        user_msg, history = start_text_message(conversation, message_text)
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
     
-    audio_content = audio_file.read()
+    def generate():
+        yield sse_event({'type': 'user_message', 'user_message': user_msg.to_dict()})
+        
+        pipeline = SpeechPipeline(tts_service, Config.TTS_PIPELINE_WORKERS) if speak else None
+        try:
+            for event in llm_service.stream_chat_completion(
+                messages=[{"role": "user", "content": message_text}],
+                conversation_history=history,
+                conversation_id=conversation_id
+            ):
+                if event['type'] == 'token':
+                    yield sse_event(event)
+                    if pipeline:
+                        pipeline.feed(event['content'])
+                        for segment in pipeline.ready():
+                            yield audio_event(segment)
+                elif event['type'] == 'error':
+                    yield sse_event(event)
+                    return
+                elif event['type'] == 'done':
+                    # Persist only the complete reply
+                    ai_msg = message_db.create_ai_message(
+                        conversation_id,
+                        event['response'],
+                        event.get('action_id')
+                    )
+                    if not pipeline:
+                        # Spoken replies are already being synthesized sentence by sentence
+                        tts_prefetcher.prefetch(conversation_id, user.UserID, conversation.Mode, ai_msg.Message)
+                    yield sse_event({'type': 'done', 'ai_message': ai_msg.to_dict()})
+            
+            if pipeline:
+                pipeline.finish()
+                for segment in pipeline.drain():
+                    yield audio_event(segment)
+        except Exception as e:
+            print(f"Error streaming message: {e}")
+            yield sse_event({'type': 'error', 'error': str(e)})
+        finally:
+            if pipeline:
+                pipeline.close()
     
-    audio_format = audio_file.filename.split('.')[-1] if '.' in audio_file.filename else 'wav'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def handle_audio_message(user):
+    """Handle audio message (Speech-to-Text)"""
+    audio_content, audio_format, error_response = parse_audio_message(user, request.form, request.files)
+    if error_response:
+        return jsonify(error_response[0]), error_response[1]
     
     stt_result = stt_service.transcribe_audio(audio_content, audio_format)
     
-    if not stt_result['success']:
-        return jsonify({'success': False, 'error': stt_result['error']}), 500
-    
-    transcript = stt_result['transcript']
-    
-    return jsonify({
-        'success': True,
-        'transcript': transcript,
-        'action_id': stt_result.get('action_id')
-    }), 200
+    data, status = transcript_response(stt_result)
+    return jsonify(data), status
 
 @conversation_bp.route('/message/tts/<int:message_id>', methods=['GET'])
 def text_to_speech(message_id):
@@ -200,30 +245,83 @@ def text_to_speech(message_id):
         if not user:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        ai_msg = message_db.get_ai_message(message_id)
-        if not ai_msg:
-            return jsonify({'success': False, 'error': 'Message not found'}), 404
-        
-        conversation = conversation_db.get_conversation(ai_msg.ConversationID)
-        if not conversation or conversation.UserID != user.UserID:
-            return jsonify({'success': False, 'error': 'Forbidden'}), 403
+        ai_msg, conversation, error_response = get_owned_ai_message(user, message_id)
+        if error_response:
+            return jsonify(error_response[0]), error_response[1]
         
+        # Join a background synthesis of this reply if one is running
+        tts_prefetcher.claim(conversation.ConversationID, conversation.Mode, ai_msg.Message)
         tts_result = tts_service.synthesize_speech(ai_msg.Message)
         
+        data, status = tts_response(tts_result)
+        return jsonify(data), status
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@conversation_bp.route('/message/tts/<int:message_id>/stream', methods=['GET'])
+def stream_text_to_speech(message_id):
+    """
+    Convert AI message to speech, returned as binary audio/mpeg.
+    
+    Cached audio is sent as a file with Range support; otherwise audio is
+    relayed from ElevenLabs chunk by chunk while it is being synthesized.
+    Usable directly as an <audio> src, authenticated by the session cookie.
+    """
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        ai_msg, conversation, error_response = get_owned_ai_message(user, message_id)
+        if error_response:
+            return jsonify(error_response[0]), error_response[1]
+        
+        tts_prefetcher.claim(conversation.ConversationID, conversation.Mode, ai_msg.Message)
+        tts_result = tts_service.stream_speech(ai_msg.Message)
+        
         if not tts_result['success']:
             return jsonify({'success': False, 'error': tts_result['error']}), 500
         
-        audio_content = tts_service.get_audio_content(tts_result['audio_path'])
-        if not audio_content:
-            return jsonify({'success': False, 'error': 'Failed to read audio file'}), 500
+        if tts_result['cached']:
+            # send_file opens the file right away, so it can be unpinned here
+            try:
+                return send_file(
+                    tts_result['audio_path'],
+                    mimetype='audio/mpeg',
+                    conditional=True
+                )
+            finally:
+                tts_service.release_audio(tts_result)
         
-        audio_base64 = base64.b64encode(audio_content).decode('utf-8')
+        return Response(
+            stream_with_context(tts_result['stream']),
+            mimetype='audio/mpeg',
+            headers={'Cache-Control': 'no-cache'}
+        )
         
-        return jsonify({
-            'success': True,
-            'audio': audio_base64,
-            'audio_path': tts_result['audio_path']
-        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@conversation_bp.route('/audio/<cache_key>', methods=['GET'])
+def cached_audio(cache_key):
+    """Serve a synthesized segment from the TTS cache by its content hash"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        if not re.match(r'^[0-9a-f]{64}$', cache_key):
+            return jsonify({'success': False, 'error': 'Audio not found'}), 404
+        
+        audio_path = tts_service.audio_cache.acquire(cache_key)
+        if not audio_path:
+            return jsonify({'success': False, 'error': 'Audio not found'}), 404
+        
+        try:
+            return send_file(audio_path, mimetype='audio/mpeg', conditional=True)
+        finally:
+            tts_service.audio_cache.release(cache_key)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2,25 +2,43 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 from backend.app_context import auth_service, vocab_service
+from backend.routes.common import bearer_token, parse_lookup, lookup_response
 
 vocab_bp = Blueprint('vocab', __name__, url_prefix='/api/vocab')
 
 def get_current_user():
     """Helper function to get current user from session"""
-    token = request.headers.get('Authorization') or session.get('token')
+    token = bearer_token(request.headers.get('Authorization') or session.get('token'))
     if not token:
         return None
     
-    if token.startswith('Bearer '):
-        token = token[7:]
-    
-    return auth_service.verify_session(token)
+    return auth_service.authenticate(token)
 
 @vocab_bp.route('/lookup', methods=['POST'])
 def lookup():
     """Tra cứu từ vựng"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        word, error_response = parse_lookup(request.get_json())
+        if error_response:
+            return jsonify(error_response[0]), error_response[1]
+        
+        result = vocab_service.lookup_word(word, user.UserID)
+        
+        data, status = lookup_response(result)
+        return jsonify(data), status
+            
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@vocab_bp.route('/lookup/batch', methods=['POST'])
+def lookup_batch():
+    """Tra cứu nhiều từ trong một request (ví dụ cả tin nhắn AI)"""
     try:
         user = get_current_user()
         if not user:
@@ -31,12 +49,12 @@ def lookup():
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        word = data.get('word', '').strip()
+        words = data.get('words')
         
-        if not word:
-            return jsonify({'success': False, 'error': 'Word is required'}), 400
+        if not isinstance(words, list) or not words:
+            return jsonify({'success': False, 'error': 'Words list is required'}), 400
         
-        result = vocab_service.lookup_word(word, user.UserID)
+        result = vocab_service.lookup_words(words, user.UserID)
         
         if result['success']:
             return jsonify(result), 200
@@ -46,6 +64,24 @@ def lookup():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@vocab_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Gợi ý từ theo tiền tố (autocomplete)"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        prefix = request.args.get('prefix', '').strip()
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        
+        result = vocab_service.suggest_words(prefix, limit)
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @vocab_bp.route('/history', methods=['GET'])
 def history():
     """Lấy lịch sử từ vựng đã tra"""
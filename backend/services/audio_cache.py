@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesized audio files.
+    
+    Files are named tts_<sha256>.<format>, where the hash covers the text,
+    voice, model and format, so the same request always maps to the same
+    file. The directory is kept under max_bytes by deleting the least
+    recently used files; a file that is acquired (being read or sent) is
+    never deleted until it is released.
+    
+    Files named tts_<md5>.<format> by earlier versions hashed the text with
+    a timestamp, so no request can map to them again. They are counted in
+    the size and placed ahead of every other file, to be evicted first.
+    """
+    
+    FILENAME_PATTERN = re.compile(r'^tts_([0-9a-f]{64})\.(\w+)$')
+    LEGACY_FILENAME_PATTERN = re.compile(r'^tts_([0-9a-f]{32})\.(\w+)$')
+    
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        
+        # key -> {'path': str, 'size': int}, least recently used first
+        self._entries = OrderedDict()
+        self._refs = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.legacy_files = 0
+        
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._scan()
+    
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        content = '\x00'.join([text, voice_id, model_id, output_format.lower()])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    def path_for(self, key: str, output_format: str) -> str:
+        return os.path.join(self.cache_dir, f"tts_{key}.{output_format.lower()}")
+    
+    def _scan(self):
+        """Register files left by earlier runs, legacy files then oldest access first"""
+        found = []
+        for filename in os.listdir(self.cache_dir):
+            match = self.FILENAME_PATTERN.match(filename)
+            legacy = False
+            if not match:
+                match = self.LEGACY_FILENAME_PATTERN.match(filename)
+                legacy = True
+                if not match:
+                    continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Legacy keys never equal a sha256 key, so they are never hit
+            key = f"legacy:{filename}" if legacy else match.group(1)
+            found.append((not legacy, stat.st_atime, key, path, stat.st_size))
+        
+        with self._lock:
+            for current, _, key, path, size in sorted(found):
+                self._entries[key] = {'path': path, 'size': size}
+                self.total_bytes += size
+                if not current:
+                    self.legacy_files += 1
+            self._evict()
+    
+    def acquire(self, key: str) -> Optional[str]:
+        """Path of the cached file, pinned until release(key); None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not os.path.exists(entry['path']):
+                # Removed behind our back
+                self.total_bytes -= entry['size']
+                del self._entries[key]
+                entry = None
+            
+            if not entry:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._refs[key] = self._refs.get(key, 0) + 1
+            self.hits += 1
+            return entry['path']
+    
+    def release(self, key: str):
+        with self._lock:
+            count = self._refs.get(key, 0) - 1
+            if count > 0:
+                self._refs[key] = count
+            else:
+                self._refs.pop(key, None)
+                self._evict()
+    
+    def add(self, key: str, path: str, pin: bool = True) -> str:
+        """Register a file written at path, pinned like acquire() unless pin is False"""
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.total_bytes -= old['size']
+            
+            self._entries[key] = {'path': path, 'size': size}
+            self.total_bytes += size
+            if pin:
+                self._refs[key] = self._refs.get(key, 0) + 1
+            self._evict()
+            return path
+    
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if self._refs.get(key):
+                continue
+            
+            entry = self._entries.pop(key)
+            self.total_bytes -= entry['size']
+            self.evictions += 1
+            if key.startswith('legacy:'):
+                self.legacy_files -= 1
+            try:
+                os.remove(entry['path'])
+            except OSError as e:
+                print(f"Error removing cached audio {entry['path']}: {e}")
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'files': len(self._entries),
+                'legacy_files': self.legacy_files,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'in_use': len(self._refs),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
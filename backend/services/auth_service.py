@@ -4,17 +4,46 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from database.db_manager import CSVDatabase
 from database.user_db import UserDB
-from backend.models.user import User
+from backend.models.user import User, TokenUser
 from backend.utils.validators import validate_username, validate_password, validate_name
-from backend.utils.security import generate_session_token
-from typing import Optional, Dict
+from backend.utils.security import generate_session_token, password_hasher, PasswordPoolBusy
+from backend.services.session_store import create_session_store
+from backend.services.login_throttle import LoginThrottle
+from backend.services.signed_tokens import SignedTokens
+from backend.utils.config import Config
+from typing import Optional, Dict, Union
+import threading
+import time
 
 class AuthService:
     """Authentication service"""
     
-    def __init__(self, db: CSVDatabase):
+    def __init__(self, db: CSVDatabase, user_cache_ttl: float = None, session_store=None):
         self.user_db = UserDB(db)
-        self.sessions = {}
+        # token -> UserID (see backend/services/session_store.py)
+        self.sessions = session_store or create_session_store()
+        
+        # user_id -> (User, expires_at): the resolved user shared by that user's
+        # sessions, so verify_session does not read nguoi_dung.csv every request
+        self.user_cache_ttl = Config.SESSION_USER_CACHE_TTL if user_cache_ttl is None else user_cache_ttl
+        self._users = {}
+        self._users_lock = threading.Lock()
+        # Bumped on every invalidation, so a user read before a change is not cached
+        self._users_generation = 0
+        self.user_cache_hits = 0
+        self.user_cache_misses = 0
+        
+        # 'signed': login issues stateless tokens instead of stored sessions
+        self.token_mode = Config.AUTH_TOKEN_MODE
+        self.tokens = SignedTokens(Config.SECRET_KEY, Config.SIGNED_TOKEN_TTL)
+        
+        self.user_db.add_change_listener(self.invalidate_user)
+        
+        self.throttle = LoginThrottle(
+            per_account=Config.LOGIN_RATE_PER_ACCOUNT,
+            per_ip=Config.LOGIN_RATE_PER_IP,
+            window=Config.LOGIN_RATE_WINDOW
+        )
     
     def register(self, tai_khoan: str, mat_khau: str, ho_ten: str) -> Dict:
         valid, error = validate_username(tai_khoan)
@@ -39,17 +68,35 @@ class AuthService:
                 'success': True,
                 'user': user.to_dict()
             }
+        except PasswordPoolBusy:
+            return self._throttled(1)
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def login(self, tai_khoan: str, mat_khau: str) -> Dict:
-        user = self.user_db.verify_login(tai_khoan, mat_khau)
+    def login(self, tai_khoan: str, mat_khau: str, ip: Optional[str] = None) -> Dict:
+        retry_after = self.throttle.check(tai_khoan, ip, backlogged=password_hasher.backlogged())
+        if retry_after:
+            return self._throttled(retry_after)
+        
+        try:
+            user = self.user_db.verify_login(tai_khoan, mat_khau)
+        except PasswordPoolBusy:
+            self.throttle.finish(tai_khoan, ip)
+            return self._throttled(1)
+        except Exception:
+            self.throttle.finish(tai_khoan, ip)
+            raise
+        self.throttle.finish(tai_khoan, ip, failed=not user)
         
         if not user:
             return {'success': False, 'error': 'Username hoặc password không đúng'}
         
-        token = generate_session_token()
-        self.sessions[token] = user.UserID
+        if self.token_mode == 'signed':
+            token = self.tokens.issue(user)
+        else:
+            token = generate_session_token()
+            self.sessions.create(token, user.UserID)
+        self._cache_user(user, self._users_generation)
         
         return {
             'success': True,
@@ -57,17 +104,74 @@ class AuthService:
             'user': user.to_dict()
         }
     
+    def _throttled(self, retry_after: float) -> Dict:
+        return {
+            'success': False,
+            'error': 'Hệ thống đang bận, vui lòng thử lại sau',
+            'retry_after': retry_after
+        }
+    
     def logout(self, token: str) -> Dict:
-        if token in self.sessions:
-            del self.sessions[token]
+        if self.tokens.is_signed(token):
+            self.tokens.revoke(token)
+        else:
+            self.sessions.delete(token)
         
         return {'success': True}
     
+    def authenticate(self, token: str) -> Optional[Union[User, TokenUser]]:
+        """User for a request; signed tokens are checked without touching storage"""
+        if self.tokens.is_signed(token):
+            claims = self.tokens.verify(token)
+            return TokenUser.from_claims(claims) if claims else None
+        
+        user = self.verify_session(token)
+        return user if user and user.is_active() else None
+    
     def verify_session(self, token: str) -> Optional[User]:
-        user_id = self.sessions.get(token)
-        if user_id:
-            return self.user_db.get_user_by_id(user_id)
-        return None
+        if self.tokens.is_signed(token):
+            claims = self.tokens.verify(token)
+            user_id = claims['uid'] if claims else None
+        else:
+            user_id = self.sessions.get(token)
+        if not user_id:
+            return None
+        
+        cached = self._users.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            self.user_cache_hits += 1
+            return cached[0]
+        
+        self.user_cache_misses += 1
+        generation = self._users_generation
+        user = self.user_db.get_user_by_id(user_id)
+        if user:
+            self._cache_user(user, generation)
+        return user
+    
+    def _cache_user(self, user: User, generation: int):
+        if self.user_cache_ttl <= 0:
+            return
+        with self._users_lock:
+            if generation == self._users_generation:
+                self._users[user.UserID] = (user, time.monotonic() + self.user_cache_ttl)
+    
+    def invalidate_user(self, user: User):
+        """Drop the cached user; UserDB calls this when the user is updated"""
+        with self._users_lock:
+            self._users_generation += 1
+            self._users.pop(user.UserID, None)
+        
+        if not user.is_active():
+            self.tokens.revoke_user(user.UserID)
+    
+    def user_cache_stats(self) -> Dict:
+        return {
+            'cached_users': len(self._users),
+            'ttl': self.user_cache_ttl,
+            'hits': self.user_cache_hits,
+            'misses': self.user_cache_misses
+        }
     
     def get_user_from_token(self, token: str) -> Optional[User]:
         return self.verify_session(token)
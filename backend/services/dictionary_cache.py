@@ -0,0 +1,125 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from backend.models.vocab import DictionaryEntry
+from database.vocab_db import DictionaryDB
+
+class DictionaryCache:
+    """
+    Word definitions shared by all users, keyed by normalized word.
+    
+    Entries live in an in-memory LRU of at most max_size words and expire
+    ttl seconds after they were fetched. With a DictionaryDB the cache
+    also has a persistent tier, so definitions survive restarts and are
+    shared between processes.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl: float = 30 * 24 * 3600,
+                 store: Optional[DictionaryDB] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        
+        # word -> (DictionaryEntry, fetched at as a timestamp)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(word: str) -> str:
+        return ' '.join(word.strip().lower().split())
+    
+    def _fetched_at(self, entry: DictionaryEntry) -> float:
+        try:
+            return datetime.strptime(entry.Time, '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            return 0
+    
+    def get(self, word: str) -> Optional[DictionaryEntry]:
+        word = self.normalize(word)
+        now = time.time()
+        
+        with self._lock:
+            cached = self._entries.get(word)
+            if cached and now - cached[1] <= self.ttl:
+                self._entries.move_to_end(word)
+                self.hits += 1
+                return cached[0]
+            if cached:
+                del self._entries[word]
+        
+        if self.store:
+            entry = self.store.get_entry(word)
+            if entry:
+                fetched_at = self._fetched_at(entry)
+                if now - fetched_at <= self.ttl:
+                    with self._lock:
+                        self._remember(word, entry, fetched_at)
+                        self.store_hits += 1
+                    return entry
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, word: str, meaning: str, pronunciation: str, audio: str,
+            action_id: Optional[int] = None) -> DictionaryEntry:
+        entry = DictionaryEntry(
+            Word=self.normalize(word),
+            ActionID=action_id,
+            Meaning=meaning,
+            Pronunciation=pronunciation,
+            Audio=audio,
+            Time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        
+        with self._lock:
+            self._remember(entry.Word, entry, time.time())
+        
+        if self.store:
+            try:
+                self.store.save_entry(entry)
+            except Exception as e:
+                print(f"Error saving dictionary entry: {e}")
+        return entry
+    
+    def definition(self, word: str) -> Optional[DictionaryEntry]:
+        """The stored entry for word whatever its age; for rows that reference it"""
+        word = self.normalize(word)
+        with self._lock:
+            cached = self._entries.get(word)
+            if cached:
+                return cached[0]
+        
+        if self.store:
+            try:
+                return self.store.get_entry(word)
+            except Exception as e:
+                print(f"Error reading dictionary entry: {e}")
+        return None
+    
+    def _remember(self, word: str, entry: DictionaryEntry, fetched_at: float):
+        self._entries[word] = (entry, fetched_at)
+        self._entries.move_to_end(word)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'words': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses
+            }
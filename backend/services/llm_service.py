@@ -3,10 +3,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from backend.utils.config import Config
+from backend.utils.http_client import http_clients
+from backend.utils.async_storage import run_storage
 from database.db_manager import CSVDatabase
-from database.action_db import ActionDB, ThirdPartyAPIDB
-from typing import Dict, Optional
+from database.action_db import ActionDB, ThirdPartyAPIDB, ActionAuditQueue
+from database.conversation_db import ConversationSummaryDB
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Iterator
 import json
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,27 +24,68 @@ except ImportError:
     LITELLM_AVAILABLE = False
     print("Warning: litellm not installed. LLM features will not work.")
 
+SYSTEM_PROMPT = "You are a helpful English conversation teacher. Help the user practice English conversation naturally and provide corrections when needed."
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of an English practice conversation between a "
+    "student and their teacher. Update the summary with the new messages. Keep the "
+    "topics discussed, facts the student shared about themselves, and the mistakes "
+    "they made. Reply with the updated summary only, in under {words} words."
+)
+
 class LLMService:
     """LLM service using LiteLLM"""
     
-    def __init__(self, db: CSVDatabase):
-        self.action_db = ActionDB(db)
+    def __init__(self, db: CSVDatabase, audit_queue: Optional[ActionAuditQueue] = None):
+        self.action_db = ActionDB(db, audit_queue)
         self.api_db = ThirdPartyAPIDB(db)
+        self.summary_db = ConversationSummaryDB(db)
         self.model = Config.LITELLM_MODEL
         self.api_key = Config.LITELLM_API_KEY
         
+        # Prompt budget for conversation history
+        self.context_tokens = Config.LLM_CONTEXT_TOKENS
+        self.history_turns = Config.LLM_HISTORY_TURNS
+        self.summary_chunk = Config.LLM_SUMMARY_CHUNK
+        
+        # Rolling summaries are refreshed off the request path, one at a
+        # time per conversation
+        self._summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='llm-summary')
+        self._summarizing = set()
+        self._summary_lock = threading.Lock()
+        
         # Get API config from database
         self.api_config = self.api_db.get_api_by_type('LLM')
         if not self.api_config:
             print("Warning: LLM API config not found in database")
+        
+        # OpenAI-compatible calls go through the shared pooled client
+        self.timeout = http_clients.settings('LLM')['timeout']
+        if LITELLM_AVAILABLE:
+            litellm.client_session = http_clients.client('LLM')
+            litellm.aclient_session = http_clients.async_client('LLM')
+    
+    def _completion(self, messages: list, **kwargs):
+        # Retries are handled by the shared HTTP client, not the provider SDK
+        return litellm.completion(
+            model=self.model,
+            messages=messages,
+            api_key=self.api_key,
+            timeout=self.timeout,
+            max_retries=0,
+            **kwargs
+        )
     
-    def chat_completion(self, messages: list, conversation_history: list = None) -> Dict:
+    def chat_completion(self, messages: list, conversation_history: list = None, 
+                        conversation_id: Optional[int] = None) -> Dict:
         """
         Get chat completion from LLM
         
         Args:
             messages: Current message (format: [{"role": "user", "content": "text"}])
             conversation_history: Previous messages for context
+            conversation_id: When given, older history is replaced by the
+                conversation's rolling summary to stay within the token budget
         
         Returns:
             Dictionary with response and action_id
@@ -51,67 +98,300 @@ class LLMService:
         
         
         try:
-            all_messages = []
+            all_messages, action = self._start_chat(messages, conversation_history, conversation_id)
+            response = self._completion(all_messages)
+            return self._finish_chat(action, response)
             
-            all_messages.append({
-                "role": "system",
-                "content": "You are a helpful English conversation teacher. Help the user practice English conversation naturally and provide corrections when needed."
-            })
+        except Exception as e:
+            print(f"Error calling LLM API: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def achat_completion(self, messages: list, conversation_history: list = None, 
+                               conversation_id: Optional[int] = None) -> Dict:
+        """
+        Async variant of chat_completion for the ASGI serving mode
+        
+        The LLM call is awaited on the shared async HTTP pool; building the
+        prompt and logging the action run on the storage executor.
+        """
+        if not LITELLM_AVAILABLE:
+            return {
+                'success': False,
+                'error': 'LiteLLM not installed'
+            }
+        
+        try:
+            all_messages, action = await run_storage(
+                self._start_chat, messages, conversation_history, conversation_id
+            )
+            response = await litellm.acompletion(
+                model=self.model,
+                messages=all_messages,
+                api_key=self.api_key,
+                timeout=self.timeout,
+                max_retries=0
+            )
+            return await run_storage(self._finish_chat, action, response)
             
-            if conversation_history:
-                all_messages.extend(conversation_history)
+        except Exception as e:
+            print(f"Error calling LLM API: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _start_chat(self, messages: list, conversation_history: list = None, 
+                    conversation_id: Optional[int] = None) -> tuple:
+        """Build the prompt and log the request; returns (all_messages, action)"""
+        all_messages = self._build_messages(messages, conversation_history, conversation_id)
+        
+        request_data = {
+            'model': self.model,
+            'messages': all_messages
+        }
+        
+        action = self.action_db.create_action(
+            api_id=self.api_config.APIID if self.api_config else 1,
+            request=request_data
+        )
+        return all_messages, action
+    
+    def _finish_chat(self, action, response) -> Dict:
+        """Log the LLM response on the action and build the result"""
+        response_text = response.choices[0].message.content
+        
+        response_data = {
+            'response': response_text,
+            'model': getattr(response, 'model', self.model),
+            'usage': self._usage_info(response)
+        }
+        
+        self.action_db.update_action_response(action.ActionID, response_data)
+        
+        return {
+            'success': True,
+            'response': response_text,
+            'action_id': action.ActionID
+        }
+    
+    def _usage_info(self, response) -> Dict:
+        usage_info = {}
+        if hasattr(response, 'usage') and response.usage:
+            try:
+                usage_info = {
+                    'prompt_tokens': getattr(response.usage, 'prompt_tokens', 0),
+                    'completion_tokens': getattr(response.usage, 'completion_tokens', 0),
+                    'total_tokens': getattr(response.usage, 'total_tokens', 0)
+                }
+            except Exception as e:
+                print(f"Warning: Could not extract usage info: {e}")
+        return usage_info
+    
+    def _build_messages(self, messages: list, conversation_history: list = None, 
+                        conversation_id: Optional[int] = None) -> list:
+        system_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        history = list(conversation_history or [])
+        
+        if conversation_id is not None and history:
+            summary, history = self._window_history(conversation_id, history)
+            if summary:
+                system_messages.append({
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}"
+                })
+            history = self._fit_budget(system_messages + messages, history)
+        
+        return system_messages + history + messages
+    
+    def _window_history(self, conversation_id: int, history: list) -> tuple:
+        """
+        Split history into a rolling summary and the turns kept verbatim
+        
+        The last history_turns turns are always sent as-is. Older messages are
+        sent as the stored summary plus the messages it does not cover yet.
+        Once summary_chunk of those are waiting, they are folded into the
+        summary in the background; this request does not wait for it.
+        """
+        keep = self.history_turns * 2
+        older = history[:-keep] if keep else history
+        if not older:
+            return None, history
+        
+        stored = self.summary_db.get_summary(conversation_id)
+        summary = stored.Summary if stored else ''
+        covered = stored.CoveredMessages if stored else 0
+        if covered > len(older):
+            # History was edited or deleted; start the summary over
+            summary, covered = '', 0
+        
+        if len(older) - covered >= self.summary_chunk:
+            self._refresh_summary_later(conversation_id, summary, older[covered:], len(older))
+        
+        return summary or None, history[covered:]
+    
+    def _refresh_summary_later(self, conversation_id: int, summary: str,
+                               new_messages: list, covered: int):
+        with self._summary_lock:
+            if conversation_id in self._summarizing:
+                return
+            self._summarizing.add(conversation_id)
+        
+        try:
+            self._summary_executor.submit(
+                self._refresh_summary, conversation_id, summary, new_messages, covered
+            )
+        except RuntimeError:
+            # Shutting down
+            with self._summary_lock:
+                self._summarizing.discard(conversation_id)
+    
+    def _refresh_summary(self, conversation_id: int, summary: str,
+                         new_messages: list, covered: int):
+        try:
+            result = self._summarize(summary, new_messages)
+            if result is not None:
+                updated, action, response = result
+                self.summary_db.save_summary(conversation_id, updated, covered)
+                self._log_summary(action, updated, response)
+        except Exception as e:
+            print(f"Error saving conversation summary: {e}")
+        finally:
+            with self._summary_lock:
+                self._summarizing.discard(conversation_id)
+    
+    def _summarize(self, summary: str, new_messages: list) -> Optional[tuple]:
+        """
+        Fold new_messages into summary with one LLM call
+        
+        Returns (updated summary, action, response), or None on failure.
+        """
+        transcript = "\n".join(
+            f"{'Student' if msg['role'] == 'user' else 'Teacher'}: {msg['content']}"
+            for msg in new_messages
+        )
+        summary_messages = [
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=Config.LLM_SUMMARY_WORDS)},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ]
+        
+        try:
+            action = self.action_db.create_action(
+                api_id=self.api_config.APIID if self.api_config else 1,
+                request={'model': self.model, 'messages': summary_messages}
+            )
             
-            all_messages.extend(messages)
+            response = self._completion(summary_messages)
+            return response.choices[0].message.content.strip(), action, response
+            
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            return None
+    
+    def _log_summary(self, action, updated: str, response):
+        """Record a summary call on its action; called once the summary is saved"""
+        try:
+            self.action_db.update_action_response(action.ActionID, {
+                'response': updated,
+                'model': getattr(response, 'model', self.model),
+                'usage': self._usage_info(response)
+            })
+        except Exception as e:
+            print(f"Warning: Could not log summary response: {e}")
+    
+    def _fit_budget(self, fixed_messages: list, history: list) -> list:
+        """Drop the oldest history messages until the prompt fits context_tokens"""
+        budget = self.context_tokens - self.count_tokens(fixed_messages)
+        sizes = [self.count_tokens([msg]) for msg in history]
+        
+        start = 0
+        total = sum(sizes)
+        while start < len(history) and total > budget:
+            total -= sizes[start]
+            start += 1
+        return history[start:]
+    
+    def count_tokens(self, messages: list) -> int:
+        try:
+            return litellm.token_counter(model=self.model, messages=messages)
+        except Exception:
+            # Rough estimate: about four characters per token
+            return sum(len(msg.get('content') or '') // 4 + 4 for msg in messages)
+    
+    def stream_chat_completion(self, messages: list, conversation_history: list = None, 
+                               conversation_id: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Stream a chat completion token by token
+        
+        Args:
+            messages: Current message (format: [{"role": "user", "content": "text"}])
+            conversation_history: Previous messages for context
+            conversation_id: Conversation whose rolling summary to use, as in chat_completion
+        
+        Yields:
+            {'type': 'token', 'content': str} for each piece of text, then
+            {'type': 'done', 'response': str, 'action_id': int} once the
+            reply is complete, or {'type': 'error', 'error': str}
+        """
+        if not LITELLM_AVAILABLE:
+            yield {'type': 'error', 'error': 'LiteLLM not installed'}
+            return
+        
+        try:
+            all_messages = self._build_messages(messages, conversation_history, conversation_id)
             
             request_data = {
                 'model': self.model,
-                'messages': all_messages
+                'messages': all_messages,
+                'stream': True
             }
             
-            action = self.action_db.create_action(
-                api_id=self.api_config.APIID if self.api_config else 1,
-                request=request_data
-            )
+            started = time.monotonic()
+            first_token_ms = None
+            model = self.model
+            parts = []
             
-            response = litellm.completion(
-                model=self.model,
-                messages=all_messages,
-                api_key=self.api_key
-            )
+            response = self._completion(all_messages, stream=True)
             
-            response_text = response.choices[0].message.content
+            for chunk in response:
+                model = getattr(chunk, 'model', None) or model
+                if not chunk.choices:
+                    continue
+                
+                content = getattr(chunk.choices[0].delta, 'content', None)
+                if not content:
+                    continue
+                
+                if first_token_ms is None:
+                    first_token_ms = int((time.monotonic() - started) * 1000)
+                parts.append(content)
+                yield {'type': 'token', 'content': content}
             
-            usage_info = {}
-            if hasattr(response, 'usage') and response.usage:
-                try:
-                    usage_info = {
-                        'prompt_tokens': getattr(response.usage, 'prompt_tokens', 0),
-                        'completion_tokens': getattr(response.usage, 'completion_tokens', 0),
-                        'total_tokens': getattr(response.usage, 'total_tokens', 0)
-                    }
-                except Exception as e:
-                    print(f"Warning: Could not extract usage info: {e}")
+            response_text = ''.join(parts)
             
-            response_data = {
+            # Log the call only once the reply is complete
+            action = self.action_db.create_action(
+                api_id=self.api_config.APIID if self.api_config else 1,
+                request=request_data
+            )
+            self.action_db.update_action_response(action.ActionID, {
                 'response': response_text,
-                'model': getattr(response, 'model', self.model),
-                'usage': usage_info
-            }
-            
-            self.action_db.update_action_response(action.ActionID, response_data)
+                'model': model,
+                'time_to_first_token_ms': first_token_ms,
+                'total_time_ms': int((time.monotonic() - started) * 1000)
+            })
             
-            return {
-                'success': True,
+            yield {
+                'type': 'done',
                 'response': response_text,
                 'action_id': action.ActionID
             }
             
         except Exception as e:
-            print(f"Error calling LLM API: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            print(f"Error streaming from LLM API: {e}")
+            yield {'type': 'error', 'error': str(e)}
     
     def simple_chat(self, user_message: str) -> Dict:
         messages = [{"role": "user", "content": user_message}]
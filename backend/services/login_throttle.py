@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+class LoginThrottle:
+    """
+    Limits failed login attempts per account and per client IP.
+    
+    Each key may fail a fixed number of times per window seconds; once it
+    has, further attempts are refused until the window ends. Successful
+    logins are not counted, so many users behind one proxy can log in
+    together. While the password pool is backlogged an account may also
+    have only one attempt running at a time, so one client retrying cannot
+    fill the queue. check() returns how many seconds to wait, or None to
+    let the attempt through; callers must call finish() for every attempt
+    that was let through.
+    """
+    
+    def __init__(self, per_account: int = 10, per_ip: int = 30, window: float = 60):
+        self.limits = {'account': per_account, 'ip': per_ip}
+        self.window = window
+        
+        # (kind, key) -> [window_start, failures, running]
+        self._counters = {}
+        self._lock = threading.Lock()
+        
+        self.allowed = 0
+        self.rejected = 0
+    
+    def _keys(self, account: str, ip: Optional[str]):
+        keys = [('account', account.lower())]
+        if ip:
+            keys.append(('ip', ip))
+        return keys
+    
+    def _counter(self, key, now: float):
+        counter = self._counters.get(key)
+        if not counter or now - counter[0] >= self.window:
+            counter = [now, 0, counter[2] if counter else 0]
+            self._counters[key] = counter
+        return counter
+    
+    def check(self, account: str, ip: Optional[str], backlogged: bool = False) -> Optional[float]:
+        now = time.monotonic()
+        
+        with self._lock:
+            if len(self._counters) > 10000:
+                self._prune(now)
+            
+            counters = {}
+            for kind, key in self._keys(account, ip):
+                counter = self._counter((kind, key), now)
+                limit = self.limits[kind]
+                if limit and counter[1] >= limit:
+                    self.rejected += 1
+                    return max(1, math.ceil(counter[0] + self.window - now))
+                counters[kind] = counter
+            
+            # One running attempt per account only: an IP may be a proxy
+            # in front of many users
+            if backlogged and counters['account'][2]:
+                self.rejected += 1
+                return 1
+            
+            counters['account'][2] += 1
+            self.allowed += 1
+            return None
+    
+    def finish(self, account: str, ip: Optional[str], failed: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(('account', account.lower()))
+            if counter and counter[2]:
+                counter[2] -= 1
+            
+            if failed:
+                for key in self._keys(account, ip):
+                    self._counter(key, now)[1] += 1
+    
+    def _prune(self, now: float):
+        for key, counter in list(self._counters.items()):
+            if now - counter[0] >= self.window and not counter[2]:
+                del self._counters[key]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'per_account': self.limits['account'],
+                'per_ip': self.limits['ip'],
+                'window': self.window,
+                'tracked': len(self._counters),
+                'allowed': self.allowed,
+                'rejected': self.rejected
+            }
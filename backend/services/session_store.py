@@ -0,0 +1,416 @@
+"""
+Session stores for AuthService
+
+A session maps a login token to a UserID and records when it was issued
+and last used. It expires after SESSION_TTL seconds without use (every
+lookup pushes that forward) or SESSION_MAX_AGE seconds after login,
+whichever comes first, and a user keeps at most SESSION_MAX_PER_USER
+sessions; logging in again drops the oldest. Three backends are
+available, chosen with SESSION_BACKEND:
+
+    memory   in-process dict; sessions are lost on restart and not shared
+    sqlite   a local SQLite file (SESSION_SQLITE_PATH) shared by every worker
+             process on the host and kept across restarts
+    redis    a Redis-compatible server (SESSION_REDIS_URL) shared by every host
+
+Use sqlite or redis when running more than one worker process. Each store
+keeps its sessions ordered by expiry, so the background sweeper only
+touches sessions that have expired.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import heapq
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.utils.config import Config
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+class SessionStore:
+    """Expiry rules and the background sweeper shared by the stores"""
+    
+    backend = None
+    
+    def __init__(self, ttl: float, max_age: float = None, max_per_user: int = 0):
+        self.ttl = ttl
+        self.max_age = max_age if max_age else float('inf')
+        self.max_per_user = max_per_user
+        # Skip rewriting last_seen when it changed less than this long ago
+        self.touch_interval = min(60.0, ttl / 10)
+        
+        self.swept = 0
+        self.evicted = 0
+        self._stop = threading.Event()
+        self._sweeper = None
+    
+    def expires_at(self, issued_at: float, last_seen: float) -> float:
+        return min(last_seen + self.ttl, issued_at + self.max_age)
+    
+    def start_sweeper(self, interval: float):
+        """Remove expired sessions every interval seconds on a daemon thread"""
+        if self._sweeper or interval <= 0:
+            return
+        self._sweeper = threading.Thread(
+            target=self._run_sweeper, args=(interval,), name='session-sweeper', daemon=True
+        )
+        self._sweeper.start()
+    
+    def _run_sweeper(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.swept += self.sweep()
+            except Exception as e:
+                print(f"Error sweeping sessions: {e}")
+    
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper:
+            self._sweeper.join()
+            self._sweeper = None
+    
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'live': self.count(),
+            'ttl': self.ttl,
+            'max_age': self.max_age if self.max_age != float('inf') else None,
+            'max_per_user': self.max_per_user,
+            'swept': self.swept,
+            'evicted': self.evicted
+        }
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in a dict, for a single worker process.
+    
+    A heap of (expiry, token) orders sessions by when they were last known
+    to expire. The sweeper pops only the entries that are due, and pushes
+    back the ones that were used since with their new expiry.
+    """
+    
+    backend = 'memory'
+    
+    def __init__(self, ttl: float, max_age: float = None, max_per_user: int = 0):
+        super().__init__(ttl, max_age, max_per_user)
+        # token -> [user_id, issued_at, last_seen]
+        self._sessions = {}
+        # user_id -> {token: None} in login order
+        self._by_user = {}
+        self._heap = []
+        self._lock = threading.Lock()
+    
+    def create(self, token: str, user_id: int):
+        now = time.time()
+        user_id = int(user_id)
+        with self._lock:
+            self._sessions[token] = [user_id, now, now]
+            tokens = self._by_user.setdefault(user_id, {})
+            tokens[token] = None
+            heapq.heappush(self._heap, (self.expires_at(now, now), token))
+            
+            while self.max_per_user and len(tokens) > self.max_per_user:
+                self._remove(next(iter(tokens)))
+                self.evicted += 1
+    
+    def get(self, token: str) -> Optional[int]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if not session:
+                return None
+            
+            user_id, issued_at, last_seen = session
+            if self.expires_at(issued_at, last_seen) <= now:
+                self._remove(token)
+                return None
+            
+            session[2] = now
+            return user_id
+    
+    def delete(self, token: str):
+        with self._lock:
+            self._remove(token)
+    
+    def _remove(self, token: str):
+        # Its heap entry is skipped when the sweeper reaches it
+        session = self._sessions.pop(token, None)
+        if session:
+            tokens = self._by_user.get(session[0])
+            tokens.pop(token, None)
+            if not tokens:
+                del self._by_user[session[0]]
+    
+    def sweep(self, batch_size: int = 1000) -> int:
+        now = time.time()
+        removed = 0
+        due = True
+        while due:
+            # Release the lock between batches so logins are not held up
+            with self._lock:
+                for _ in range(batch_size):
+                    due = bool(self._heap) and self._heap[0][0] <= now
+                    if not due:
+                        break
+                    
+                    _, token = heapq.heappop(self._heap)
+                    session = self._sessions.get(token)
+                    if not session:
+                        continue
+                    
+                    expires_at = self.expires_at(session[1], session[2])
+                    if expires_at <= now:
+                        self._remove(token)
+                        removed += 1
+                    else:
+                        heapq.heappush(self._heap, (expires_at, token))
+        return removed
+    
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+    
+    def close(self):
+        self.stop_sweeper()
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by the worker processes on one host.
+    
+    Connections are kept one per thread in WAL mode, like SQLiteDatabase.
+    expires_at is stored and indexed, so the sweeper deletes due rows
+    through the index. It is rewritten at most once per touch_interval,
+    so most lookups are a single read.
+    """
+    
+    backend = 'sqlite'
+    
+    def __init__(self, path: str, ttl: float, max_age: float = None, max_per_user: int = 0):
+        super().__init__(ttl, max_age, max_per_user)
+        self.path = path
+        self._local = threading.local()
+        
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions '
+            '(token TEXT PRIMARY KEY, user_id INTEGER NOT NULL, expires_at REAL NOT NULL, '
+            'issued_at REAL NOT NULL DEFAULT 0, last_seen REAL NOT NULL DEFAULT 0)'
+        )
+        # Tables created before sessions had timestamps
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(sessions)')]
+        for column in ('issued_at', 'last_seen'):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE sessions ADD COLUMN {column} REAL NOT NULL DEFAULT 0')
+                conn.execute(f'UPDATE sessions SET {column} = ?', (time.time(),))
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id, issued_at)')
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def create(self, token: str, user_id: int):
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (token, user_id, expires_at, issued_at, last_seen) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (token, int(user_id), self.expires_at(now, now), now, now)
+            )
+            if self.max_per_user:
+                # Keep the user's newest max_per_user sessions
+                evicted = conn.execute(
+                    'DELETE FROM sessions WHERE token IN (SELECT token FROM sessions '
+                    'WHERE user_id = ? ORDER BY issued_at DESC LIMIT -1 OFFSET ?)',
+                    (int(user_id), self.max_per_user)
+                ).rowcount
+                self.evicted += evicted
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def get(self, token: str) -> Optional[int]:
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT user_id, expires_at, issued_at, last_seen FROM sessions WHERE token = ?',
+            (token,)
+        ).fetchone()
+        if not row:
+            return None
+        
+        user_id, expires_at, issued_at, last_seen = row
+        if expires_at <= now:
+            conn.execute('DELETE FROM sessions WHERE token = ?', (token,))
+            return None
+        
+        if now - last_seen >= self.touch_interval:
+            conn.execute(
+                'UPDATE sessions SET last_seen = ?, expires_at = ? WHERE token = ?',
+                (now, self.expires_at(issued_at, now), token)
+            )
+        return user_id
+    
+    def delete(self, token: str):
+        self._connection().execute('DELETE FROM sessions WHERE token = ?', (token,))
+    
+    def sweep(self) -> int:
+        return self._connection().execute(
+            'DELETE FROM sessions WHERE expires_at <= ?', (time.time(),)
+        ).rowcount
+    
+    def count(self) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM sessions WHERE expires_at > ?', (time.time(),)
+        ).fetchone()[0]
+    
+    def close(self):
+        """Stop the sweeper and close the calling thread's connection"""
+        self.stop_sweeper()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as hashes in a Redis-compatible server, expired by the server.
+    
+    Two sorted sets sit beside them: <prefix>expiry (token by expiry) for
+    counting live sessions, and <prefix>user:<UserID> (token by login time)
+    for the per-user cap. The sweeper trims expired tokens from the first;
+    stale entries in the second are dropped when that user logs in.
+    
+    client is anything with the redis-py methods used here, so a local
+    stand-in (e.g. fakeredis) can be passed instead.
+    """
+    
+    backend = 'redis'
+    
+    def __init__(self, ttl: float, max_age: float = None, max_per_user: int = 0,
+                 client=None, url: str = None, prefix: str = 'session:'):
+        super().__init__(ttl, max_age, max_per_user)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError('redis not installed. Run: pip install redis')
+            client = redis.Redis.from_url(url or Config.SESSION_REDIS_URL)
+        self.client = client
+        self.prefix = prefix
+        self.expiry_key = prefix + 'expiry'
+    
+    def _key(self, token: str) -> str:
+        return self.prefix + token
+    
+    def _user_key(self, user_id: int) -> str:
+        return f'{self.prefix}user:{user_id}'
+    
+    def _write(self, pipe, token: str, expires_at: float):
+        pipe.expireat(self._key(token), int(expires_at) + 1)
+        pipe.zadd(self.expiry_key, {token: expires_at})
+    
+    def create(self, token: str, user_id: int):
+        now = time.time()
+        user_id = int(user_id)
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(token), mapping={'user_id': user_id, 'issued_at': now, 'last_seen': now})
+        self._write(pipe, token, self.expires_at(now, now))
+        pipe.zadd(self._user_key(user_id), {token: now})
+        if self.max_age != float('inf'):
+            # Every session in the set has ended by then
+            pipe.expireat(self._user_key(user_id), int(now + self.max_age) + 1)
+        pipe.zrange(self._user_key(user_id), 0, -1)
+        tokens = pipe.execute()[-1]
+        
+        if self.max_per_user and len(tokens) > self.max_per_user:
+            self._enforce_cap(user_id, [t.decode() if isinstance(t, bytes) else t for t in tokens])
+    
+    def _enforce_cap(self, user_id: int, tokens):
+        pipe = self.client.pipeline()
+        for token in tokens:
+            pipe.exists(self._key(token))
+        alive = [token for token, exists in zip(tokens, pipe.execute()) if exists]
+        dead = [token for token in tokens if token not in alive]
+        
+        # tokens are oldest first
+        excess = alive[:max(0, len(alive) - self.max_per_user)]
+        pipe = self.client.pipeline()
+        for token in excess:
+            pipe.delete(self._key(token))
+            pipe.zrem(self.expiry_key, token)
+        if dead or excess:
+            pipe.zrem(self._user_key(user_id), *(dead + excess))
+        pipe.execute()
+        self.evicted += len(excess)
+    
+    def get(self, token: str) -> Optional[int]:
+        now = time.time()
+        user_id, issued_at, last_seen = self.client.hmget(
+            self._key(token), 'user_id', 'issued_at', 'last_seen'
+        )
+        if user_id is None:
+            return None
+        
+        issued_at, last_seen = float(issued_at), float(last_seen)
+        if self.expires_at(issued_at, last_seen) <= now:
+            self.delete(token)
+            return None
+        
+        if now - last_seen >= self.touch_interval:
+            pipe = self.client.pipeline()
+            pipe.hset(self._key(token), 'last_seen', now)
+            self._write(pipe, token, self.expires_at(issued_at, now))
+            pipe.execute()
+        return int(user_id)
+    
+    def delete(self, token: str):
+        user_id = self.client.hget(self._key(token), 'user_id')
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(token))
+        pipe.zrem(self.expiry_key, token)
+        if user_id is not None:
+            pipe.zrem(self._user_key(int(user_id)), token)
+        pipe.execute()
+    
+    def sweep(self) -> int:
+        return self.client.zremrangebyscore(self.expiry_key, '-inf', time.time())
+    
+    def count(self) -> int:
+        return self.client.zcount(self.expiry_key, time.time(), '+inf')
+    
+    def close(self):
+        self.stop_sweeper()
+        self.client.close()
+
+def create_session_store(backend: str = None, ttl: float = None):
+    """Session store selected by Config.SESSION_BACKEND (memory, sqlite or redis)"""
+    backend = backend or Config.SESSION_BACKEND
+    ttl = Config.SESSION_TTL if ttl is None else ttl
+    limits = {'max_age': Config.SESSION_MAX_AGE, 'max_per_user': Config.SESSION_MAX_PER_USER}
+    
+    if backend == 'sqlite':
+        return SQLiteSessionStore(Config.SESSION_SQLITE_PATH, ttl, **limits)
+    if backend == 'redis':
+        return RedisSessionStore(ttl, url=Config.SESSION_REDIS_URL, **limits)
+    if backend != 'memory':
+        print(f"Warning: unknown SESSION_BACKEND '{backend}', using memory")
+    return MemorySessionStore(ttl, **limits)
@@ -0,0 +1,135 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import base64
+import hashlib
+import heapq
+import hmac
+import json
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.models.user import User
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+class SignedTokens:
+    """
+    Stateless auth tokens: <claims>.<signature>, signed with HMAC-SHA256.
+    
+    The claims carry the UserID, RoleID and active flag, the issue and
+    expiry times and a random id (jti), so a request can be authenticated
+    without reading the session store or nguoi_dung.csv. Tokens cannot be
+    deleted, so logout revokes the jti, and deactivating a user rejects
+    every token issued to them before that moment. Entries are kept only
+    until the tokens they cover would have expired anyway.
+    
+    The revocation list lives in this process; with several workers keep
+    SIGNED_TOKEN_TTL short.
+    """
+    
+    def __init__(self, secret: str, ttl: float = 3600):
+        self.key = hashlib.sha256(b'auth-token:' + secret.encode('utf-8')).digest()
+        self.ttl = ttl
+        
+        # jti -> exp, with a heap of (exp, jti) to drop entries once expired
+        self._revoked = {}
+        self._revoked_heap = []
+        # user_id -> time; tokens issued before it are rejected
+        self._not_before = {}
+        self._lock = threading.Lock()
+        
+        self.issued = 0
+        self.rejected = 0
+    
+    @staticmethod
+    def is_signed(token: str) -> bool:
+        # Session tokens are urlsafe base64 and never contain a '.'
+        return '.' in token
+    
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self.key, payload.encode('ascii'), hashlib.sha256).digest())
+    
+    def issue(self, user: User) -> str:
+        now = time.time()
+        claims = {
+            'uid': user.UserID,
+            'rid': user.RoleID,
+            'act': user.active,
+            'iat': now,
+            'exp': now + self.ttl,
+            'jti': secrets.token_urlsafe(12)
+        }
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        self.issued += 1
+        return f'{payload}.{self._sign(payload)}'
+    
+    def verify(self, token: str) -> Optional[Dict]:
+        """Claims of a valid, unexpired and unrevoked token, else None"""
+        claims = self._decode(token)
+        if claims and claims['act'] and claims['exp'] > time.time():
+            with self._lock:
+                revoked = (claims['jti'] in self._revoked
+                           or claims['iat'] <= self._not_before.get(claims['uid'], 0))
+            if not revoked:
+                return claims
+        
+        self.rejected += 1
+        return None
+    
+    def _decode(self, token: str) -> Optional[Dict]:
+        try:
+            payload, signature = token.split('.')
+            # Compare bytes: compare_digest raises TypeError on non-ASCII str
+            if not hmac.compare_digest(signature.encode('utf-8'), self._sign(payload).encode('ascii')):
+                return None
+            return json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError):
+            return None
+    
+    def revoke(self, token: str):
+        """Reject this token from now on (logout)"""
+        claims = self._decode(token)
+        if not claims:
+            return
+        
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if claims['exp'] > now:
+                self._revoked[claims['jti']] = claims['exp']
+                heapq.heappush(self._revoked_heap, (claims['exp'], claims['jti']))
+    
+    def revoke_user(self, user_id: int):
+        """Reject every token issued to the user until now (deactivation)"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._not_before[int(user_id)] = now
+    
+    def _prune(self, now: float):
+        while self._revoked_heap and self._revoked_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._revoked_heap)
+            self._revoked.pop(jti, None)
+        
+        # Tokens issued before now - ttl have all expired
+        for user_id, not_before in list(self._not_before.items()):
+            if not_before <= now - self.ttl:
+                del self._not_before[user_id]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'issued': self.issued,
+                'rejected': self.rejected,
+                'revoked_tokens': len(self._revoked),
+                'revoked_users': len(self._not_before)
+            }
@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+class Flight:
+    """One in-flight call that other callers can wait on"""
+    
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+    
+    def wait(self, timeout: float = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for the in-flight call")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls.
+    
+    The first caller for a key runs the call; anyone asking for the same
+    key while it is running waits and receives the same result (or
+    exception) instead of making a second outbound request. Nothing is
+    kept after the call returns - caching results is left to the caller.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        
+        self.calls = 0
+        self.shared = 0
+    
+    def begin(self, key: str) -> Tuple[Flight, bool]:
+        """Join the flight for key, or start one; returns (flight, is_leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight:
+                flight.waiters += 1
+                self.shared += 1
+                return flight, False
+            
+            flight = Flight()
+            self._flights[key] = flight
+            self.calls += 1
+            return flight, True
+    
+    def complete(self, key: str, flight: Flight, result: Any = None, error: BaseException = None):
+        """Publish the leader's outcome and wake the waiters"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.error = error
+        flight._done.set()
+    
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """Run fn once for all concurrent callers of key; returns (result, shared)"""
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait(), True
+        
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.complete(key, flight, error=e)
+            raise
+        self.complete(key, flight, result)
+        return result, False
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'calls': self.calls,
+                'shared': self.shared
+            }
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop (the ASGI serving mode).
+    
+    Callers of the same key await one shared task. A caller that is
+    cancelled does not cancel the task for the others.
+    """
+    
+    def __init__(self):
+        self._tasks = {}
+        
+        self.calls = 0
+        self.shared = 0
+    
+    async def do(self, key: str, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """Await fn once for all concurrent callers of key; returns (result, shared)"""
+        task = self._tasks.get(key)
+        if task:
+            self.shared += 1
+            return await asyncio.shield(task), True
+        
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        self._tasks[key] = task
+        self.calls += 1
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task), False
+    
+    def stats(self) -> Dict:
+        return {
+            'in_flight': len(self._tasks),
+            'calls': self.calls,
+            'shared': self.shared
+        }
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator
+
+# End of a sentence: terminal punctuation (optionally closed by a quote or
+# bracket) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+class SpeechPipeline:
+    """
+    Turns a streamed reply into speech one sentence at a time.
+    
+    Text is fed in as it arrives from the LLM. Each complete sentence is
+    synthesized on a small thread pool (at most max_workers at once), and
+    finished segments are handed back strictly in sentence order, so the
+    client can start playing the first sentence while later ones are
+    still being generated.
+    """
+    
+    def __init__(self, tts_service, max_workers: int = 3, min_chars: int = 20):
+        self.tts_service = tts_service
+        self.min_chars = min_chars
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speech-pipeline')
+        self._buffer = ''
+        self._pending = deque()
+        self._next_index = 0
+    
+    def feed(self, text: str):
+        """Add streamed text; submit any sentences it completes"""
+        self._buffer += text
+        
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            # Very short sentences ("Great!") are merged into the next one
+            if match.end() - start < self.min_chars:
+                continue
+            self._submit(self._buffer[start:match.end()])
+            start = match.end()
+        self._buffer = self._buffer[start:]
+    
+    def finish(self):
+        """Submit whatever text is left after the reply ends"""
+        self._submit(self._buffer)
+        self._buffer = ''
+    
+    def _submit(self, sentence: str):
+        sentence = sentence.strip()
+        if not sentence:
+            return
+        
+        future = self._executor.submit(self._synthesize, sentence)
+        self._pending.append((self._next_index, sentence, future))
+        self._next_index += 1
+    
+    def _synthesize(self, sentence: str) -> Dict:
+        result = self.tts_service.synthesize_speech(sentence)
+        # The file only needs to outlive the client's follow-up request;
+        # LRU eviction will not reach a file this fresh
+        self.tts_service.release_audio(result)
+        return result
+    
+    def ready(self) -> Iterator[Dict]:
+        """Segments finished so far, in order, without waiting"""
+        while self._pending and self._pending[0][2].done():
+            yield self._segment(*self._pending.popleft())
+    
+    def drain(self) -> Iterator[Dict]:
+        """All remaining segments, in order, waiting for each"""
+        while self._pending:
+            yield self._segment(*self._pending.popleft())
+    
+    def _segment(self, index: int, sentence: str, future) -> Dict:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        
+        segment = {'index': index, 'text': sentence, 'success': result['success']}
+        if result['success']:
+            segment['cache_key'] = result['cache_key']
+        else:
+            segment['error'] = result.get('error')
+        return segment
+    
+    def close(self):
+        """Stop the pool, dropping sentences that have not started yet"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -3,13 +3,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from backend.utils.config import Config
+from backend.utils.http_client import http_clients
+from backend.utils.async_storage import run_storage
 from database.db_manager import CSVDatabase
-from database.action_db import ActionDB, ThirdPartyAPIDB
+from database.action_db import ActionDB, ThirdPartyAPIDB, ActionAuditQueue
 from typing import Dict, Optional
 from io import BytesIO
 
 try:
-    from elevenlabs.client import ElevenLabs
+    from elevenlabs.client import ElevenLabs, AsyncElevenLabs
     ELEVENLABS_AVAILABLE = True
 except ImportError:
     ELEVENLABS_AVAILABLE = False
@@ -18,8 +20,8 @@ except ImportError:
 class STTService:
     """Speech-to-Text service using ElevenLabs API"""
     
-    def __init__(self, db: CSVDatabase):
-        self.action_db = ActionDB(db)
+    def __init__(self, db: CSVDatabase, audit_queue: Optional[ActionAuditQueue] = None):
+        self.action_db = ActionDB(db, audit_queue)
         self.api_db = ThirdPartyAPIDB(db)
         self.api_key = Config.ELEVENLABS_API_KEY
         self.language = Config.ELEVENLABS_LANGUAGE
@@ -27,66 +29,57 @@ class STTService:
         
         self.api_config = self.api_db.get_api_by_type('speech-to-text')
         
+        self.client = None
+        self.async_client = None
         if ELEVENLABS_AVAILABLE and self.api_key:
+            timeout = http_clients.settings('speech-to-text')['timeout']
             try:
-                self.client = ElevenLabs(api_key=self.api_key)
+                self.client = ElevenLabs(
+                    api_key=self.api_key,
+                    timeout=timeout,
+                    httpx_client=http_clients.client('speech-to-text')
+                )
+                self.async_client = AsyncElevenLabs(
+                    api_key=self.api_key,
+                    timeout=timeout,
+                    httpx_client=http_clients.async_client('speech-to-text')
+                )
             except Exception as e:
                 print(f"Error initializing ElevenLabs client: {e}")
                 self.client = None
-        else:
-            self.client = None
+                self.async_client = None
     
     def transcribe_audio(self, audio_content: bytes, audio_format: str = 'wav') -> Dict:
-        if not ELEVENLABS_AVAILABLE:
-            return {
-                'success': False,
-                'error': 'ElevenLabs not installed. Run: pip install elevenlabs'
-            }
-        
-        if not self.client:
-            return {
-                'success': False,
-                'error': 'ElevenLabs not configured properly. Check ELEVENLABS_API_KEY in .env'
-            }
+        error = self._unavailable(self.client)
+        if error:
+            return error
         
         try:
-            request_data = {
-                'audio_format': audio_format,
-                'language': self.language,
-                'audio_size': len(audio_content),
-                'model': self.model_id
-            }
-            
-            action = self.action_db.create_action(
-                api_id=self.api_config.APIID if self.api_config else 2,
-                request=request_data
-            )
-            
-            audio_data = BytesIO(audio_content)
-            audio_data.name = f"audio.{audio_format}"  # Set filename for format detection
-            
+            action = self._start_transcription(audio_content, audio_format)
             transcription = self.client.speech_to_text.convert(
-                file=audio_data,
-                model_id=self.model_id,
-                language_code=self.language,
-                tag_audio_events=True,
-                diarize=False
+                **self._convert_args(audio_content, audio_format)
             )
+            return self._finish_transcription(action, transcription)
             
-            transcript = transcription.text if hasattr(transcription, 'text') else str(transcription)
-            
-            response_data = {
-                'transcript': transcript,
-                'model': self.model_id
-            }
-            
-            self.action_db.update_action_response(action.ActionID, response_data)
-            
+        except Exception as e:
+            print(f"Error calling ElevenLabs Speech-to-Text API: {e}")
             return {
-                'success': True,
-                'transcript': transcript,
-                'action_id': action.ActionID
+                'success': False,
+                'error': str(e)
             }
+    
+    async def atranscribe_audio(self, audio_content: bytes, audio_format: str = 'wav') -> Dict:
+        """Async variant of transcribe_audio for the ASGI serving mode"""
+        error = self._unavailable(self.async_client)
+        if error:
+            return error
+        
+        try:
+            action = await run_storage(self._start_transcription, audio_content, audio_format)
+            transcription = await self.async_client.speech_to_text.convert(
+                **self._convert_args(audio_content, audio_format)
+            )
+            return await run_storage(self._finish_transcription, action, transcription)
             
         except Exception as e:
             print(f"Error calling ElevenLabs Speech-to-Text API: {e}")
@@ -95,6 +88,63 @@ class STTService:
                 'error': str(e)
             }
     
+    def _unavailable(self, client) -> Optional[Dict]:
+        if not ELEVENLABS_AVAILABLE:
+            return {
+                'success': False,
+                'error': 'ElevenLabs not installed. Run: pip install elevenlabs'
+            }
+        
+        if not client:
+            return {
+                'success': False,
+                'error': 'ElevenLabs not configured properly. Check ELEVENLABS_API_KEY in .env'
+            }
+        return None
+    
+    def _start_transcription(self, audio_content: bytes, audio_format: str):
+        request_data = {
+            'audio_format': audio_format,
+            'language': self.language,
+            'audio_size': len(audio_content),
+            'model': self.model_id
+        }
+        
+        return self.action_db.create_action(
+            api_id=self.api_config.APIID if self.api_config else 2,
+            request=request_data
+        )
+    
+    def _convert_args(self, audio_content: bytes, audio_format: str) -> Dict:
+        audio_data = BytesIO(audio_content)
+        audio_data.name = f"audio.{audio_format}"  # Set filename for format detection
+        
+        return {
+            'file': audio_data,
+            'model_id': self.model_id,
+            'language_code': self.language,
+            'tag_audio_events': True,
+            'diarize': False,
+            # Retries are handled by the shared HTTP client
+            'request_options': {'max_retries': 0}
+        }
+    
+    def _finish_transcription(self, action, transcription) -> Dict:
+        transcript = transcription.text if hasattr(transcription, 'text') else str(transcription)
+        
+        response_data = {
+            'transcript': transcript,
+            'model': self.model_id
+        }
+        
+        self.action_db.update_action_response(action.ActionID, response_data)
+        
+        return {
+            'success': True,
+            'transcript': transcript,
+            'action_id': action.ActionID
+        }
+    
     def transcribe_audio_file(self, audio_path: str) -> Dict:
         try:
             with open(audio_path, 'rb') as f:
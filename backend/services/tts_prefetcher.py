@@ -0,0 +1,240 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from backend.services.audio_cache import AudioCache
+
+class PrefetchJob:
+    def __init__(self, key: str, text: str, conversation_id: int, user_id: int):
+        self.key = key
+        self.text = text
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.cancelled = threading.Event()
+        self.future = None
+
+class TTSPrefetcher:
+    """
+    Synthesizes new AI replies into the TTS cache before they are requested.
+    
+    Enabled per conversation mode (e.g. only 'continuous'). Jobs run on at
+    most max_workers threads; when max_pending jobs are already waiting,
+    new ones are skipped. A TTS request for a reply whose prefetch is
+    already running waits for that synthesis instead of starting another
+    one; a prefetch still queued is dropped and the request synthesizes
+    right away rather than waiting behind other jobs.
+    Jobs for a user's other conversations are cancelled when they switch
+    or start a new conversation; a synthesis in progress stops at the next
+    audio chunk and its partial file is discarded.
+    
+    A prefetched reply that is not requested within claim_window seconds,
+    or a synthesis stopped part-way by cancellation, counts as wasted.
+    """
+    
+    def __init__(self, tts_service, modes: List[str], max_workers: int = 2,
+                 max_pending: int = 32, claim_window: float = 300):
+        self.tts_service = tts_service
+        self.modes = set(modes)
+        self.max_pending = max_pending
+        self.claim_window = claim_window
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts-prefetch')
+        self._lock = threading.Lock()
+        
+        # key -> PrefetchJob, for queued and running jobs
+        self._jobs = {}
+        # key -> completion time, for finished prefetches nobody has asked for yet
+        self._unclaimed = OrderedDict()
+        
+        self.submitted = 0
+        self.skipped = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.preempted = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+    
+    def enabled_for(self, mode: str) -> bool:
+        return mode in self.modes
+    
+    def _key(self, text: str) -> str:
+        return AudioCache.make_key(text, self.tts_service.voice_id, self.tts_service.model_id, 'mp3')
+    
+    def prefetch(self, conversation_id: int, user_id: int, mode: str, text: str) -> bool:
+        """Queue background synthesis of an AI reply; False if not queued"""
+        if not self.enabled_for(mode) or not text.strip():
+            return False
+        
+        key = self._key(text)
+        with self._lock:
+            self._expire_unclaimed()
+            if key in self._jobs or key in self._unclaimed:
+                return False
+            if len(self._jobs) >= self.max_pending:
+                self.skipped += 1
+                return False
+            
+            job = PrefetchJob(key, text, conversation_id, user_id)
+            self._jobs[key] = job
+            self.submitted += 1
+            job.future = self._executor.submit(self._run, job)
+            return True
+    
+    def _run(self, job: PrefetchJob):
+        outcome = 'cancelled'
+        try:
+            if job.cancelled.is_set():
+                return
+            
+            result = self.tts_service.stream_speech(job.text)
+            if not result['success']:
+                outcome = 'failed'
+                return
+            
+            if result['cached']:
+                # Already synthesized by someone else; nothing was spent
+                self.tts_service.release_audio(result)
+                outcome = 'cached'
+                return
+            
+            stream = result['stream']
+            try:
+                for _ in stream:
+                    if job.cancelled.is_set():
+                        outcome = 'aborted'
+                        return
+            finally:
+                stream.close()
+            outcome = 'completed'
+            
+        except Exception as e:
+            print(f"Error prefetching speech: {e}")
+            outcome = 'failed'
+        finally:
+            self._finish(job, outcome)
+    
+    def _finish(self, job: PrefetchJob, outcome: str):
+        with self._lock:
+            self._jobs.pop(job.key, None)
+            if outcome == 'completed':
+                self.completed += 1
+                self._unclaimed[job.key] = time.monotonic()
+            elif outcome == 'cancelled':
+                self.cancelled += 1
+            elif outcome == 'aborted':
+                # Stopped part-way: the API call was paid for but is thrown away
+                self.cancelled += 1
+                self.wasted += 1
+            elif outcome == 'failed':
+                self.failed += 1
+    
+    def claim(self, conversation_id: int, mode: str, text: str, timeout: float = 60) -> bool:
+        """
+        Called before serving TTS for a reply. Waits for a prefetch of the
+        same text that is running, and records a hit if the reply was
+        prefetched.
+        """
+        if not self.enabled_for(mode):
+            return False
+        
+        key = self._key(text)
+        job = self._running_job(key)
+        
+        if job:
+            try:
+                job.future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self._record_claim(key)
+    
+    async def aclaim(self, conversation_id: int, mode: str, text: str, timeout: float = 60) -> bool:
+        """claim() for the ASGI serving mode; waits on the event loop, not a thread"""
+        if not self.enabled_for(mode):
+            return False
+        
+        key = self._key(text)
+        job = self._running_job(key)
+        
+        if job:
+            try:
+                # shield: timing out must not cancel the running job
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+            except Exception:
+                pass
+        return self._record_claim(key)
+    
+    def _running_job(self, key: str) -> Optional[PrefetchJob]:
+        """The running prefetch of key, if any; a queued one is dropped for the caller to synthesize"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job and job.future.cancel():
+                del self._jobs[key]
+                self.preempted += 1
+                return None
+            return job
+    
+    def _record_claim(self, key: str) -> bool:
+        with self._lock:
+            if self._unclaimed.pop(key, None) is not None:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+    
+    def cancel_user(self, user_id: int, keep_conversation_id: Optional[int] = None) -> int:
+        """Cancel prefetches for a user's conversations other than keep_conversation_id"""
+        count = 0
+        with self._lock:
+            for job in list(self._jobs.values()):
+                if job.user_id != user_id or job.conversation_id == keep_conversation_id:
+                    continue
+                
+                job.cancelled.set()
+                if job.future.cancel():
+                    # Never started, so _run will not clean it up
+                    del self._jobs[job.key]
+                    self.cancelled += 1
+                count += 1
+        return count
+    
+    def _expire_unclaimed(self):
+        now = time.monotonic()
+        while self._unclaimed:
+            key, finished = next(iter(self._unclaimed.items()))
+            if now - finished <= self.claim_window:
+                break
+            del self._unclaimed[key]
+            self.wasted += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire_unclaimed()
+            requested = self.hits + self.misses
+            return {
+                'modes': sorted(self.modes),
+                'pending': len(self._jobs),
+                'submitted': self.submitted,
+                'skipped': self.skipped,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'preempted': self.preempted,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requested if requested else None,
+                'wasted': self.wasted
+            }
+    
+    def close(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancelled.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
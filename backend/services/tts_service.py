@@ -3,24 +3,68 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from backend.utils.config import Config
+from backend.utils.http_client import http_clients
+from backend.utils.async_storage import run_storage
 from database.db_manager import CSVDatabase
-from database.action_db import ActionDB, ThirdPartyAPIDB
-from typing import Dict, Optional
-import hashlib
-from datetime import datetime
+from database.action_db import ActionDB, ThirdPartyAPIDB, ActionAuditQueue
+from backend.services.audio_cache import AudioCache
+from backend.services.single_flight import SingleFlight, AsyncSingleFlight, Flight
+from typing import Dict, Optional, Iterator
+import tempfile
 
 try:
-    from elevenlabs.client import ElevenLabs
+    from elevenlabs.client import ElevenLabs, AsyncElevenLabs
     ELEVENLABS_AVAILABLE = True
 except ImportError:
     ELEVENLABS_AVAILABLE = False
     print("Warning: elevenlabs not installed. TTS features will not work.")
 
+class AudioStream:
+    """
+    Iterator over streamed audio chunks that reports how the stream ended
+    exactly once: completed, failed, or closed early (including never read)
+    """
+    
+    def __init__(self, first_chunk: bytes, chunks: Iterator[bytes], on_finish):
+        self._first_chunk = first_chunk
+        self._chunks = chunks
+        self._on_finish = on_finish
+        self._finished = False
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> bytes:
+        if self._first_chunk:
+            chunk, self._first_chunk = self._first_chunk, None
+            return chunk
+        
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self._finish({'success': True}, None)
+            raise
+        except Exception as e:
+            self._finish(None, e)
+            raise
+    
+    def close(self):
+        self._chunks.close()
+        self._finish({'success': False, 'error': 'Stream closed early'}, None)
+    
+    def _finish(self, result, error):
+        if not self._finished:
+            self._finished = True
+            self._on_finish(result, error)
+    
+    def __del__(self):
+        self.close()
+
 class TTSService:
     """Text-to-Speech service using ElevenLabs API"""
     
-    def __init__(self, db: CSVDatabase):
-        self.action_db = ActionDB(db)
+    def __init__(self, db: CSVDatabase, audit_queue: Optional[ActionAuditQueue] = None):
+        self.action_db = ActionDB(db, audit_queue)
         self.api_db = ThirdPartyAPIDB(db)
         self.api_key = Config.ELEVENLABS_API_KEY
         self.voice_id = Config.ELEVENLABS_VOICE_ID
@@ -30,16 +74,32 @@ class TTSService:
         if not os.path.exists(self.audio_dir):
             os.makedirs(self.audio_dir)
         
+        self.audio_cache = AudioCache(self.audio_dir, Config.TTS_CACHE_MAX_MB * 1024 * 1024)
+        # Identical requests that arrive while audio is being synthesized wait for it
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        
         self.api_config = self.api_db.get_api_by_type('text-to-speech')
         
+        self.client = None
+        self.async_client = None
         if ELEVENLABS_AVAILABLE and self.api_key:
+            timeout = http_clients.settings('text-to-speech')['timeout']
             try:
-                self.client = ElevenLabs(api_key=self.api_key)
+                self.client = ElevenLabs(
+                    api_key=self.api_key,
+                    timeout=timeout,
+                    httpx_client=http_clients.client('text-to-speech')
+                )
+                self.async_client = AsyncElevenLabs(
+                    api_key=self.api_key,
+                    timeout=timeout,
+                    httpx_client=http_clients.async_client('text-to-speech')
+                )
             except Exception as e:
                 print(f"Error initializing ElevenLabs TTS client: {e}")
                 self.client = None
-        else:
-            self.client = None
+                self.async_client = None
     
     def synthesize_speech(self, text: str, output_format: str = 'mp3') -> Dict:
         """
@@ -50,8 +110,15 @@ class TTSService:
             output_format: Audio format ('mp3' or 'wav')
         
         Returns:
-            Dictionary with audio file path and action_id
+            Dictionary with audio file path, cache_key and action_id (None
+            when served from the cache). The file stays pinned in the cache
+            until release_audio() is called with this result.
         """
+        cache_key = AudioCache.make_key(text, self.voice_id, self.model_id, output_format)
+        cached_path = self.audio_cache.acquire(cache_key)
+        if cached_path:
+            return self._cached_result(cache_key, cached_path)
+        
         if not ELEVENLABS_AVAILABLE:
             return {
                 'success': False,
@@ -65,54 +132,160 @@ class TTSService:
             }
         
         try:
-            request_data = {
-                'text': text,
-                'voice_id': self.voice_id,
-                'model_id': self.model_id,
-                'format': output_format
-            }
+            flight = self._begin_flight(cache_key)
+            if not isinstance(flight, Flight):
+                return flight
             
-            action = self.action_db.create_action(
-                api_id=self.api_config.APIID if self.api_config else 3,
-                request=request_data
-            )
+            try:
+                request_data = {
+                    'text': text,
+                    'voice_id': self.voice_id,
+                    'model_id': self.model_id,
+                    'format': output_format
+                }
+                
+                action = self.action_db.create_action(
+                    api_id=self.api_config.APIID if self.api_config else 3,
+                    request=request_data
+                )
+                
+                audio_path = self.audio_cache.path_for(cache_key, output_format)
+                for _ in self._synthesize_to_cache(text, output_format, cache_key, action.ActionID):
+                    pass
+            except Exception as e:
+                self.single_flight.complete(cache_key, flight, error=e)
+                raise
+            self.single_flight.complete(cache_key, flight, {'success': True})
             
-            format_map = {
-                'mp3': 'mp3_44100_128',
-                'wav': 'pcm_44100'
+            return {
+                'success': True,
+                'audio_path': audio_path,
+                'cache_key': cache_key,
+                'cached': False,
+                'action_id': action.ActionID
             }
-            elevenlabs_format = format_map.get(output_format.lower(), 'mp3_44100_128')
             
-            audio_generator = self.client.text_to_speech.convert(
-                text=text,
-                voice_id=self.voice_id,
-                model_id=self.model_id,
-                output_format=elevenlabs_format
-            )
+        except Exception as e:
+            print(f"Error calling ElevenLabs Text-to-Speech API: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def stream_speech(self, text: str, output_format: str = 'mp3') -> Dict:
+        """
+        Like synthesize_speech, but without waiting for the whole file
+        
+        Returns a cached file exactly as synthesize_speech does (pinned until
+        release_audio()). On a miss, 'stream' is an iterator of audio chunks
+        relayed from ElevenLabs as they arrive; the chunks are also written
+        to the cache, and the file is added once the stream completes.
+        """
+        cache_key = AudioCache.make_key(text, self.voice_id, self.model_id, output_format)
+        cached_path = self.audio_cache.acquire(cache_key)
+        if cached_path:
+            return self._cached_result(cache_key, cached_path)
+        
+        if not ELEVENLABS_AVAILABLE:
+            return {
+                'success': False,
+                'error': 'ElevenLabs not installed. Run: pip install elevenlabs'
+            }
+        
+        if not self.client:
+            return {
+                'success': False,
+                'error': 'ElevenLabs TTS not configured properly. Check ELEVENLABS_API_KEY in .env'
+            }
+        
+        try:
+            flight = self._begin_flight(cache_key)
+            if not isinstance(flight, Flight):
+                return flight
             
-            audio_content = b""
-            for chunk in audio_generator:
-                audio_content += chunk
+            try:
+                request_data = {
+                    'text': text,
+                    'voice_id': self.voice_id,
+                    'model_id': self.model_id,
+                    'format': output_format,
+                    'stream': True
+                }
+                
+                action = self.action_db.create_action(
+                    api_id=self.api_config.APIID if self.api_config else 3,
+                    request=request_data
+                )
+                
+                chunks = self._synthesize_to_cache(text, output_format, cache_key, action.ActionID, pin=False)
+                # Pull the first chunk now so API errors are reported before any audio is sent
+                first_chunk = next(chunks, b'')
+            except Exception as e:
+                self.single_flight.complete(cache_key, flight, error=e)
+                raise
             
-            filename = self._generate_filename(text, output_format)
-            audio_path = os.path.join(self.audio_dir, filename)
+            def on_finish(result, error):
+                self.single_flight.complete(cache_key, flight, result, error)
             
-            with open(audio_path, 'wb') as out:
-                out.write(audio_content)
+            return {
+                'success': True,
+                'stream': AudioStream(first_chunk, chunks, on_finish),
+                'cache_key': None,
+                'cached': False,
+                'action_id': action.ActionID
+            }
             
-            response_data = {
-                'audio_path': audio_path,
-                'audio_size': len(audio_content),
-                'voice_id': self.voice_id,
-                'model_id': self.model_id
+        except Exception as e:
+            print(f"Error calling ElevenLabs Text-to-Speech API: {e}")
+            return {
+                'success': False,
+                'error': str(e)
             }
+    
+    async def asynthesize_speech(self, text: str, output_format: str = 'mp3') -> Dict:
+        """
+        Async variant of synthesize_speech for the ASGI serving mode
+        
+        Audio is fetched on the shared async HTTP pool and written to the
+        cache on the storage executor. Concurrent calls for the same text
+        on the event loop share one synthesis. The result is pinned until
+        release_audio(), as with synthesize_speech.
+        """
+        cache_key = AudioCache.make_key(text, self.voice_id, self.model_id, output_format)
+        cached_path = await run_storage(self.audio_cache.acquire, cache_key)
+        if cached_path:
+            return self._cached_result(cache_key, cached_path)
+        
+        if not ELEVENLABS_AVAILABLE:
+            return {
+                'success': False,
+                'error': 'ElevenLabs not installed. Run: pip install elevenlabs'
+            }
+        
+        if not self.async_client:
+            return {
+                'success': False,
+                'error': 'ElevenLabs TTS not configured properly. Check ELEVENLABS_API_KEY in .env'
+            }
+        
+        try:
+            action_id, shared = await self.async_single_flight.do(
+                cache_key, self._asynthesize_to_cache, text, output_format, cache_key
+            )
             
-            self.action_db.update_action_response(action.ActionID, response_data)
+            audio_path = await run_storage(self.audio_cache.acquire, cache_key)
+            if not audio_path:
+                return {
+                    'success': False,
+                    'error': 'Synthesized audio was evicted from the cache'
+                }
             
             return {
                 'success': True,
                 'audio_path': audio_path,
-                'action_id': action.ActionID
+                'cache_key': cache_key,
+                'cached': shared,
+                'action_id': None if shared else action_id
             }
             
         except Exception as e:
@@ -122,10 +295,129 @@ class TTSService:
                 'error': str(e)
             }
     
-    def _generate_filename(self, text: str, format: str) -> str:
-        content = f"{text}_{datetime.now().isoformat()}"
-        hash_val = hashlib.md5(content.encode()).hexdigest()
-        return f"tts_{hash_val}.{format}"
+    async def _asynthesize_to_cache(self, text: str, output_format: str, cache_key: str) -> int:
+        """Fetch the whole audio from ElevenLabs and add it to the cache; returns the action ID"""
+        action = await run_storage(
+            self.action_db.create_action,
+            api_id=self.api_config.APIID if self.api_config else 3,
+            request={
+                'text': text,
+                'voice_id': self.voice_id,
+                'model_id': self.model_id,
+                'format': output_format
+            }
+        )
+        
+        chunks = []
+        async for chunk in self.async_client.text_to_speech.convert(**self._convert_args(text, output_format)):
+            chunks.append(chunk)
+        
+        await run_storage(self._store_audio, b''.join(chunks), output_format, cache_key, action.ActionID)
+        return action.ActionID
+    
+    def _store_audio(self, audio: bytes, output_format: str, cache_key: str, action_id: int):
+        audio_path = self.audio_cache.path_for(cache_key, output_format)
+        fd, tmp_path = tempfile.mkstemp(dir=self.audio_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(audio)
+            os.replace(tmp_path, audio_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        self.audio_cache.add(cache_key, audio_path, pin=False)
+        
+        self.action_db.update_action_response(action_id, {
+            'audio_path': audio_path,
+            'audio_size': len(audio),
+            'voice_id': self.voice_id,
+            'model_id': self.model_id
+        })
+    
+    def _cached_result(self, cache_key: str, audio_path: str) -> Dict:
+        return {
+            'success': True,
+            'audio_path': audio_path,
+            'cache_key': cache_key,
+            'cached': True,
+            'action_id': None
+        }
+    
+    def _convert_args(self, text: str, output_format: str) -> Dict:
+        format_map = {
+            'mp3': 'mp3_44100_128',
+            'wav': 'pcm_44100'
+        }
+        
+        return {
+            'text': text,
+            'voice_id': self.voice_id,
+            'model_id': self.model_id,
+            'output_format': format_map.get(output_format.lower(), 'mp3_44100_128'),
+            # Retries are handled by the shared HTTP client
+            'request_options': {'max_retries': 0}
+        }
+    
+    def _begin_flight(self, cache_key: str):
+        """
+        Become the one request synthesizing cache_key, or wait for the one
+        already doing it. Returns the Flight to complete when leading, or the
+        cached result (pinned, as from synthesize_speech) when another
+        request produced the file. If that request was abandoned before
+        finishing, try again.
+        """
+        while True:
+            flight, leader = self.single_flight.begin(cache_key)
+            if leader:
+                return flight
+            
+            result = flight.wait()  # re-raises the leader's error
+            if not result.get('success'):
+                continue
+            
+            audio_path = self.audio_cache.acquire(cache_key)
+            if audio_path:
+                return self._cached_result(cache_key, audio_path)
+    
+    def _synthesize_to_cache(self, text: str, output_format: str, cache_key: str, 
+                             action_id: int, pin: bool = True) -> Iterator[bytes]:
+        """
+        Yield audio chunks from ElevenLabs while writing them to the cache
+        
+        The chunks go to a temporary file that is renamed into place only
+        after the last one, so the cache never exposes a partial file. If
+        the consumer stops early, the partial file is discarded.
+        """
+        audio_generator = self.client.text_to_speech.convert(**self._convert_args(text, output_format))
+        
+        audio_path = self.audio_cache.path_for(cache_key, output_format)
+        fd, tmp_path = tempfile.mkstemp(dir=self.audio_dir, suffix='.part')
+        audio_size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in audio_generator:
+                    out.write(chunk)
+                    audio_size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, audio_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        self.audio_cache.add(cache_key, audio_path, pin=pin)
+        
+        self.action_db.update_action_response(action_id, {
+            'audio_path': audio_path,
+            'audio_size': audio_size,
+            'voice_id': self.voice_id,
+            'model_id': self.model_id
+        })
+    
+    def release_audio(self, tts_result: Dict):
+        """Unpin the cached file returned by synthesize_speech"""
+        if tts_result.get('cache_key'):
+            self.audio_cache.release(tts_result['cache_key'])
     
     def get_audio_content(self, audio_path: str) -> Optional[bytes]:
         """Read audio file and return content"""
@@ -3,23 +3,47 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from backend.utils.config import Config
+from backend.utils.http_client import http_clients
+from backend.utils.async_storage import run_storage
 from database.db_manager import CSVDatabase
-from database.action_db import ActionDB, ThirdPartyAPIDB
-from database.vocab_db import VocabularyDB
+from database.action_db import ActionDB, ThirdPartyAPIDB, ActionAuditQueue
+from database.vocab_db import VocabularyDB, DictionaryDB
+from database.dictionary_index import DictionaryIndex, parse_word_data
 from backend.utils.validators import validate_vocab_word
-from typing import Dict
-import requests
+from backend.services.single_flight import SingleFlight, AsyncSingleFlight
+from backend.services.dictionary_cache import DictionaryCache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import httpx
 
 class VocabService:
     """Vocabulary lookup service using Dictionary API"""
     
-    def __init__(self, db: CSVDatabase):
-        self.action_db = ActionDB(db)
+    def __init__(self, db: CSVDatabase, audit_queue: Optional[ActionAuditQueue] = None):
+        self.action_db = ActionDB(db, audit_queue)
         self.api_db = ThirdPartyAPIDB(db)
         self.vocab_db = VocabularyDB(db)
         self.api_url = Config.DICTIONARY_API_URL
+        self.http = http_clients.client('dictionary')
+        self.async_http = http_clients.async_client('dictionary')
         
         self.api_config = self.api_db.get_api_by_type('dictionary')
+        # Concurrent lookups of the same word share one Dictionary API call
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        # Definitions shared across users, so a word is fetched once for everyone
+        self.dictionary_cache = DictionaryCache(
+            max_size=Config.DICTIONARY_CACHE_SIZE,
+            ttl=Config.DICTIONARY_CACHE_TTL,
+            store=DictionaryDB(db) if Config.DICTIONARY_CACHE_PERSIST else None
+        )
+        # Offline index built with `python -m database.dictionary_index`, if present
+        self.dictionary_index = DictionaryIndex(Config.DICTIONARY_INDEX_DIR)
+        # Bounds how many Dictionary API calls batch lookups make at once
+        self._fetch_executor = ThreadPoolExecutor(
+            max_workers=Config.VOCAB_FETCH_WORKERS,
+            thread_name_prefix='vocab-fetch'
+        )
     
     def lookup_word(self, word: str, user_id: int) -> Dict:
         """
@@ -39,107 +63,361 @@ class VocabService:
                 'error': error
             }
         
-        word = word.strip().lower()
+        word = DictionaryCache.normalize(word)
         
         existing = self.vocab_db.check_word_exists(user_id, word)
         if existing:
-            return {
-                'success': True,
-                'word': word,
-                'meaning': existing.Meaning,
-                'pronunciation': existing.Pronunciation,
-                'audio': existing.Audio,
-                'from_history': True
-            }
+            return self._history_result(word, existing)
         
         try:
-            request_data = {
-                'word': word
-            }
+            result = self._resolve_local(word) or self._resolve_remote(word)
+            if not result['success']:
+                return result
             
-            action = self.action_db.create_action(
-                api_id=self.api_config.APIID if self.api_config else 4,
-                request=request_data
-            )
+            vocab = self._save_lookup(user_id, word, result)
+            return self._lookup_result(word, result, vocab)
             
-            url = f"{self.api_url}/{word}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                return {
-                    'success': False,
-                    'error': 'Không tìm thấy từ trong từ điển'
-                }
+        except httpx.HTTPError as e:
+            print(f"Error calling Dictionary API: {e}")
+            return {
+                'success': False,
+                'error': 'Lỗi kết nối đến Dictionary API'
+            }
+        except Exception as e:
+            print(f"Error in lookup_word: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def alookup_word(self, word: str, user_id: int) -> Dict:
+        """
+        Async variant of lookup_word for the ASGI serving mode
+        
+        The Dictionary API is called on the shared async HTTP pool; storage
+        and cache lookups run on the storage executor.
+        """
+        valid, error = validate_vocab_word(word)
+        if not valid:
+            return {
+                'success': False,
+                'error': error
+            }
+        
+        word = DictionaryCache.normalize(word)
+        
+        try:
+            existing = await run_storage(self.vocab_db.check_word_exists, user_id, word)
+            if existing:
+                return self._history_result(word, existing)
             
-            data = response.json()
+            result = await run_storage(self._resolve_local, word)
+            if not result:
+                result, _ = await self.async_single_flight.do(word, self._afetch_definition, word)
+                if not result['success']:
+                    return result
+                result = dict(result, source='api')
             
-            if not data or len(data) == 0:
-                return {
-                    'success': False,
-                    'error': 'Không có dữ liệu từ điển'
-                }
+            vocab = await run_storage(self._save_lookup, user_id, word, result)
+            return self._lookup_result(word, result, vocab)
             
-            word_data = data[0]
+        except httpx.HTTPError as e:
+            print(f"Error calling Dictionary API: {e}")
+            return {
+                'success': False,
+                'error': 'Lỗi kết nối đến Dictionary API'
+            }
+        except Exception as e:
+            print(f"Error in alookup_word: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _history_result(self, word: str, existing) -> Dict:
+        existing = self._with_definition(existing)
+        return {
+            'success': True,
+            'word': word,
+            'meaning': existing.Meaning,
+            'pronunciation': existing.Pronunciation,
+            'audio': existing.Audio,
+            'from_history': True
+        }
+    
+    def _save_lookup(self, user_id: int, word: str, result: Dict):
+        # The user's row points at the action that fetched the shared definition
+        return self.vocab_db.create_vocabulary(
+            user_id=user_id,
+            vocab=word,
+            action_id=result['action_id'],
+            **self._row_definition(result)
+        )
+    
+    def _row_definition(self, result: Dict) -> Dict:
+        """
+        Definition fields for a new vocabulary row. A definition kept in the
+        persistent dictionary tier is referenced by the word rather than
+        copied, and filled in by _with_definition when the row is read.
+        """
+        if self.dictionary_cache.store and result['source'] in ('cache', 'api'):
+            return {'meaning': '', 'pronunciation': '', 'audio': ''}
+        return {
+            'meaning': result['meaning'],
+            'pronunciation': result['pronunciation'],
+            'audio': result['audio']
+        }
+    
+    def _with_definition(self, vocab):
+        """Fill in the definition of a row that references the shared dictionary"""
+        if not vocab.Meaning:
+            entry = self.dictionary_cache.definition(vocab.Vocab)
+            if entry:
+                vocab.Meaning = entry.Meaning
+                vocab.Pronunciation = entry.Pronunciation
+                vocab.Audio = entry.Audio
+        return vocab
+    
+    def _lookup_result(self, word: str, result: Dict, vocab) -> Dict:
+        return {
+            'success': True,
+            'word': word,
+            'meaning': result['meaning'],
+            'pronunciation': result['pronunciation'],
+            'audio': result['audio'],
+            'vocab_id': vocab.VocabID,
+            'from_history': False,
+            'from_index': result['source'] == 'index',
+            'from_cache': result['source'] == 'cache'
+        }
+    
+    def lookup_words(self, words: List[str], user_id: int) -> Dict:
+        """
+        Tra cứu nhiều từ cùng lúc (ví dụ mọi từ trong một tin nhắn AI)
+        
+        Duplicates are looked up once. Words from the user's history, the
+        offline index and the shared cache are resolved in memory; the
+        rest are fetched concurrently on the service's bounded fetch pool,
+        and all new vocabulary rows are saved with a single write.
+        
+        Args:
+            words: English words to lookup
+            user_id: User ID
+        
+        Returns:
+            Dictionary with results and errors, both keyed by normalized word
+            (input that is not a string is keyed by str(word))
+        """
+        if len(words) > Config.VOCAB_BATCH_MAX_WORDS:
+            return {
+                'success': False,
+                'error': f'Tối đa {Config.VOCAB_BATCH_MAX_WORDS} từ mỗi lần tra'
+            }
+        
+        try:
+            results = {}
+            errors = {}
+            pending = []
+            for raw in words:
+                word = DictionaryCache.normalize(raw) if isinstance(raw, str) else str(raw)
+                valid, error = validate_vocab_word(raw)
+                if not valid:
+                    errors[word] = error
+                    continue
+                if word not in results and word not in errors and word not in pending:
+                    pending.append(word)
             
-            pronunciation = ""
-            if 'phonetic' in word_data:
-                pronunciation = word_data['phonetic']
-            elif 'phonetics' in word_data and len(word_data['phonetics']) > 0:
-                pronunciation = word_data['phonetics'][0].get('text', '')
+            history = self.vocab_db.get_user_words(user_id)
+            resolved = {}
+            misses = []
+            for word in pending:
+                existing = history.get(word)
+                if existing:
+                    existing = self._with_definition(existing)
+                    results[word] = {
+                        'meaning': existing.Meaning,
+                        'pronunciation': existing.Pronunciation,
+                        'audio': existing.Audio,
+                        'vocab_id': existing.VocabID,
+                        'from_history': True
+                    }
+                    continue
+                
+                try:
+                    local = self._resolve_local(word)
+                except Exception as e:
+                    print(f"Error reading local dictionary for '{word}': {e}")
+                    local = None
+                if local:
+                    resolved[word] = local
+                else:
+                    misses.append(word)
             
-            audio_url = ""
-            if 'phonetics' in word_data:
-                for phonetic in word_data['phonetics']:
-                    if 'audio' in phonetic and phonetic['audio']:
-                        audio_url = phonetic['audio']
-                        break
+            futures = {word: self._fetch_executor.submit(self._resolve_remote, word) for word in misses}
+            for word, future in futures.items():
+                try:
+                    result = future.result()
+                except httpx.HTTPError as e:
+                    print(f"Error calling Dictionary API: {e}")
+                    result = {'success': False, 'error': 'Lỗi kết nối đến Dictionary API'}
+                except Exception as e:
+                    # One bad word must not fail the rest of the batch
+                    print(f"Error looking up '{word}': {e}")
+                    result = {'success': False, 'error': str(e)}
+                
+                if result['success']:
+                    resolved[word] = result
+                else:
+                    errors[word] = result['error']
             
-            meaning = ""
-            if 'meanings' in word_data and len(word_data['meanings']) > 0:
-                first_meaning = word_data['meanings'][0]
-                if 'definitions' in first_meaning and len(first_meaning['definitions']) > 0:
-                    meaning = first_meaning['definitions'][0].get('definition', '')
-                    
-                    example = first_meaning['definitions'][0].get('example', '')
-                    if example:
-                        meaning += f"\nExample: {example}"
+            created = self.vocab_db.create_vocabularies(user_id, [
+                dict(self._row_definition(result), vocab=word, action_id=result['action_id'])
+                for word, result in resolved.items()
+            ])
+            for vocab in created:
+                result = resolved[vocab.Vocab]
+                results[vocab.Vocab] = {
+                    'meaning': result['meaning'],
+                    'pronunciation': result['pronunciation'],
+                    'audio': result['audio'],
+                    'vocab_id': vocab.VocabID,
+                    'from_history': False
+                }
             
-            response_data = {
-                'word': word,
-                'pronunciation': pronunciation,
-                'meaning': meaning,
-                'audio': audio_url
+            return {
+                'success': True,
+                'results': results,
+                'errors': errors
             }
             
-            self.action_db.update_action_response(action.ActionID, response_data)
-            
-            vocab = self.vocab_db.create_vocabulary(
-                user_id=user_id,
-                vocab=word,
-                meaning=meaning,
-                pronunciation=pronunciation,
-                audio=audio_url,
-                action_id=action.ActionID
-            )
-            
+        except Exception as e:
+            print(f"Error in lookup_words: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _resolve_local(self, word: str) -> Optional[Dict]:
+        """Definition from the offline index or the shared cache, without any API call"""
+        local = self.dictionary_index.lookup(word)
+        if local:
             return {
                 'success': True,
-                'word': word,
-                'meaning': meaning,
-                'pronunciation': pronunciation,
-                'audio': audio_url,
-                'vocab_id': vocab.VocabID,
-                'from_history': False
+                'meaning': local['meaning'],
+                'pronunciation': local['pronunciation'],
+                'audio': local['audio'],
+                'action_id': None,
+                'source': 'index'
             }
-            
-        except requests.RequestException as e:
-            print(f"Error calling Dictionary API: {e}")
+        
+        entry = self.dictionary_cache.get(word)
+        if entry:
+            return {
+                'success': True,
+                'meaning': entry.Meaning,
+                'pronunciation': entry.Pronunciation,
+                'audio': entry.Audio,
+                'action_id': entry.ActionID,
+                'source': 'cache'
+            }
+        return None
+    
+    def _resolve_remote(self, word: str) -> Dict:
+        """Definition from the Dictionary API, sharing the call with concurrent lookups"""
+        result, _ = self.single_flight.do(word, self._fetch_definition, word)
+        if result['success']:
+            result = dict(result, source='api')
+        return result
+    
+    def _fetch_definition(self, word: str) -> Dict:
+        """
+        Gọi Dictionary API cho một từ (đã chuẩn hoá)
+        
+        Returns:
+            Dictionary with meaning, pronunciation, audio, action_id and the
+            cached DictionaryEntry
+        """
+        action = self._start_fetch(word)
+        response = self.http.get(f"{self.api_url}/{word}")
+        return self._finish_fetch(word, response, action)
+    
+    async def _afetch_definition(self, word: str) -> Dict:
+        """_fetch_definition on the async HTTP pool, with storage on the storage executor"""
+        action = await run_storage(self._start_fetch, word)
+        response = await self.async_http.get(f"{self.api_url}/{word}")
+        return await run_storage(self._finish_fetch, word, response, action)
+    
+    def _start_fetch(self, word: str):
+        request_data = {
+            'word': word
+        }
+        
+        return self.action_db.create_action(
+            api_id=self.api_config.APIID if self.api_config else 4,
+            request=request_data
+        )
+    
+    def _finish_fetch(self, word: str, response: httpx.Response, action) -> Dict:
+        """Parse a Dictionary API response, log it and add it to the shared cache"""
+        if response.status_code != 200:
             return {
                 'success': False,
-                'error': 'Lỗi kết nối đến Dictionary API'
+                'error': 'Không tìm thấy từ trong từ điển'
+            }
+        
+        data = response.json()
+        
+        if not data or len(data) == 0:
+            return {
+                'success': False,
+                'error': 'Không có dữ liệu từ điển'
+            }
+        
+        parsed = parse_word_data(data[0])
+        meaning = parsed['meaning']
+        pronunciation = parsed['pronunciation']
+        audio_url = parsed['audio']
+        
+        response_data = {
+            'word': word,
+            'pronunciation': pronunciation,
+            'meaning': meaning,
+            'audio': audio_url
+        }
+        
+        self.action_db.update_action_response(action.ActionID, response_data)
+        
+        entry = self.dictionary_cache.put(word, meaning, pronunciation, audio_url, action.ActionID)
+        
+        return {
+            'success': True,
+            'word': word,
+            'meaning': meaning,
+            'pronunciation': pronunciation,
+            'audio': audio_url,
+            'action_id': action.ActionID,
+            'entry': entry
+        }
+    
+    def suggest_words(self, prefix: str, limit: int = 10) -> Dict:
+        """
+        Gợi ý từ bắt đầu bằng prefix (từ điển offline)
+        
+        Args:
+            prefix: Beginning of the word being typed
+            limit: Maximum number of suggestions
+        
+        Returns:
+            Dictionary with suggestions list
+        """
+        try:
+            suggestions = self.dictionary_index.suggest(prefix, limit)
+            return {
+                'success': True,
+                'suggestions': suggestions
             }
         except Exception as e:
-            print(f"Error in lookup_word: {e}")
+            print(f"Error in suggest_words: {e}")
             return {
                 'success': False,
                 'error': str(e)
@@ -156,7 +434,7 @@ class VocabService:
             Dictionary with vocabulary list
         """
         try:
-            vocabs = self.vocab_db.get_user_vocabulary(user_id)
+            vocabs = [self._with_definition(v) for v in self.vocab_db.get_user_vocabulary(user_id)]
             
             vocab_list = []
             for v in vocabs:
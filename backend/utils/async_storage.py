@@ -0,0 +1,27 @@
+"""
+Bounded executor for blocking storage calls made from async code
+
+The CSV/SQLite layer is synchronous. In the ASGI serving mode (backend/asgi.py)
+coroutines hand those calls to this pool so the event loop never blocks on
+disk I/O or table locks, and at most ASYNC_STORAGE_WORKERS run at once.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from backend.utils.config import Config
+
+storage_executor = ThreadPoolExecutor(
+    max_workers=Config.ASYNC_STORAGE_WORKERS,
+    thread_name_prefix='async-storage'
+)
+
+async def run_storage(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking storage call on the storage pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, functools.partial(fn, *args, **kwargs))
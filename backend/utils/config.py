@@ -4,16 +4,34 @@ from dotenv import load_dotenv
 # Load environment variables từ .env file
 load_dotenv()
 
+def _http_settings(prefix: str, pool_size: int, timeout: float, retries: int, backoff: float) -> dict:
+    """Connection pool settings for one provider, overridable with <PREFIX>_HTTP_* variables"""
+    return {
+        'pool_size': int(os.getenv(f'{prefix}_HTTP_POOL_SIZE', pool_size)),
+        'timeout': float(os.getenv(f'{prefix}_HTTP_TIMEOUT', timeout)),
+        'retries': int(os.getenv(f'{prefix}_HTTP_RETRIES', retries)),
+        'backoff': backoff
+    }
+
 class Config:
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     PORT = int(os.getenv('PORT', 5000))
     HOST = os.getenv('HOST', '127.0.0.1')
+    # Largest request body accepted, in bytes (audio uploads); enforced by Flask and backend/asgi.py
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
     
     # LLM API settings
     LITELLM_API_KEY = os.getenv('LITELLM_API_KEY', '')
     LITELLM_MODEL = os.getenv('LITELLM_MODEL', 'gpt-3.5-turbo')
+    # Conversation history sent with each message: the last LLM_HISTORY_TURNS turns
+    # verbatim, older turns as a summary updated in the background every
+    # LLM_SUMMARY_CHUNK messages
+    LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', 3000))
+    LLM_HISTORY_TURNS = int(os.getenv('LLM_HISTORY_TURNS', 6))
+    LLM_SUMMARY_CHUNK = int(os.getenv('LLM_SUMMARY_CHUNK', 10))
+    LLM_SUMMARY_WORDS = int(os.getenv('LLM_SUMMARY_WORDS', 200))
     
     # ElevenLabs API settings
     ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY', '')
@@ -25,33 +43,107 @@ class Config:
     # Dictionary API settings
     DICTIONARY_API_URL = os.getenv('DICTIONARY_API_URL', 
                                     'https://api.dictionaryapi.dev/api/v2/entries/en')
+    # Definitions cached for all users; persisted to data/dictionary.csv when enabled
+    DICTIONARY_CACHE_SIZE = int(os.getenv('DICTIONARY_CACHE_SIZE', 10000))
+    DICTIONARY_CACHE_TTL = float(os.getenv('DICTIONARY_CACHE_TTL', 30 * 24 * 3600))
+    DICTIONARY_CACHE_PERSIST = os.getenv('DICTIONARY_CACHE_PERSIST', 'True') == 'True'
+    # Offline index checked before the API (see database/dictionary_index.py)
+    DICTIONARY_INDEX_DIR = os.getenv('DICTIONARY_INDEX_DIR', os.path.join('data', 'dictionary_index'))
+    # Batch lookups: words per request, and Dictionary API calls made at once
+    VOCAB_BATCH_MAX_WORDS = int(os.getenv('VOCAB_BATCH_MAX_WORDS', 200))
+    VOCAB_FETCH_WORKERS = int(os.getenv('VOCAB_FETCH_WORKERS', 4))
     
     # Database settings
     DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
     AUDIO_DIR = os.path.join(DATA_DIR, 'audio')
+    # Synthesized speech is cached in AUDIO_DIR up to this size
+    TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', 500))
+    # Sentences synthesized at once while a spoken reply is streaming
+    TTS_PIPELINE_WORKERS = int(os.getenv('TTS_PIPELINE_WORKERS', 3))
+    # Synthesize new AI replies in the background for these conversation modes
+    # (comma separated, e.g. "continuous"; empty disables prefetching)
+    TTS_PREFETCH_MODES = [m.strip() for m in os.getenv('TTS_PREFETCH_MODES', '').split(',') if m.strip()]
+    TTS_PREFETCH_WORKERS = int(os.getenv('TTS_PREFETCH_WORKERS', 2))
+    TTS_PREFETCH_QUEUE = int(os.getenv('TTS_PREFETCH_QUEUE', 32))
+    # Storage backend: 'csv' (data/*.csv) or 'sqlite'
+    DB_BACKEND = os.getenv('DB_BACKEND', 'csv')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join('data', 'app.db'))
+    # Keep parsed CSV tables in memory, reloading only when a file changes on disk
+    # (journaled tables such as action.csv are kept in memory either way). Without
+    # it every lookup re-parses its CSV, so concurrent reads do not scale.
+    DB_CACHE = os.getenv('DB_CACHE', 'False') == 'True'
+    
+    # Recent conversation transcripts kept in memory (0 disables the cache)
+    MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', 256))
+    MESSAGE_CACHE_TTL = float(os.getenv('MESSAGE_CACHE_TTL', 1800))
+    
+    # Login sessions: 'memory' (one process), 'sqlite' (shared by the processes
+    # on this host) or 'redis' (shared by every host); expire after SESSION_TTL
+    # seconds without a request or SESSION_MAX_AGE seconds after login
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+    SESSION_TTL = float(os.getenv('SESSION_TTL', 24 * 3600))
+    SESSION_MAX_AGE = float(os.getenv('SESSION_MAX_AGE', 30 * 24 * 3600))
+    # Sessions kept per user (0 = unlimited); logging in again drops the oldest
+    SESSION_MAX_PER_USER = int(os.getenv('SESSION_MAX_PER_USER', 10))
+    # Seconds between sweeps removing expired sessions
+    SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', 60))
+    SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', os.path.join('data', 'sessions.db'))
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    # Passwords: bcrypt work factor (older hashes are upgraded on login), threads
+    # hashing at once, and hashes allowed to wait before logins get HTTP 429
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+    # Failed logins allowed per account and per IP every LOGIN_RATE_WINDOW seconds
+    LOGIN_RATE_PER_ACCOUNT = int(os.getenv('LOGIN_RATE_PER_ACCOUNT', 10))
+    LOGIN_RATE_PER_IP = int(os.getenv('LOGIN_RATE_PER_IP', 30))
+    LOGIN_RATE_WINDOW = float(os.getenv('LOGIN_RATE_WINDOW', 60))
+    # 'session' (stored sessions) or 'signed' (stateless HMAC tokens over SECRET_KEY,
+    # valid for SIGNED_TOKEN_TTL seconds; revocations are kept per process)
+    AUTH_TOKEN_MODE = os.getenv('AUTH_TOKEN_MODE', 'session')
+    SIGNED_TOKEN_TTL = float(os.getenv('SIGNED_TOKEN_TTL', 3600))
+    # Seconds a session's resolved user is reused before it is read again
+    SESSION_USER_CACHE_TTL = float(os.getenv('SESSION_USER_CACHE_TTL', 60))
+    
+    # Action (audit) log: 'sync' writes inline, 'async' writes behind the
+    # request (faster, but queued rows are lost if the process crashes)
+    AUDIT_MODE = os.getenv('AUDIT_MODE', 'sync')
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 100))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+    
+    # ASGI mode (backend/asgi.py): threads for blocking storage calls
+    ASYNC_STORAGE_WORKERS = int(os.getenv('ASYNC_STORAGE_WORKERS', 16))
     
-    # API Configuration
+    # Outbound HTTP: wait between retries is backoff * 2**attempt seconds
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', 0.5))
+    
+    # API Configuration ('http' is the connection pool used for each provider)
     API_CONFIGS = {
         'LLM': {
             'provider': 'openai',
             'api_key': LITELLM_API_KEY,
-            'model': LITELLM_MODEL
+            'model': LITELLM_MODEL,
+            'http': _http_settings('LLM', pool_size=10, timeout=120, retries=2, backoff=HTTP_RETRY_BACKOFF)
         },
         'speech-to-text': {
             'provider': 'elevenlabs',
             'api_key': ELEVENLABS_API_KEY,
             'language': ELEVENLABS_LANGUAGE,
-            'model': ELEVENLABS_STT_MODEL
+            'model': ELEVENLABS_STT_MODEL,
+            'http': _http_settings('STT', pool_size=4, timeout=60, retries=2, backoff=HTTP_RETRY_BACKOFF)
         },
         'text-to-speech': {
             'provider': 'elevenlabs',
             'api_key': ELEVENLABS_API_KEY,
             'voice_id': ELEVENLABS_VOICE_ID,
-            'model': ELEVENLABS_MODEL_ID
+            'model': ELEVENLABS_MODEL_ID,
+            'http': _http_settings('TTS', pool_size=8, timeout=60, retries=2, backoff=HTTP_RETRY_BACKOFF)
         },
         'dictionary': {
             'provider': 'free',
-            'url': DICTIONARY_API_URL
+            'url': DICTIONARY_API_URL,
+            'http': _http_settings('DICTIONARY', pool_size=10, timeout=10, retries=2, backoff=HTTP_RETRY_BACKOFF)
         }
     }
     
@@ -69,3 +161,24 @@ class Config:
             warnings.append("Using default SECRET_KEY - change this in production!")
         
         return warnings
+    
+    @classmethod
+    def multi_worker_warnings(cls):
+        """
+        A shared session store means several worker processes; the rest of
+        the per-process state has to be shared or turned off as well
+        """
+        warnings = []
+        if cls.SESSION_BACKEND == 'memory':
+            return warnings
+        
+        if cls.DB_BACKEND != 'sqlite':
+            warnings.append("SESSION_BACKEND is shared but DB_BACKEND is csv - "
+                            "use DB_BACKEND=sqlite with several workers")
+        if cls.MESSAGE_CACHE_SIZE > 0:
+            warnings.append("SESSION_BACKEND is shared but MESSAGE_CACHE_SIZE > 0 - "
+                            "set it to 0 with several workers")
+        if cls.AUTH_TOKEN_MODE == 'signed':
+            warnings.append("Signed token revocations are not shared between workers - "
+                            "keep SIGNED_TOKEN_TTL short")
+        return warnings
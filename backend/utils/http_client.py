@@ -0,0 +1,306 @@
+"""
+Shared outbound HTTP clients
+
+Every third-party API (see Config.API_CONFIGS) gets one pooled keep-alive
+httpx.Client, so repeated calls reuse TCP/TLS connections instead of
+opening a new one each time. Each provider has its own pool size, timeout
+and retry policy, and its transport keeps counters for /api/metrics.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import asyncio
+import threading
+import time
+from typing import Dict
+
+import httpx
+
+from backend.utils.config import Config
+
+# Responses after which a request can be sent again. A gateway error (502,
+# 504) may come after the upstream already accepted the request, so only
+# idempotent methods are retried on those; a POST (chat, TTS, STT) is billed
+# again if repeated.
+RETRY_STATUSES = {429, 502, 503, 504}
+NON_IDEMPOTENT_RETRY_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'}
+MAX_RETRY_AFTER = 30
+
+class PoolStats:
+    """Request counters for one provider's connection pool"""
+    
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0
+        self.pool_timeouts = 0
+        self.retries = 0
+        self.errors = 0
+    
+    def start(self):
+        with self._lock:
+            self.requests += 1
+            if self.in_flight >= self.max_connections:
+                # Every connection is busy; this request waits for one
+                self.saturated += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+    
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+    
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'max_connections': self.max_connections,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'utilization': self.in_flight / self.max_connections,
+                'requests': self.requests,
+                'saturated': self.saturated,
+                'pool_timeouts': self.pool_timeouts,
+                'retries': self.retries,
+                'errors': self.errors
+            }
+
+class _MeteredAsyncStream(httpx.AsyncByteStream):
+    """Async response body that marks the request finished when it is closed"""
+    
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+    
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+    
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+class _MeteredStream(httpx.SyncByteStream):
+    """Response body that marks the request finished when it is closed"""
+    
+    def __init__(self, stream: httpx.SyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+    
+    def __iter__(self):
+        yield from self._stream
+    
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+class MeteredTransport(httpx.BaseTransport):
+    """
+    Pooled transport that retries with exponential backoff and counts usage.
+    
+    Connection failures are retried up to retries times, waiting
+    backoff * 2**attempt seconds (or the server's Retry-After), as are
+    RETRY_STATUSES responses to idempotent methods; other methods are only
+    retried on NON_IDEMPOTENT_RETRY_STATUSES. A request counts as in flight until its response body
+    is closed, so streamed responses hold their slot while being read.
+    """
+    
+    def __init__(self, max_connections: int, retries: int, backoff: float):
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = PoolStats(max_connections)
+    
+    def _delay(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        return self.backoff * (2 ** attempt)
+    
+    def _can_retry(self, attempt: int, request: httpx.Request, response: httpx.Response) -> bool:
+        if request.method in IDEMPOTENT_METHODS:
+            statuses = RETRY_STATUSES
+        else:
+            statuses = NON_IDEMPOTENT_RETRY_STATUSES
+        if response.status_code in statuses and attempt < self.retries:
+            return True
+        if response.status_code >= 500:
+            self.stats.count('errors')
+        return False
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # Buffer the body so it can be sent again
+        request.read()
+        
+        self.stats.start()
+        attempt = 0
+        while True:
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.PoolTimeout:
+                self.stats.count('pool_timeouts')
+                self.stats.finish()
+                raise
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.retries:
+                    self.stats.count('errors')
+                    self.stats.finish()
+                    raise
+                delay = self._delay(attempt)
+            except Exception:
+                self.stats.count('errors')
+                self.stats.finish()
+                raise
+            else:
+                if not self._can_retry(attempt, request, response):
+                    response.stream = _MeteredStream(response.stream, self.stats.finish)
+                    return response
+                delay = self._delay(attempt, response)
+                response.close()
+            
+            self.stats.count('retries')
+            attempt += 1
+            time.sleep(delay)
+    
+    def close(self):
+        self._transport.close()
+
+class AsyncMeteredTransport(MeteredTransport, httpx.AsyncBaseTransport):
+    """MeteredTransport for httpx.AsyncClient, used by the ASGI serving mode"""
+    
+    def __init__(self, max_connections: int, retries: int, backoff: float):
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = PoolStats(max_connections)
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        
+        self.stats.start()
+        attempt = 0
+        while True:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.PoolTimeout:
+                self.stats.count('pool_timeouts')
+                self.stats.finish()
+                raise
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.retries:
+                    self.stats.count('errors')
+                    self.stats.finish()
+                    raise
+                delay = self._delay(attempt)
+            except Exception:
+                self.stats.count('errors')
+                self.stats.finish()
+                raise
+            else:
+                if not self._can_retry(attempt, request, response):
+                    response.stream = _MeteredAsyncStream(response.stream, self.stats.finish)
+                    return response
+                delay = self._delay(attempt, response)
+                await response.aclose()
+            
+            self.stats.count('retries')
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def aclose(self):
+        await self._transport.aclose()
+
+class HTTPClients:
+    """
+    One lazily created httpx.Client per API type in Config.API_CONFIGS, and
+    an httpx.AsyncClient with its own pool of the same size for async callers
+    """
+    
+    def __init__(self, api_configs: Dict):
+        self.api_configs = api_configs
+        self._clients = {}
+        self._async_clients = {}
+        self._transports = {}
+        self._lock = threading.Lock()
+    
+    def settings(self, api_type: str) -> Dict:
+        return self.api_configs[api_type]['http']
+    
+    def client(self, api_type: str) -> httpx.Client:
+        with self._lock:
+            client = self._clients.get(api_type)
+            if client is None:
+                http = self.settings(api_type)
+                transport = MeteredTransport(http['pool_size'], http['retries'], http['backoff'])
+                client = httpx.Client(transport=transport, timeout=http['timeout'], follow_redirects=True)
+                self._clients[api_type] = client
+                self._transports[api_type] = transport
+            return client
+    
+    def async_client(self, api_type: str) -> httpx.AsyncClient:
+        with self._lock:
+            client = self._async_clients.get(api_type)
+            if client is None:
+                http = self.settings(api_type)
+                transport = AsyncMeteredTransport(http['pool_size'], http['retries'], http['backoff'])
+                client = httpx.AsyncClient(transport=transport, timeout=http['timeout'], follow_redirects=True)
+                self._async_clients[api_type] = client
+                self._transports[f'{api_type} (async)'] = transport
+            return client
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            transports = dict(self._transports)
+        return {
+            api_type: transport.stats.to_dict()
+            for api_type, transport in transports.items()
+        }
+    
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._transports = {
+                name: transport for name, transport in self._transports.items()
+                if isinstance(transport, AsyncMeteredTransport)
+            }
+    
+    async def aclose(self):
+        """Close the async clients; called when the ASGI app shuts down"""
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+            self._transports = {
+                name: transport for name, transport in self._transports.items()
+                if not isinstance(transport, AsyncMeteredTransport)
+            }
+        for client in clients:
+            await client.aclose()
+
+http_clients = HTTPClients(Config.API_CONFIGS)
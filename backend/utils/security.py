@@ -1,11 +1,20 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
 import bcrypt
 import secrets
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from backend.utils.config import Config
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
     password_bytes = password.encode('utf-8')
     
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or Config.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     
     return hashed.decode('utf-8')
@@ -19,6 +28,81 @@ def verify_password(password: str, hashed_password: str) -> bool:
         print(f"Error verifying password: {e}")
         return False
 
+def needs_rehash(hashed_password: str, rounds: Optional[int] = None) -> bool:
+    """True if the hash was made with a different work factor than rounds"""
+    try:
+        # $2b$<cost>$<salt and hash>
+        return int(hashed_password.split('$')[2]) != (rounds or Config.BCRYPT_ROUNDS)
+    except (IndexError, ValueError):
+        return False
+
+class PasswordPoolBusy(RuntimeError):
+    """Raised when too many password hashes are already waiting"""
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool.
+    
+    bcrypt releases the GIL while hashing, so at most max_workers cores are
+    spent on it however many logins arrive, and request threads serving
+    chat keep running. The calling thread waits for its result. Once
+    max_queue hashes are running or waiting, new ones are refused with
+    PasswordPoolBusy instead of queueing behind them.
+    """
+    
+    def __init__(self, max_workers: int = 2, max_queue: int = 16):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    def backlogged(self) -> bool:
+        """True once the queue is half full"""
+        with self._lock:
+            return self.pending >= max(self.max_workers, self.max_queue // 2)
+    
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy('Password hashing queue is full')
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+    
+    def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        return self._run(hash_password, password, rounds)
+    
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run(verify_password, password, hashed_password)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'peak_pending': self.peak_pending,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_QUEUE)
+
 def generate_session_token() -> str:
     return secrets.token_urlsafe(32)
 
@@ -51,14 +51,14 @@ def validate_message(message: str) -> Tuple[bool, Optional[str]]:
     return True, None
 
 def validate_vocab_word(word: str) -> Tuple[bool, Optional[str]]:
-    if not word or not word.strip():
-        return False,
+    if not isinstance(word, str) or not word.strip():
+        return False, "Từ không được để trống"
     
     if len(word) > 100:
-        return False,
+        return False, "Từ không được dài quá 100 ký tự"
     
     # Only allow letters, spaces, hyphens
     if not re.match(r'^[a-zA-Z\s\-]+$', word):
-        return False,
+        return False, "Từ chỉ được chứa chữ cái, khoảng trắng và dấu gạch ngang"
     
     return True, None
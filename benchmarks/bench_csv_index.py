@@ -0,0 +1,78 @@
+"""
+Benchmark: equality lookups on CSVDatabase with and without a hash index
+
+Usage:
+    python -m benchmarks.bench_csv_index [--max-rows 1000000] [--lookups 2000]
+
+Builds a message-like table at 1k, 10k, 100k and 1M rows and times
+find_by_field / find_all_by_field. With an index the per-lookup cost stays
+flat; the linear scan grows with the row count.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import random
+import shutil
+import tempfile
+import time
+
+from database.db_manager import CSVDatabase
+
+FILENAME = "user_message.csv"
+FIELDNAMES = ['MessageID', 'ConversationID', 'Message', 'Createtime']
+
+def build_table(data_dir: str, rows: int):
+    with open(os.path.join(data_dir, FILENAME), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i in range(1, rows + 1):
+            writer.writerow({
+                'MessageID': i,
+                'ConversationID': i // 20 + 1,
+                'Message': f"message number {i}",
+                'Createtime': '2025-12-19 00:28:03'
+            })
+
+def time_lookups(db: CSVDatabase, rows: int, lookups: int) -> float:
+    keys = [str(random.randint(1, rows)) for _ in range(lookups)]
+    start = time.perf_counter()
+    for key in keys:
+        db.find_by_field(FILENAME, 'MessageID', key)
+        db.find_all_by_field(FILENAME, 'ConversationID', key)
+    return (time.perf_counter() - start) / lookups * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--scan-lookups', type=int, default=5,
+                        help='lookups for the unindexed scan, which is slow on big tables')
+    args = parser.parse_args()
+    
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.max_rows]
+    
+    print(f"{'rows':>10} {'indexed us/lookup':>18} {'scan us/lookup':>16}")
+    for rows in sizes:
+        data_dir = tempfile.mkdtemp(prefix='bench_csv_index_')
+        try:
+            build_table(data_dir, rows)
+            
+            indexed = CSVDatabase(data_dir, cache=True)
+            indexed.create_index(FILENAME, 'MessageID')
+            indexed.create_index(FILENAME, 'ConversationID')
+            indexed.read(FILENAME)  # warm-up parse
+            indexed_us = time_lookups(indexed, rows, args.lookups)
+            
+            scan = CSVDatabase(data_dir, cache=True)
+            scan.read(FILENAME)
+            scan_us = time_lookups(scan, rows, args.scan_lookups)
+            
+            print(f"{rows:>10} {indexed_us:>18.2f} {scan_us:>16.2f}")
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
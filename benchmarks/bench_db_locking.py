@@ -0,0 +1,138 @@
+"""
+Benchmark: multi-threaded storage throughput, global lock vs per-table RW locks
+
+Usage:
+    python -m benchmarks.bench_db_locking [--threads 8] [--seconds 5] [--no-cache]
+
+Reader threads look up rows in small tables (vocabulary, conversations)
+while writer threads append to and rewrite a large action table. With a
+single global lock every lookup queues behind the rewrites; with per-table
+readers-writer locks lookups on other tables, and concurrent lookups on the
+same table, proceed in parallel.
+
+The tables are kept resident (DB_CACHE=True in the app) unless --no-cache
+is given. Only writes gain without the cache (about 1 -> 40 writes/s
+here): every uncached lookup re-parses its CSV under the GIL, so reads
+stay at a few hundred per second with either lock. With the cache,
+lookups go from about 7-9k to 24-26k/s.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from database.db_manager import CSVDatabase, ReadWriteLock
+
+ACTION_FIELDS = ['ActionID', 'APIID', 'Request', 'RequestTime', 'Response', 'ResponseTime']
+VOCAB_FIELDS = ['VocabID', 'ActionID', 'UserID', 'Vocab', 'Meaning', 'Pronunciation', 'Audio', 'Time']
+CONVERSATION_FIELDS = ['ConversationID', 'UserID', 'Mode', 'Datetime']
+
+class ExclusiveLock(ReadWriteLock):
+    """Treat every acquisition as exclusive, like the old threading.Lock"""
+    
+    def acquire_read(self):
+        self.acquire_write()
+    
+    def release_read(self):
+        self.release_write()
+
+class GlobalLockDatabase(CSVDatabase):
+    """The previous scheme: one lock shared by every table and operation"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._global_lock = ExclusiveLock()
+    
+    def _table_lock(self, filename: str) -> ReadWriteLock:
+        return self._global_lock
+
+def seed(data_dir: str, action_rows: int):
+    db = CSVDatabase(data_dir)
+    db.write('action.csv', [
+        {'ActionID': i, 'APIID': i % 4 + 1, 'Request': '{"model": "gpt"}',
+         'RequestTime': '2025-12-19 00:28:03', 'Response': '', 'ResponseTime': ''}
+        for i in range(1, action_rows + 1)
+    ], ACTION_FIELDS)
+    db.write('vocabulary.csv', [
+        {'VocabID': i, 'ActionID': i, 'UserID': i % 50, 'Vocab': f'word{i}', 'Meaning': 'm',
+         'Pronunciation': '', 'Audio': '', 'Time': '2025-12-19 01:16:00'}
+        for i in range(1, 501)
+    ], VOCAB_FIELDS)
+    db.write('hoi_thoai.csv', [
+        {'ConversationID': i, 'UserID': i % 50, 'Mode': 'text', 'Datetime': '2025-12-19 00:27:58'}
+        for i in range(1, 501)
+    ], CONVERSATION_FIELDS)
+
+def run(db: CSVDatabase, threads: int, seconds: float) -> dict:
+    stop = threading.Event()
+    counts = {'read': 0, 'write': 0}
+    counts_lock = threading.Lock()
+    
+    def reader():
+        done = 0
+        while not stop.is_set():
+            user_id = str(random.randint(0, 49))
+            db.find_all_by_field('vocabulary.csv', 'UserID', user_id)
+            db.find_by_field('hoi_thoai.csv', 'UserID', user_id)
+            done += 1
+        with counts_lock:
+            counts['read'] += done
+    
+    def writer():
+        done = 0
+        while not stop.is_set():
+            action_id = db.get_next_id('action.csv', 'ActionID')
+            row = {'ActionID': action_id, 'APIID': 1, 'Request': '{}',
+                   'RequestTime': '2025-12-19 00:28:03', 'Response': '', 'ResponseTime': ''}
+            db.append('action.csv', row, ACTION_FIELDS)
+            row['Response'] = '{"ok": true}'
+            db.update_by_field('action.csv', 'ActionID', str(action_id), row, ACTION_FIELDS)
+            done += 1
+        with counts_lock:
+            counts['write'] += done
+    
+    writers = max(1, threads // 4)
+    workers = [threading.Thread(target=writer) for _ in range(writers)]
+    workers += [threading.Thread(target=reader) for _ in range(threads - writers)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    
+    return {name: count / seconds for name, count in counts.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--action-rows', type=int, default=20_000)
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='re-read tables from disk, as with DB_CACHE=False')
+    args = parser.parse_args()
+    
+    print(f"{'locking':>16} {'reads/s':>10} {'writes/s':>10}")
+    for label, cls in (('global lock', GlobalLockDatabase), ('per-table RW', CSVDatabase)):
+        data_dir = tempfile.mkdtemp(prefix='bench_db_locking_')
+        try:
+            seed(data_dir, args.action_rows)
+            db = cls(data_dir, cache=args.cache)
+            # Same indexes and journaling the DAOs declare
+            db.create_index('action.csv', 'ActionID')
+            db.enable_journal('action.csv')
+            db.create_index('vocabulary.csv', 'UserID')
+            db.create_index('hoi_thoai.csv', 'UserID')
+            result = run(db, args.threads, args.seconds)
+            print(f"{label:>16} {result['read']:>10.0f} {result['write']:>10.0f}")
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
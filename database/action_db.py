@@ -4,15 +4,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from database.db_manager import CSVDatabase
 from backend.models.action import Action, ThirdPartyAPI
-from typing import Optional, List
+from typing import Optional, List, Dict
+from collections import OrderedDict
 from datetime import datetime
+import threading
 import json
 
 class ActionDB:
-    def __init__(self, db: CSVDatabase):
+    def __init__(self, db: CSVDatabase, audit_queue: Optional['ActionAuditQueue'] = None):
         self.db = db
+        self.audit_queue = audit_queue
         self.filename = "action.csv"
         self.fieldnames = ['ActionID', 'APIID', 'Request', 'RequestTime', 'Response', 'ResponseTime']
+        
+        self.db.create_index(self.filename, 'ActionID')
+        self.db.create_index(self.filename, 'APIID')
+        # Every API call updates its action row; log those changes instead of rewriting the file
+        self.db.enable_journal(self.filename)
     
     def create_action(self, api_id: int, request: dict) -> Action:
         action_id = self.db.get_next_id(self.filename, 'ActionID')
@@ -26,10 +34,19 @@ class ActionDB:
             ResponseTime=""
         )
         
-        self.db.append(self.filename, action.to_csv_dict(), self.fieldnames)
+        if self.audit_queue:
+            self.audit_queue.submit_create(action.to_csv_dict())
+        else:
+            self.db.append(self.filename, action.to_csv_dict(), self.fieldnames)
         return action
     
     def update_action_response(self, action_id: int, response: dict) -> bool:
+        if self.audit_queue:
+            return self.audit_queue.submit_update(action_id, {
+                'Response': json.dumps(response, ensure_ascii=False),
+                'ResponseTime': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+        
         action = self.get_action(action_id)
         if not action:
             return False
@@ -46,8 +63,15 @@ class ActionDB:
         )
     
     def get_action(self, action_id: int) -> Optional[Action]:
+        pending = self.audit_queue.get_pending(action_id) if self.audit_queue else None
+        if pending and pending['new']:
+            return Action.from_csv_dict(pending['row'])
+        
         data = self.db.find_by_field(self.filename, 'ActionID', str(action_id))
         if data:
+            if pending:
+                # Queued response not written yet
+                data.update(pending['row'])
             return Action.from_csv_dict(data)
         return None
     
@@ -60,6 +84,9 @@ class ThirdPartyAPIDB:
         self.db = db
         self.filename = "thirdpartyapi.csv"
         self.fieldnames = ['APIID', 'API_type', 'ProviderID', 'ProviderName', 'Key', 'URL']
+        
+        self.db.create_index(self.filename, 'APIID')
+        self.db.create_index(self.filename, 'API_type')
     
     def get_api_by_id(self, api_id: int) -> Optional[ThirdPartyAPI]:
         data = self.db.find_by_field(self.filename, 'APIID', str(api_id))
@@ -90,3 +117,157 @@ class ThirdPartyAPIDB:
     def get_all_apis(self) -> List[ThirdPartyAPI]:
         data = self.db.read(self.filename)
         return [ThirdPartyAPI.from_csv_dict(row) for row in data]
+
+class ActionAuditQueue:
+    """
+    Write-behind buffer for action (audit) rows.
+    
+    Request threads only enqueue; a background worker writes pending rows
+    in batches every flush_interval seconds or as soon as batch_size rows
+    are waiting. A response that arrives while its row is still queued is
+    merged into it, so most API calls cost a single batched append.
+    When more than max_size rows are waiting, new records are dropped and
+    counted instead of blocking the caller. Queued rows are lost if the
+    process dies before they are flushed.
+    """
+    
+    def __init__(self, db: CSVDatabase, max_size: int = 10000, batch_size: int = 100,
+                 flush_interval: float = 1.0):
+        self.action_db = ActionDB(db)
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        # action_id -> {'row': csv dict, 'new': not yet appended}
+        self._pending = OrderedDict()
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        
+        self._worker = threading.Thread(target=self._run, name='action-audit-writer', daemon=True)
+        self._worker.start()
+    
+    def submit_create(self, row: Dict) -> bool:
+        with self._cond:
+            if self._closed or len(self._pending) >= self.max_size:
+                self.dropped += 1
+                return False
+            
+            self._pending[int(row['ActionID'])] = {'row': dict(row), 'new': True}
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+            return True
+    
+    def submit_update(self, action_id: int, changes: Dict) -> bool:
+        with self._cond:
+            entry = self._pending.get(action_id)
+            if entry:
+                entry['row'].update(changes)
+                return True
+            
+            if self._closed or len(self._pending) >= self.max_size:
+                self.dropped += 1
+                return False
+            
+            self._pending[action_id] = {'row': dict(changes), 'new': False}
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+            return True
+    
+    def get_pending(self, action_id: int) -> Optional[Dict]:
+        """
+        Unwritten state of an action as {'row', 'new'}: the whole row if it
+        has not been appended yet, else the changes still to apply to it
+        """
+        with self._cond:
+            merged = None
+            # Being written first, then queued after it
+            for entry in (self._inflight.get(action_id), self._pending.get(action_id)):
+                if not entry:
+                    continue
+                if merged is None or entry['new']:
+                    merged = {'row': dict(entry['row']), 'new': entry['new']}
+                else:
+                    merged['row'].update(entry['row'])
+            return merged
+    
+    def _take_batch(self) -> List:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False))
+        self._inflight = dict(batch)
+        return batch
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                if len(self._pending) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        """Write everything that is queued right now"""
+        with self._write_lock:
+            while True:
+                with self._cond:
+                    batch = self._take_batch()
+                if not batch:
+                    return
+                self._write_batch(batch)
+                with self._cond:
+                    self._inflight = {}
+    
+    def _write_batch(self, batch: List):
+        db = self.action_db.db
+        filename, fieldnames = self.action_db.filename, self.action_db.fieldnames
+        
+        created = [entry['row'] for _, entry in batch if entry['new']]
+        try:
+            if created:
+                db.append_many(filename, created, fieldnames)
+                self.flushed += len(created)
+        except Exception as e:
+            print(f"Error flushing action log: {e}")
+            self.failed += len(created)
+        
+        for action_id, entry in batch:
+            if entry['new']:
+                continue
+            try:
+                data = db.find_by_field(filename, 'ActionID', str(action_id))
+                if not data:
+                    self.failed += 1
+                    continue
+                data.update(entry['row'])
+                db.update_by_field(filename, 'ActionID', str(action_id), data, fieldnames)
+                self.flushed += 1
+            except Exception as e:
+                print(f"Error flushing action {action_id}: {e}")
+                self.failed += 1
+    
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting records and drain the queue"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        self.flush()
+    
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending) + len(self._inflight),
+                'max_size': self.max_size,
+                'dropped': self.dropped,
+                'flushed': self.flushed,
+                'failed': self.failed
+            }
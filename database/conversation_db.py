@@ -3,15 +3,21 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from database.db_manager import CSVDatabase
-from backend.models.conversation import Conversation, UserMessage, AIMessage
-from typing import List, Optional
+from backend.models.conversation import Conversation, UserMessage, AIMessage, ConversationSummary
+from typing import List, Optional, Dict
+from collections import OrderedDict
 from datetime import datetime
+import threading
+import time
 
 class ConversationDB:
     def __init__(self, db: CSVDatabase):
         self.db = db
         self.filename = "hoi_thoai.csv"
         self.fieldnames = ['ConversationID', 'UserID', 'Mode', 'Datetime']
+        
+        self.db.create_index(self.filename, 'ConversationID')
+        self.db.create_index(self.filename, 'UserID')
     
     def create_conversation(self, user_id: int, mode: str = "text") -> Conversation:
         conversation_id = self.db.get_next_id(self.filename, 'ConversationID')
@@ -46,13 +52,121 @@ class ConversationDB:
             self.fieldnames
         )
 
+class TranscriptCache:
+    """
+    LRU cache of conversation transcripts, keyed by ConversationID.
+    
+    Holds at most max_size conversations and drops any that has not been
+    used for idle_ttl seconds. New messages are appended to a cached
+    transcript as they are created, so an active conversation is loaded
+    from storage only once.
+    """
+    
+    def __init__(self, max_size: int = 256, idle_ttl: float = 1800):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        
+        # conversation_id -> {'messages': [...], 'last_used': monotonic time}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # conversation_id -> count bumped when a message is added while the
+        # conversation is not cached, so a transcript read from storage
+        # before that write is not cached. Cleared once it grows past
+        # max_size * 4; the epoch then rejects fills started before that.
+        self._generations = {}
+        self._epoch = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, conversation_id: int) -> Optional[List[dict]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry and now - entry['last_used'] > self.idle_ttl:
+                del self._entries[conversation_id]
+                self.evictions += 1
+                entry = None
+            
+            if not entry:
+                self.misses += 1
+                return None
+            
+            entry['last_used'] = now
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return list(entry['messages'])
+    
+    def generation(self, conversation_id: int) -> tuple:
+        """Token to pass to put() for a transcript about to be read from storage"""
+        with self._lock:
+            return self._epoch, self._generations.get(conversation_id, 0)
+    
+    def put(self, conversation_id: int, messages: List[dict], generation: tuple):
+        now = time.monotonic()
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(conversation_id, 0)):
+                return
+            self._entries[conversation_id] = {'messages': list(messages), 'last_used': now}
+            self._entries.move_to_end(conversation_id)
+            self._evict(now)
+    
+    def append(self, conversation_id: int, message: dict):
+        """Add a new message to a cached transcript; uncached ones load on next read"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry:
+                entry['messages'].append(message)
+                return
+            
+            if len(self._generations) >= self.max_size * 4:
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[conversation_id] = self._generations.get(conversation_id, 0) + 1
+    
+    def invalidate(self, conversation_id: Optional[int] = None):
+        with self._lock:
+            if conversation_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(conversation_id, None)
+    
+    def _evict(self, now: float):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        
+        # Least recently used entries are first; stop at the first fresh one
+        while self._entries:
+            conversation_id, entry = next(iter(self._entries.items()))
+            if now - entry['last_used'] <= self.idle_ttl:
+                break
+            del self._entries[conversation_id]
+            self.evictions += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'conversations': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
 class MessageDB:
-    def __init__(self, db: CSVDatabase):
+    def __init__(self, db: CSVDatabase, transcript_cache: Optional[TranscriptCache] = None):
         self.db = db
+        self.transcript_cache = transcript_cache
         self.user_msg_filename = "user_message.csv"
         self.ai_msg_filename = "ai_message.csv"
         self.user_msg_fieldnames = ['MessageID', 'ConversationID', 'Message', 'Createtime']
         self.ai_msg_fieldnames = ['MessageID', 'ConversationID', 'Message', 'Createtime', 'ActionID']
+        
+        for filename in (self.user_msg_filename, self.ai_msg_filename):
+            self.db.create_index(filename, 'MessageID')
+            self.db.create_index(filename, 'ConversationID')
     
     def create_user_message(self, conversation_id: int, message: str) -> UserMessage:
         message_id = self.db.get_next_id(self.user_msg_filename, 'MessageID')
@@ -65,6 +179,13 @@ class MessageDB:
         )
         
         self.db.append(self.user_msg_filename, user_msg.to_csv_dict(), self.user_msg_fieldnames)
+        
+        if self.transcript_cache:
+            self.transcript_cache.append(int(conversation_id), {
+                'type': 'user',
+                'message': user_msg,
+                'time': user_msg.Createtime
+            })
         return user_msg
     
     def create_ai_message(self, conversation_id: int, message: str, 
@@ -80,9 +201,22 @@ class MessageDB:
         )
         
         self.db.append(self.ai_msg_filename, ai_msg.to_csv_dict(), self.ai_msg_fieldnames)
+        
+        if self.transcript_cache:
+            self.transcript_cache.append(int(conversation_id), {
+                'type': 'ai',
+                'message': ai_msg,
+                'time': ai_msg.Createtime
+            })
         return ai_msg
     
     def get_conversation_messages(self, conversation_id: int) -> List[dict]:
+        if self.transcript_cache:
+            cached = self.transcript_cache.get(int(conversation_id))
+            if cached is not None:
+                return cached
+            generation = self.transcript_cache.generation(int(conversation_id))
+        
         user_messages = self.db.find_all_by_field(
             self.user_msg_filename, 'ConversationID', str(conversation_id)
         )
@@ -110,6 +244,9 @@ class MessageDB:
         
         # Sort by time
         messages.sort(key=lambda x: x['time'])
+        
+        if self.transcript_cache:
+            self.transcript_cache.put(int(conversation_id), messages, generation)
         return messages
     
     def get_ai_message(self, message_id: int) -> Optional[AIMessage]:
@@ -123,3 +260,45 @@ class MessageDB:
         if data:
             return UserMessage.from_csv_dict(data)
         return None
+
+class ConversationSummaryDB:
+    def __init__(self, db: CSVDatabase):
+        self.db = db
+        self.filename = "conversation_summary.csv"
+        self.fieldnames = ['ConversationID', 'Summary', 'CoveredMessages', 'Updatetime']
+        
+        self.db.create_index(self.filename, 'ConversationID')
+    
+    def get_summary(self, conversation_id: int) -> Optional[ConversationSummary]:
+        data = self.db.find_by_field(self.filename, 'ConversationID', str(conversation_id))
+        if data:
+            return ConversationSummary.from_csv_dict(data)
+        return None
+    
+    def save_summary(self, conversation_id: int, summary: str, 
+                     covered_messages: int) -> ConversationSummary:
+        conversation_summary = ConversationSummary(
+            ConversationID=conversation_id,
+            Summary=summary,
+            CoveredMessages=covered_messages,
+            Updatetime=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        
+        updated = self.db.update_by_field(
+            self.filename,
+            'ConversationID',
+            str(conversation_id),
+            conversation_summary.to_csv_dict(),
+            self.fieldnames
+        )
+        if not updated:
+            self.db.append(self.filename, conversation_summary.to_csv_dict(), self.fieldnames)
+        return conversation_summary
+    
+    def delete_summary(self, conversation_id: int) -> bool:
+        return self.db.delete_by_field(
+            self.filename,
+            'ConversationID',
+            str(conversation_id),
+            self.fieldnames
+        )
@@ -1,12 +1,91 @@
 import csv
+import json
 import os
 import threading
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: IDs stay unique within one process only
+    fcntl = None
+
+class ReadWriteLock:
+    """Shared-read / exclusive-write lock; waiting writers hold back new readers"""
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+    
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+    
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
 
 class CSVDatabase:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", cache: bool = False):
         self.data_dir = data_dir
+        
+        # One readers-writer lock per table; self.lock only guards the registry
         self.lock = threading.Lock()
+        self._table_locks = {}
+        self._sequence_locks = {}
+        
+        # Resident table cache: filename -> ((mtime_ns, size), rows)
+        self.cache_enabled = cache
+        self._cache = {}
+        
+        # Secondary hash indexes over cached rows: filename -> {field: {value: [rows]}}
+        self._indexed_fields = {}
+        self._indexes = {}
+        
+        # ID sequences: (filename, id_field) -> last allocated ID
+        self._sequences = {}
+        self.sequence_dir = os.path.join(data_dir, '.seq')
+        
+        # Change logs for append-mostly tables: filename -> compaction threshold
+        self._journaled = {}
+        self._journal_state = {}
+        self.journal_dir = os.path.join(data_dir, '.journal')
         
         # Tạo data directory nếu chưa tồn tại
         if not os.path.exists(data_dir):
@@ -15,6 +94,52 @@ class CSVDatabase:
     def _get_filepath(self, filename: str) -> str:
         return os.path.join(self.data_dir, filename)
     
+    def _table_lock(self, filename: str) -> ReadWriteLock:
+        lock = self._table_locks.get(filename)
+        if lock is None:
+            with self.lock:
+                lock = self._table_locks.setdefault(filename, ReadWriteLock())
+        return lock
+    
+    def _sequence_lock(self, filename: str) -> threading.Lock:
+        lock = self._sequence_locks.get(filename)
+        if lock is None:
+            with self.lock:
+                lock = self._sequence_locks.setdefault(filename, threading.Lock())
+        return lock
+    
+    def _resident(self, filename: str) -> bool:
+        """
+        Whether a table's rows are kept in memory between calls.
+        
+        Journaled tables always are, whatever cache says: otherwise every
+        update would parse the CSV and replay its log, which costs as much
+        as the rewrite the log exists to avoid.
+        """
+        return self.cache_enabled or filename in self._journaled
+    
+    def _is_fresh(self, filename: str) -> bool:
+        cached = self._cache.get(filename)
+        return cached is not None and cached[0] == self._table_signature(filename)
+    
+    @contextmanager
+    def _reading(self, filename: str):
+        """
+        Yield a table's rows under its shared lock.
+        
+        When the resident copy is stale the shared lock is dropped and the
+        reload happens under the exclusive lock instead, so readers never
+        mutate the cache concurrently.
+        """
+        lock = self._table_lock(filename)
+        with lock.read_locked():
+            if not self._resident(filename) or self._is_fresh(filename):
+                yield self._load(filename)
+                return
+        
+        with lock.write_locked():
+            yield self._load(filename)
+    
     def _ensure_file_exists(self, filename: str, fieldnames: List[str]):
         filepath = self._get_filepath(filename)
         if not os.path.exists(filepath):
@@ -22,93 +147,493 @@ class CSVDatabase:
                 writer = csv.DictWriter(f, fieldnames=fieldnames)
                 writer.writeheader()
     
-    def read(self, filename: str) -> List[Dict]:
+    def _file_signature(self, filepath: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _load(self, filename: str) -> List[Dict]:
+        """
+        Return the rows of a table, parsing the file only when it changed.
+        
+        Must be called with the table's lock held, exclusively when the
+        cached rows may be reloaded. Without the cache every call parses
+        the file, matching the original behaviour.
+        """
         filepath = self._get_filepath(filename)
+        signature = self._table_signature(filename)
         
-        if not os.path.exists(filepath):
+        if signature is None:
+            self._cache.pop(filename, None)
             return []
         
-        with self.lock:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return list(csv.DictReader(f))
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
-                return []
+        if self._resident(filename):
+            cached = self._cache.get(filename)
+            if cached and cached[0] == signature:
+                return cached[1]
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        
+        if filename in self._journaled:
+            rows = self._replay_journal(filename, rows)
+        
+        if self._resident(filename):
+            self._cache[filename] = (signature, rows)
+            self._build_indexes(filename, rows)
+            self._catch_up_sequences(filename, rows)
+        return rows
     
-    def write(self, filename: str, data: List[Dict], fieldnames: List[str]):
-        filepath = self._get_filepath(filename)
+    def _table_signature(self, filename: str) -> Optional[Tuple]:
+        """Signature of a table's file plus its change log, None if the table is missing"""
+        signature = self._file_signature(self._get_filepath(filename))
+        if signature is None or filename not in self._journaled:
+            return signature
+        return (signature, self._file_signature(self._journal_path(filename)))
+    
+    def _refresh_signature(self, filename: str):
+        """Record our own write so the next read does not re-parse the file"""
+        cached = self._cache.get(filename)
+        if cached:
+            self._cache[filename] = (self._table_signature(filename), cached[1])
+    
+    def _as_read_row(self, row: Dict, fieldnames: List[str]) -> Dict:
+        """Shape a written row the way csv.DictReader would hand it back"""
+        return {k: ('' if row.get(k) is None else str(row.get(k))) for k in fieldnames}
+    
+    def invalidate(self, filename: Optional[str] = None):
+        """Drop cached rows for one table, or for every table"""
+        filenames = list(self._cache) if filename is None else [filename]
+        for name in filenames:
+            with self._table_lock(name).write_locked():
+                self._cache.pop(name, None)
+                self._indexes.pop(name, None)
+    
+    def create_index(self, filename: str, field: str):
+        """
+        Declare an equality index on a column of a table.
+        
+        Indexes live next to the resident cache, so they only take effect
+        when the database was created with cache=True or the table is
+        journaled; otherwise lookups keep scanning the file.
+        """
+        with self._table_lock(filename).write_locked():
+            fields = self._indexed_fields.setdefault(filename, [])
+            if field in fields:
+                return
+            fields.append(field)
+            
+            cached = self._cache.get(filename)
+            if cached:
+                self._build_indexes(filename, cached[1])
+    
+    def _build_indexes(self, filename: str, rows: List[Dict]):
+        indexes = {}
+        for field in self._indexed_fields.get(filename, []):
+            index = {}
+            for row in rows:
+                index.setdefault(row.get(field), []).append(row)
+            indexes[field] = index
+        self._indexes[filename] = indexes
+    
+    def _index_row(self, filename: str, row: Dict):
+        for field, index in self._indexes.get(filename, {}).items():
+            index.setdefault(row.get(field), []).append(row)
+    
+    def _unindex_row(self, filename: str, row: Dict):
+        for field, index in self._indexes.get(filename, {}).items():
+            key = row.get(field)
+            bucket = [r for r in index.get(key, []) if r is not row]
+            if bucket:
+                index[key] = bucket
+            else:
+                index.pop(key, None)
+    
+    def _reindex_row(self, filename: str, rows: List[Dict], row: Dict, old_keys: Dict):
+        """
+        Move a row that was updated in place to the buckets of its new values.
         
-        with self.lock:
+        Buckets are kept in table order, so the first match of a lookup is
+        the first matching row of the file, which is also the row journal
+        replay picks for a keyed update.
+        """
+        for field, index in self._indexes.get(filename, {}).items():
+            old_key, new_key = old_keys.get(field), row.get(field)
+            if old_key == new_key:
+                continue
+            bucket = [r for r in index.get(old_key, []) if r is not row]
+            if bucket:
+                index[old_key] = bucket
+            else:
+                index.pop(old_key, None)
+            
+            members = {id(r) for r in index.get(new_key, [])}
+            if members:
+                index[new_key] = [r for r in rows if r is row or id(r) in members]
+            else:
+                index[new_key] = [row]
+    
+    def _match_rows(self, filename: str, rows: List[Dict], field: str, value: str) -> List[Dict]:
+        """Rows whose field equals value, through the index when one exists"""
+        index = self._indexes.get(filename, {}).get(field) if self._resident(filename) else None
+        if index is not None:
+            return index.get(value, [])
+        return [row for row in rows if row.get(field) == value]
+    
+    def read(self, filename: str) -> List[Dict]:
+        try:
+            with self._reading(filename) as rows:
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+            return []
+    
+    def write(self, filename: str, data: List[Dict], fieldnames: List[str]):
+        with self._table_lock(filename).write_locked():
             try:
-                with open(filepath, 'w', encoding='utf-8', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(data)
+                self._write_rows(filename, data, fieldnames)
+                self._reset_journal(filename, len(data))
             except Exception as e:
                 print(f"Error writing {filename}: {e}")
+                self._cache.pop(filename, None)
                 raise
+            
+            if self._resident(filename):
+                rows = [self._as_read_row(row, fieldnames) for row in data]
+                self._cache[filename] = (self._table_signature(filename), rows)
+                self._build_indexes(filename, rows)
     
     def append(self, filename: str, row: Dict, fieldnames: List[str]):
+        self.append_many(filename, [row], fieldnames)
+    
+    def append_many(self, filename: str, rows: List[Dict], fieldnames: List[str]):
+        """Append several rows with a single open/write of the file"""
+        with self._table_lock(filename).write_locked():
+            self._append_rows(filename, rows, fieldnames)
+    
+    def _append_rows(self, filename: str, rows: List[Dict], fieldnames: List[str]):
+        """append_many; must be called with the table's write lock held"""
         filepath = self._get_filepath(filename)
+        try:
+            # Ensure file exists with headers
+            self._ensure_file_exists(filename, fieldnames)
+            
+            # Warm the cache before appending so the new rows are not parsed twice
+            cached_rows = self._load(filename) if self._resident(filename) else None
+            if filename in self._journaled and filename not in self._journal_state:
+                self._load(filename)
+            
+            with open(filepath, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writerows(rows)
+        except Exception as e:
+            print(f"Error appending to {filename}: {e}")
+            self._cache.pop(filename, None)
+            raise
         
-        # Ensure file exists with headers
-        self._ensure_file_exists(filename, fieldnames)
+        if filename in self._journal_state:
+            self._journal_state[filename]['physical_rows'] += len(rows)
         
-        with self.lock:
+        if cached_rows is not None:
+            for row in rows:
+                new_row = self._as_read_row(row, fieldnames)
+                cached_rows.append(new_row)
+                self._index_row(filename, new_row)
+            self._refresh_signature(filename)
+    
+    def _max_id(self, rows: List[Dict], id_field: str) -> int:
+        max_id = 0
+        for row in rows:
             try:
-                with open(filepath, 'a', encoding='utf-8', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writerow(row)
-            except Exception as e:
-                print(f"Error appending to {filename}: {e}")
-                raise
+                max_id = max(max_id, int(row.get(id_field) or 0))
+            except ValueError:
+                continue
+        return max_id
+    
+    def _sequence_path(self, filename: str, id_field: str) -> str:
+        return os.path.join(self.sequence_dir, f"{filename}.{id_field}")
+    
+    @contextmanager
+    def _locked_sequence_file(self, filename: str, id_field: str):
+        """Open a table's high-water mark file, locked against other processes"""
+        if not os.path.exists(self.sequence_dir):
+            os.makedirs(self.sequence_dir, exist_ok=True)
+        with open(self._sequence_path(filename, id_field), 'a+') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                yield f
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _catch_up_sequences(self, filename: str, rows: List[Dict]):
+        """Move sequences past IDs that another writer added to the file"""
+        with self._sequence_lock(filename):
+            for (seq_file, id_field), last_id in list(self._sequences.items()):
+                if seq_file == filename:
+                    self._sequences[(seq_file, id_field)] = max(last_id, self._max_id(rows, id_field))
     
     def get_next_id(self, filename: str, id_field: str) -> int:
-        data = self.read(filename)
-        if not data:
-            return 1
+        """
+        Allocate the next ID for a table.
         
-        try:
-            max_id = max(int(row[id_field]) for row in data if row.get(id_field))
-            return max_id + 1
-        except (ValueError, KeyError):
-            return 1
+        The persisted high-water mark is read, incremented and written back
+        under a per-table lock and an exclusive file lock on data/.seq, so
+        threads and other processes using the same data directory never
+        receive the same ID, and IDs of deleted rows are never reused. The
+        table itself is only scanned once per process, to seed the sequence
+        from rows written before the high-water mark existed.
+        """
+        key = (filename, id_field)
+        
+        if key not in self._sequences:
+            try:
+                with self._reading(filename) as rows:
+                    seed = self._max_id(rows, id_field)
+            except Exception as e:
+                print(f"Error reading {filename}: {e}")
+                seed = 0
+            
+            with self._sequence_lock(filename):
+                if key not in self._sequences:
+                    self._sequences[key] = seed
+        
+        with self._sequence_lock(filename):
+            try:
+                with self._locked_sequence_file(filename, id_field) as f:
+                    try:
+                        high_water_mark = int(f.read().strip() or 0)
+                    except ValueError:
+                        high_water_mark = 0
+                    
+                    next_id = max(high_water_mark, self._sequences[key]) + 1
+                    f.truncate(0)
+                    f.write(str(next_id))
+                    f.flush()
+            except OSError as e:
+                print(f"Error saving sequence for {filename}: {e}")
+                next_id = self._sequences[key] + 1
+            
+            self._sequences[key] = next_id
+            return next_id
     
     def find_by_field(self, filename: str, field: str, value: str) -> Optional[Dict]:
-        data = self.read(filename)
-        for row in data:
-            if row.get(field) == value:
-                return row
+        try:
+            with self._reading(filename) as rows:
+                index = self._indexes.get(filename, {}).get(field) if self._resident(filename) else None
+                if index is not None:
+                    matches = index.get(value)
+                    return dict(matches[0]) if matches else None
+                
+                for row in rows:
+                    if row.get(field) == value:
+                        return dict(row)
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
         return None
     
     def find_all_by_field(self, filename: str, field: str, value: str) -> List[Dict]:
-        data = self.read(filename)
-        return [row for row in data if row.get(field) == value]
+        try:
+            with self._reading(filename) as rows:
+                return [dict(row) for row in self._match_rows(filename, rows, field, value)]
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+            return []
     
-    def update_by_field(self, filename: str, field: str, value: str, 
-                       updated_row: Dict, fieldnames: List[str]):
-        data = self.read(filename)
-        updated = False
+    def _write_rows(self, filename: str, rows: List[Dict], fieldnames: List[str]):
+        """Rewrite a whole table; must be called with the table's write lock held"""
+        filepath = self._get_filepath(filename)
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, filepath)
+    
+    def enable_journal(self, filename: str, compact_threshold: int = 1000):
+        """
+        Record updates and deletes of a table in an append-only change log.
+        
+        Instead of rewriting the CSV on every update_by_field, the new row
+        (or a delete tombstone) is appended to data/.journal/<filename>.log
+        and replayed when the table is parsed. The log is folded back into
+        the CSV once it holds max(compact_threshold, row count) entries, so
+        the rewrite cost is amortised to O(1) per update. The table is kept
+        resident in memory even when the database was created without
+        cache, since re-parsing it on every update would cost O(table).
+        """
+        with self._table_lock(filename).write_locked():
+            self._journaled[filename] = compact_threshold
+            self._cache.pop(filename, None)
+    
+    def _journal_path(self, filename: str) -> str:
+        return os.path.join(self.journal_dir, f"{filename}.log")
+    
+    def _replay_journal(self, filename: str, rows: List[Dict]) -> List[Dict]:
+        """Apply the change log on top of freshly parsed rows"""
+        state = {'entries': 0, 'physical_rows': len(rows)}
+        self._journal_state[filename] = state
+        
+        journal_path = self._journal_path(filename)
+        if not os.path.exists(journal_path):
+            return rows
         
-        for i, row in enumerate(data):
-            if row.get(field) == value:
-                data[i] = updated_row
-                updated = True
-                break
+        positions = {}
+        deleted = set()
         
-        if updated:
-            self.write(filename, data, fieldnames)
+        def matching(field, value, limit):
+            if field not in positions:
+                index = {}
+                for i, row in enumerate(rows):
+                    index.setdefault(row.get(field), []).append(i)
+                positions[field] = index
+            return [i for i in positions[field].get(value, [])
+                    if i < limit and i not in deleted]
         
-        return updated
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line from an interrupted write
+                    continue
+                state['entries'] += 1
+                
+                matches = matching(entry['field'], entry['value'], entry['rows'])
+                if not matches:
+                    continue
+                
+                if entry['op'] == 'delete':
+                    deleted.update(matches)
+                    continue
+                
+                i = min(matches)
+                old_row, new_row = rows[i], entry['row']
+                for field, index in positions.items():
+                    if old_row.get(field) != new_row.get(field):
+                        index[old_row.get(field)].remove(i)
+                        index.setdefault(new_row.get(field), []).append(i)
+                rows[i] = new_row
+        
+        if deleted:
+            rows = [row for i, row in enumerate(rows) if i not in deleted]
+        return rows
+    
+    def _append_journal(self, filename: str, entry: Dict):
+        if not os.path.exists(self.journal_dir):
+            os.makedirs(self.journal_dir)
+        
+        entry['rows'] = self._journal_state[filename]['physical_rows']
+        with open(self._journal_path(filename), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._journal_state[filename]['entries'] += 1
+    
+    def _reset_journal(self, filename: str, physical_rows: int):
+        """Forget the change log after the CSV was rewritten with its effects"""
+        if filename not in self._journaled:
+            return
+        journal_path = self._journal_path(filename)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self._journal_state[filename] = {'entries': 0, 'physical_rows': physical_rows}
+    
+    def _maybe_compact(self, filename: str, rows: List[Dict], fieldnames: List[str]):
+        state = self._journal_state[filename]
+        if state['entries'] >= max(self._journaled[filename], len(rows)):
+            self._write_rows(filename, rows, fieldnames)
+            self._reset_journal(filename, len(rows))
+    
+    def compact(self, filename: str, fieldnames: List[str]):
+        """Fold a table's change log back into its CSV file"""
+        with self._table_lock(filename).write_locked():
+            rows = self._load(filename)
+            if filename in self._journaled:
+                self._write_rows(filename, rows, fieldnames)
+                self._reset_journal(filename, len(rows))
+                self._refresh_signature(filename)
+    
+    def update_by_field(self, filename: str, field: str, value: str, 
+                       updated_row: Dict, fieldnames: List[str]):
+        with self._table_lock(filename).write_locked():
+            return self._update_row(filename, field, value, updated_row, fieldnames)
+    
+    def upsert_by_field(self, filename: str, field: str, value: str,
+                        row: Dict, fieldnames: List[str]):
+        """Update the first row whose field equals value, or append row if there is none"""
+        with self._table_lock(filename).write_locked():
+            if not self._update_row(filename, field, value, row, fieldnames):
+                self._append_rows(filename, [row], fieldnames)
+    
+    def _update_row(self, filename: str, field: str, value: str,
+                    updated_row: Dict, fieldnames: List[str]) -> bool:
+        """update_by_field; must be called with the table's write lock held"""
+        try:
+            rows = self._load(filename)
+            matches = self._match_rows(filename, rows, field, value)
+            if not matches:
+                return False
+            
+            row = matches[0]
+            new_row = self._as_read_row(updated_row, fieldnames)
+            
+            if filename in self._journaled:
+                self._append_journal(filename, {
+                    'op': 'update', 'field': field, 'value': value, 'row': new_row
+                })
+            else:
+                self._write_rows(filename, [new_row if r is row else r for r in rows],
+                                 fieldnames)
+            
+            # Update the resident row in place so its list slot and index
+            # buckets stay valid without searching for them
+            old_keys = {f: row.get(f) for f in self._indexed_fields.get(filename, [])}
+            row.clear()
+            row.update(new_row)
+            self._reindex_row(filename, rows, row, old_keys)
+            
+            if filename in self._journaled:
+                self._maybe_compact(filename, rows, fieldnames)
+        except Exception as e:
+            print(f"Error updating {filename}: {e}")
+            self._cache.pop(filename, None)
+            raise
+        
+        self._refresh_signature(filename)
+        return True
     
     def delete_by_field(self, filename: str, field: str, value: str, 
                        fieldnames: List[str]):
-        data = self.read(filename)
-        filtered_data = [row for row in data if row.get(field) != value]
-        
-        if len(filtered_data) < len(data):
-            self.write(filename, filtered_data, fieldnames)
+        with self._table_lock(filename).write_locked():
+            try:
+                rows = self._load(filename)
+                matches = self._match_rows(filename, rows, field, value)
+                if not matches:
+                    return False
+                
+                removed = {id(row) for row in matches}
+                remaining = [row for row in rows if id(row) not in removed]
+                
+                if filename in self._journaled:
+                    self._append_journal(filename, {
+                        'op': 'delete', 'field': field, 'value': value
+                    })
+                else:
+                    self._write_rows(filename, remaining, fieldnames)
+                
+                for row in list(matches):
+                    self._unindex_row(filename, row)
+                rows[:] = remaining
+                
+                if filename in self._journaled:
+                    self._maybe_compact(filename, rows, fieldnames)
+            except Exception as e:
+                print(f"Error deleting from {filename}: {e}")
+                self._cache.pop(filename, None)
+                raise
+            
+            self._refresh_signature(filename)
             return True
-        
-        return False
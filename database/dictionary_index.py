@@ -0,0 +1,244 @@
+"""
+Offline dictionary index built from a dictionaryapi.dev dump
+
+Usage:
+    python -m database.dictionary_index dump.json [--index data/dictionary_index]
+
+The dump is either a JSON array of entries in the dictionaryapi.dev shape
+({"word", "phonetic", "phonetics", "meanings"}) or JSON lines, one entry
+or array of entries per line. Only the first entry of each word is kept,
+as the online lookup does.
+
+The index is a directory of three files:
+    keys.bin     - the normalized words, sorted by their UTF-8 bytes
+    entries.bin  - one compact JSON object per word, in the same order
+    offsets.bin  - a header and fixed-size (key offset, entry offset)
+                   records, plus a final record holding both file sizes
+
+Lookups memory-map the files and binary search the offsets table, so
+nothing is loaded up front and exact and prefix lookups cost O(log n)
+page reads.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import mmap
+import shutil
+import struct
+import threading
+from typing import Dict, Iterator, List, Optional
+
+MAGIC = b'DIX1'
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<QQ')
+
+def normalize_word(word: str) -> str:
+    return ' '.join(word.strip().lower().split())
+
+def parse_word_data(word_data: Dict) -> Dict:
+    """Pick pronunciation, first audio URL and first definition from an API entry"""
+    pronunciation = ""
+    if 'phonetic' in word_data:
+        pronunciation = word_data['phonetic']
+    elif 'phonetics' in word_data and len(word_data['phonetics']) > 0:
+        pronunciation = word_data['phonetics'][0].get('text', '')
+    
+    audio_url = ""
+    if 'phonetics' in word_data:
+        for phonetic in word_data['phonetics']:
+            if 'audio' in phonetic and phonetic['audio']:
+                audio_url = phonetic['audio']
+                break
+    
+    meaning = ""
+    if 'meanings' in word_data and len(word_data['meanings']) > 0:
+        first_meaning = word_data['meanings'][0]
+        if 'definitions' in first_meaning and len(first_meaning['definitions']) > 0:
+            meaning = first_meaning['definitions'][0].get('definition', '')
+            
+            example = first_meaning['definitions'][0].get('example', '')
+            if example:
+                meaning += f"\nExample: {example}"
+    
+    return {
+        'pronunciation': pronunciation,
+        'meaning': meaning,
+        'audio': audio_url
+    }
+
+def _read_dump(path: str) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        # A first line that parses on its own means JSON lines; otherwise
+        # the file is a single (pretty-printed) JSON document
+        first_line = next((line for line in f if line.strip()), '')
+        f.seek(0)
+        try:
+            json.loads(first_line)
+            chunks = (json.loads(line) for line in f if line.strip())
+        except ValueError:
+            chunks = [json.load(f)]
+        
+        for chunk in chunks:
+            for item in (chunk if isinstance(chunk, list) else [chunk]):
+                if isinstance(item, list):
+                    yield from item
+                else:
+                    yield item
+
+def build_index(dump_path: str, index_dir: str) -> int:
+    """Build the index from a dump, replacing index_dir; returns the word count"""
+    entries = {}
+    for word_data in _read_dump(dump_path):
+        word = normalize_word(word_data.get('word') or '')
+        if word and word not in entries:
+            entries[word] = parse_word_data(word_data)
+    
+    tmp_dir = index_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    
+    keys = sorted(entries, key=lambda w: w.encode('utf-8'))
+    with open(os.path.join(tmp_dir, 'keys.bin'), 'wb') as key_file, \
+         open(os.path.join(tmp_dir, 'entries.bin'), 'wb') as entry_file, \
+         open(os.path.join(tmp_dir, 'offsets.bin'), 'wb') as offset_file:
+        offset_file.write(HEADER.pack(MAGIC, len(keys)))
+        for word in keys:
+            offset_file.write(RECORD.pack(key_file.tell(), entry_file.tell()))
+            key_file.write(word.encode('utf-8'))
+            entry_file.write(json.dumps(entries[word], ensure_ascii=False,
+                                        separators=(',', ':')).encode('utf-8'))
+        offset_file.write(RECORD.pack(key_file.tell(), entry_file.tell()))
+    
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    return len(keys)
+
+class DictionaryIndex:
+    """Read-only view of an index built by build_index"""
+    
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.count = 0
+        self._maps = None
+        self._lock = threading.Lock()
+        self._opened = False
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def _open(self):
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+            
+            offsets_path = os.path.join(self.index_dir, 'offsets.bin')
+            if not os.path.exists(offsets_path):
+                return
+            
+            try:
+                maps = []
+                for name in ('offsets.bin', 'keys.bin', 'entries.bin'):
+                    with open(os.path.join(self.index_dir, name), 'rb') as f:
+                        if os.fstat(f.fileno()).st_size == 0:
+                            maps.append(b'')
+                        else:
+                            maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                
+                magic, count = HEADER.unpack_from(maps[0], 0)
+                if magic != MAGIC:
+                    raise ValueError(f"{offsets_path} is not a dictionary index")
+                self._maps = maps
+                self.count = count
+            except Exception as e:
+                print(f"Error opening dictionary index: {e}")
+    
+    @property
+    def available(self) -> bool:
+        if not self._opened:
+            self._open()
+        return self._maps is not None
+    
+    def _record(self, i: int):
+        return RECORD.unpack_from(self._maps[0], HEADER.size + i * RECORD.size)
+    
+    def _key(self, i: int) -> bytes:
+        start, _ = self._record(i)
+        end, _ = self._record(i + 1)
+        return self._maps[1][start:end]
+    
+    def _bisect(self, key: bytes) -> int:
+        """Index of the first word >= key"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def lookup(self, word: str) -> Optional[Dict]:
+        """Entry for word ({'meaning', 'pronunciation', 'audio'}) or None"""
+        if not self.available:
+            return None
+        
+        key = normalize_word(word).encode('utf-8')
+        i = self._bisect(key)
+        if i < self.count and self._key(i) == key:
+            _, start = self._record(i)
+            _, end = self._record(i + 1)
+            self.hits += 1
+            return json.loads(self._maps[2][start:end].decode('utf-8'))
+        
+        self.misses += 1
+        return None
+    
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Up to limit indexed words starting with prefix, in sorted order"""
+        prefix = normalize_word(prefix)
+        if not prefix or not self.available:
+            return []
+        
+        key = prefix.encode('utf-8')
+        words = []
+        i = self._bisect(key)
+        while i < self.count and len(words) < limit:
+            candidate = self._key(i)
+            if not candidate.startswith(key):
+                break
+            words.append(candidate.decode('utf-8'))
+            i += 1
+        return words
+    
+    def stats(self) -> Dict:
+        return {
+            'available': self.available,
+            'words': self.count,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+    
+    def close(self):
+        with self._lock:
+            for m in self._maps or []:
+                if isinstance(m, mmap.mmap):
+                    m.close()
+            self._maps = None
+            self.count = 0
+            self._opened = False
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the offline dictionary index')
+    parser.add_argument('dump', help='dictionaryapi.dev JSON or JSON lines dump')
+    parser.add_argument('--index', default=os.path.join('data', 'dictionary_index'))
+    args = parser.parse_args()
+    
+    count = build_index(args.dump, args.index)
+    print(f"Indexed {count} words into {args.index}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Optional
+
+class SQLiteDatabase:
+    """
+    SQLite storage with the same interface as CSVDatabase.
+    
+    Each "filename" maps to a table of the same name without the .csv
+    extension, with every column stored as TEXT so lookups compare exactly
+    like the CSV backend. Connections are kept one per thread and run in
+    WAL mode, so readers never wait for a writer.
+    """
+    
+    def __init__(self, db_path=os.path.join("data", "app.db")):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        
+        # Known table columns and declared indexes
+        self._columns = {}
+        self._indexed_fields = {}
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS "_sequences" (name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+        )
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def _rollback(self, conn: sqlite3.Connection):
+        # A failed BEGIN leaves nothing to roll back; don't mask its error
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def _table_name(self, filename: str) -> str:
+        name = os.path.splitext(filename)[0]
+        if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name):
+            raise ValueError(f"Invalid table name: {filename}")
+        return name
+    
+    def _quote(self, identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+    
+    def _table_columns(self, table: str) -> List[str]:
+        columns = self._columns.get(table)
+        if columns is None:
+            rows = self._connection().execute(f'PRAGMA table_info({self._quote(table)})').fetchall()
+            columns = [row['name'] for row in rows]
+            if columns:
+                self._columns[table] = columns
+        return columns
+    
+    def _ensure_table(self, table: str, fieldnames: List[str]):
+        with self._schema_lock:
+            conn = self._connection()
+            columns = self._table_columns(table)
+            
+            if not columns:
+                column_sql = ', '.join(f'{self._quote(name)} TEXT' for name in fieldnames)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {self._quote(table)} ({column_sql})')
+                self._columns.pop(table, None)
+            else:
+                for name in fieldnames:
+                    if name not in columns:
+                        conn.execute(f'ALTER TABLE {self._quote(table)} ADD COLUMN {self._quote(name)} TEXT')
+                        self._columns.pop(table, None)
+            
+            columns = self._table_columns(table)
+            for field in self._indexed_fields.get(table, []):
+                if field in columns:
+                    self._create_index(table, field)
+    
+    def _create_index(self, table: str, field: str):
+        index_name = self._quote(f"idx_{table}_{field}")
+        self._connection().execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {self._quote(table)} ({self._quote(field)})'
+        )
+    
+    def _as_row(self, row: Dict, fieldnames: List[str]) -> List[str]:
+        return ['' if row.get(k) is None else str(row.get(k)) for k in fieldnames]
+    
+    def create_index(self, filename: str, field: str):
+        table = self._table_name(filename)
+        with self._schema_lock:
+            fields = self._indexed_fields.setdefault(table, [])
+            if field not in fields:
+                fields.append(field)
+            if field in (self._table_columns(table) or []):
+                self._create_index(table, field)
+    
+    def enable_journal(self, filename: str, compact_threshold: int = 1000):
+        """SQLite updates rows in place already; kept for interface parity"""
+        pass
+    
+    def invalidate(self, filename: Optional[str] = None):
+        """Forget cached schema so it is re-read from the database"""
+        with self._schema_lock:
+            if filename is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(self._table_name(filename), None)
+    
+    def read(self, filename: str) -> List[Dict]:
+        table = self._table_name(filename)
+        if not self._table_columns(table):
+            return []
+        
+        try:
+            rows = self._connection().execute(
+                f'SELECT * FROM {self._quote(table)} ORDER BY rowid'
+            ).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error reading {filename}: {e}")
+            return []
+    
+    def write(self, filename: str, data: List[Dict], fieldnames: List[str]):
+        self._replace(filename, data, fieldnames)
+    
+    def import_table(self, filename: str, data: List[Dict], fieldnames: List[str]):
+        """Replace a table's rows and re-seed its ID sequences from them"""
+        self._replace(filename, data, fieldnames, reset_sequences=True)
+    
+    def _replace(self, filename: str, data: List[Dict], fieldnames: List[str],
+                 reset_sequences: bool = False):
+        table = self._table_name(filename)
+        self._ensure_table(table, fieldnames)
+        
+        conn = self._connection()
+        columns = ', '.join(self._quote(name) for name in fieldnames)
+        placeholders = ', '.join('?' for _ in fieldnames)
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(f'DELETE FROM {self._quote(table)}')
+            conn.executemany(
+                f'INSERT INTO {self._quote(table)} ({columns}) VALUES ({placeholders})',
+                [self._as_row(row, fieldnames) for row in data]
+            )
+            if reset_sequences:
+                prefix = f"{table}."
+                conn.execute('DELETE FROM "_sequences" WHERE substr(name, 1, ?) = ?',
+                             (len(prefix), prefix))
+            conn.execute('COMMIT')
+        except Exception as e:
+            self._rollback(conn)
+            print(f"Error writing {filename}: {e}")
+            raise
+    
+    def append(self, filename: str, row: Dict, fieldnames: List[str]):
+        self.append_many(filename, [row], fieldnames)
+    
+    def append_many(self, filename: str, rows: List[Dict], fieldnames: List[str]):
+        table = self._table_name(filename)
+        self._ensure_table(table, fieldnames)
+        
+        conn = self._connection()
+        columns = ', '.join(self._quote(name) for name in fieldnames)
+        placeholders = ', '.join('?' for _ in fieldnames)
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                f'INSERT INTO {self._quote(table)} ({columns}) VALUES ({placeholders})',
+                [self._as_row(row, fieldnames) for row in rows]
+            )
+            conn.execute('COMMIT')
+        except Exception as e:
+            self._rollback(conn)
+            print(f"Error appending to {filename}: {e}")
+            raise
+    
+    def get_next_id(self, filename: str, id_field: str) -> int:
+        """Allocate the next ID atomically, even across processes"""
+        table = self._table_name(filename)
+        name = f"{table}.{id_field}"
+        conn = self._connection()
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM "_sequences" WHERE name = ?', (name,)).fetchone()
+            if row is not None:
+                current = row['value']
+            elif id_field in (self._table_columns(table) or []):
+                seed = conn.execute(
+                    f'SELECT MAX(CAST({self._quote(id_field)} AS INTEGER)) AS max_id '
+                    f'FROM {self._quote(table)}'
+                ).fetchone()
+                current = seed['max_id'] or 0
+            else:
+                current = 0
+            
+            next_id = current + 1
+            conn.execute(
+                'INSERT OR REPLACE INTO "_sequences" (name, value) VALUES (?, ?)',
+                (name, next_id)
+            )
+            conn.execute('COMMIT')
+            return next_id
+        except Exception:
+            self._rollback(conn)
+            raise
+    
+    def find_by_field(self, filename: str, field: str, value: str) -> Optional[Dict]:
+        table = self._table_name(filename)
+        if field not in (self._table_columns(table) or []):
+            return None
+        
+        row = self._connection().execute(
+            f'SELECT * FROM {self._quote(table)} WHERE {self._quote(field)} = ? ORDER BY rowid LIMIT 1',
+            (value,)
+        ).fetchone()
+        return dict(row) if row else None
+    
+    def find_all_by_field(self, filename: str, field: str, value: str) -> List[Dict]:
+        table = self._table_name(filename)
+        if field not in (self._table_columns(table) or []):
+            return []
+        
+        rows = self._connection().execute(
+            f'SELECT * FROM {self._quote(table)} WHERE {self._quote(field)} = ? ORDER BY rowid',
+            (value,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def update_by_field(self, filename: str, field: str, value: str, 
+                       updated_row: Dict, fieldnames: List[str]):
+        table = self._table_name(filename)
+        if field not in (self._table_columns(table) or []):
+            return False
+        self._ensure_table(table, fieldnames)
+        
+        assignments = ', '.join(f'{self._quote(name)} = ?' for name in fieldnames)
+        cursor = self._connection().execute(
+            f'UPDATE {self._quote(table)} SET {assignments} WHERE rowid = ('
+            f'SELECT rowid FROM {self._quote(table)} WHERE {self._quote(field)} = ? '
+            f'ORDER BY rowid LIMIT 1)',
+            self._as_row(updated_row, fieldnames) + [value]
+        )
+        return cursor.rowcount > 0
+    
+    def upsert_by_field(self, filename: str, field: str, value: str,
+                        row: Dict, fieldnames: List[str]):
+        """Update the first row whose field equals value, or insert row if there is none"""
+        table = self._table_name(filename)
+        self._ensure_table(table, fieldnames)
+        
+        conn = self._connection()
+        values = self._as_row(row, fieldnames)
+        assignments = ', '.join(f'{self._quote(name)} = ?' for name in fieldnames)
+        columns = ', '.join(self._quote(name) for name in fieldnames)
+        placeholders = ', '.join('?' for _ in fieldnames)
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(
+                f'UPDATE {self._quote(table)} SET {assignments} WHERE rowid = ('
+                f'SELECT rowid FROM {self._quote(table)} WHERE {self._quote(field)} = ? '
+                f'ORDER BY rowid LIMIT 1)',
+                values + [value]
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    f'INSERT INTO {self._quote(table)} ({columns}) VALUES ({placeholders})',
+                    values
+                )
+            conn.execute('COMMIT')
+        except Exception as e:
+            self._rollback(conn)
+            print(f"Error saving to {filename}: {e}")
+            raise
+    
+    def delete_by_field(self, filename: str, field: str, value: str, 
+                       fieldnames: List[str]):
+        table = self._table_name(filename)
+        if field not in (self._table_columns(table) or []):
+            return False
+        
+        cursor = self._connection().execute(
+            f'DELETE FROM {self._quote(table)} WHERE {self._quote(field)} = ?',
+            (value,)
+        )
+        return cursor.rowcount > 0
@@ -0,0 +1,54 @@
+"""
+One-shot import of the CSV tables into the SQLite backend
+
+Usage:
+    python -m database.sqlite_import [--data-dir data] [--db data/app.db]
+
+Every data/*.csv file becomes a table of the same name. Existing rows in
+those tables are replaced and their ID sequences are re-seeded from the
+imported data.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+
+from database.db_manager import CSVDatabase
+from database.sqlite_db import SQLiteDatabase
+
+def import_csv_dir(data_dir: str, db_path: str) -> dict:
+    """Copy every CSV table in data_dir into the SQLite database at db_path"""
+    source = CSVDatabase(data_dir)
+    target = SQLiteDatabase(db_path)
+    imported = {}
+    
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith('.csv'):
+            continue
+        
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            fieldnames = csv.DictReader(f).fieldnames or []
+        if not fieldnames:
+            continue
+        
+        rows = source.read(filename)
+        target.import_table(filename, rows, fieldnames)
+        imported[filename] = len(rows)
+    
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description='Import data/*.csv into SQLite')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--db', default=os.path.join('data', 'app.db'))
+    args = parser.parse_args()
+    
+    imported = import_csv_dir(args.data_dir, args.db)
+    for filename, count in imported.items():
+        print(f"  {filename}: {count} rows")
+    print(f"Imported {len(imported)} tables into {args.db}")
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from database.db_manager import CSVDatabase
 from backend.models.user import User
-from backend.utils.security import hash_password, verify_password
-from typing import Optional
+from backend.utils.security import password_hasher, needs_rehash, PasswordPoolBusy
+from typing import Callable, Optional
 
 class UserDB:
     def __init__(self, db: CSVDatabase):
         self.db = db
         self.filename = "nguoi_dung.csv"
         self.fieldnames = ['UserID', 'tai_khoan', 'mat_khau', 'RoleID', 'active', 'ho_ten']
+        
+        self.db.create_index(self.filename, 'UserID')
+        self.db.create_index(self.filename, 'tai_khoan')
+        
+        # Called with the updated User after a user row is changed
+        self._listeners = []
+    
+    def add_change_listener(self, listener: Callable[[User], None]):
+        self._listeners.append(listener)
     
     def create_user(self, tai_khoan: str, mat_khau: str, ho_ten: str, 
                    role_id: int = 0) -> User:
@@ -23,7 +32,7 @@ class UserDB:
         user = User(
             UserID=user_id,
             tai_khoan=tai_khoan,
-            mat_khau=hash_password(mat_khau),
+            mat_khau=password_hasher.hash(mat_khau),
             RoleID=role_id,
             active=True,
             ho_ten=ho_ten
@@ -53,19 +62,34 @@ class UserDB:
         if not user.is_active():
             return None
         
-        if verify_password(mat_khau, user.mat_khau):
+        if password_hasher.verify(mat_khau, user.mat_khau):
+            if needs_rehash(user.mat_khau):
+                self._rehash(user, mat_khau)
             return user
         
         return None
     
+    def _rehash(self, user: User, mat_khau: str):
+        """Re-hash with the current BCRYPT_ROUNDS; retried on a later login if the pool is busy"""
+        try:
+            user.mat_khau = password_hasher.hash(mat_khau)
+            self.update_user(user)
+        except PasswordPoolBusy:
+            pass
+    
     def update_user(self, user: User) -> bool:
-        return self.db.update_by_field(
+        updated = self.db.update_by_field(
             self.filename, 
             'UserID', 
             str(user.UserID),
             user.to_csv_dict(),
             self.fieldnames
         )
+        
+        if updated:
+            for listener in self._listeners:
+                listener(user)
+        return updated
     
     def deactivate_user(self, user_id: int) -> bool:
         user = self.get_user_by_id(user_id)
@@ -3,8 +3,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from database.db_manager import CSVDatabase
-from backend.models.vocab import Vocabulary
-from typing import List, Optional
+from backend.models.vocab import Vocabulary, DictionaryEntry
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class VocabularyDB:
@@ -13,6 +13,9 @@ class VocabularyDB:
         self.filename = "vocabulary.csv"
         self.fieldnames = ['VocabID', 'ActionID', 'UserID', 'Vocab', 'Meaning', 
                           'Pronunciation', 'Audio', 'Time']
+        
+        self.db.create_index(self.filename, 'VocabID')
+        self.db.create_index(self.filename, 'UserID')
     
     def create_vocabulary(self, user_id: int, vocab: str, meaning: str, 
                          pronunciation: str, audio: str, 
@@ -33,6 +36,27 @@ class VocabularyDB:
         self.db.append(self.filename, vocabulary.to_csv_dict(), self.fieldnames)
         return vocabulary
     
+    def create_vocabularies(self, user_id: int, items: List[Dict]) -> List[Vocabulary]:
+        """Create several vocabulary rows with one write; items use create_vocabulary's argument names"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        vocabularies = [
+            Vocabulary(
+                VocabID=self.db.get_next_id(self.filename, 'VocabID'),
+                ActionID=item.get('action_id'),
+                UserID=user_id,
+                Vocab=item['vocab'],
+                Meaning=item['meaning'],
+                Pronunciation=item['pronunciation'],
+                Audio=item['audio'],
+                Time=now
+            )
+            for item in items
+        ]
+        
+        if vocabularies:
+            self.db.append_many(self.filename, [v.to_csv_dict() for v in vocabularies], self.fieldnames)
+        return vocabularies
+    
     def get_user_vocabulary(self, user_id: int) -> List[Vocabulary]:
         data = self.db.find_all_by_field(self.filename, 'UserID', str(user_id))
         vocabs = [Vocabulary.from_csv_dict(row) for row in data]
@@ -51,9 +75,47 @@ class VocabularyDB:
             return Vocabulary.from_csv_dict(data)
         return None
     
+    def get_user_words(self, user_id: int) -> Dict[str, Vocabulary]:
+        """The user's looked-up words, keyed by lowercased word"""
+        words = {}
+        for row in self.db.find_all_by_field(self.filename, 'UserID', str(user_id)):
+            words.setdefault(row['Vocab'].lower(), Vocabulary.from_csv_dict(row))
+        return words
+    
     def check_word_exists(self, user_id: int, vocab: str) -> Optional[Vocabulary]:
-        vocabs = self.get_user_vocabulary(user_id)
-        for v in vocabs:
-            if v.Vocab.lower() == vocab.lower():
-                return v
+        vocab = vocab.lower()
+        for row in self.db.find_all_by_field(self.filename, 'UserID', str(user_id)):
+            if row['Vocab'].lower() == vocab:
+                return Vocabulary.from_csv_dict(row)
         return None
+
+class DictionaryDB:
+    """Persistent tier of the shared dictionary cache, one row per word"""
+    
+    def __init__(self, db: CSVDatabase):
+        self.db = db
+        self.filename = "dictionary.csv"
+        self.fieldnames = ['Word', 'ActionID', 'Meaning', 'Pronunciation', 'Audio', 'Time']
+        
+        self.db.create_index(self.filename, 'Word')
+        # Journaled tables stay resident, so a cache miss is an index
+        # lookup rather than a parse of the whole file, and a refreshed
+        # definition is appended instead of rewriting it
+        self.db.enable_journal(self.filename)
+    
+    def get_entry(self, word: str) -> Optional[DictionaryEntry]:
+        data = self.db.find_by_field(self.filename, 'Word', word)
+        if data:
+            return DictionaryEntry.from_csv_dict(data)
+        return None
+    
+    def save_entry(self, entry: DictionaryEntry):
+        # One locked update-or-append, so concurrent misses for the same
+        # word cannot both append a row
+        self.db.upsert_by_field(
+            self.filename,
+            'Word',
+            entry.Word,
+            entry.to_csv_dict(),
+            self.fieldnames
+        )
@@ -109,6 +109,71 @@ class APIClient {
             throw error;
         }
     }
+    
+    // POST and read a server-sent event stream, calling onEvent for each event
+    async stream(endpoint, data, onEvent, options = {}) {
+        const url = `${this.baseURL}${endpoint}`;
+        
+        const headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            ...options.headers
+        };
+        
+        const token = localStorage.getItem('token');
+        if (token) {
+            headers['Authorization'] = `Bearer ${token}`;
+        }
+        
+        try {
+            const response = await fetch(url, {
+                ...options,
+                method: 'POST',
+                headers,
+                body: JSON.stringify(data),
+                credentials: 'include'
+            });
+            
+            // Errors before the stream starts come back as JSON
+            const contentType = response.headers.get('content-type');
+            if (!response.ok || !contentType || !contentType.includes('text/event-stream')) {
+                const result = await response.json();
+                throw new Error(result.error || 'Request failed');
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary = buffer.indexOf('\n\n');
+                while (boundary !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    const payload = rawEvent
+                        .split('\n')
+                        .filter(line => line.startsWith('data:'))
+                        .map(line => line.slice(5).trimStart())
+                        .join('\n');
+                    
+                    if (payload) {
+                        onEvent(JSON.parse(payload));
+                    }
+                    boundary = buffer.indexOf('\n\n');
+                }
+            }
+        } catch (error) {
+            console.error('Stream Error:', error);
+            throw error;
+        }
+    }
 }
 
 // Create API client instance
@@ -62,7 +62,7 @@ function toggleRecording() {
 async function processAudio(audioBlob) {
     try {
         // Check if voice mode is active (from chat.js)
-        const voiceModeEnabled = window.isVoiceMode || false;
+        const voiceModeEnabled = isVoiceMode;
         
         // Show loading
         const container = document.getElementById('messages-container');
@@ -80,18 +80,12 @@ async function processAudio(audioBlob) {
         
         if (result.success) {
             if (voiceModeEnabled) {
-                // Voice mode: add messages to UI and play TTS (handled by chat.js)
-                addMessageToUI('user', {
-                    Message: result.transcript,
-                    Createtime: new Date().toISOString()
-                });
-                addMessageToUI('ai', result.ai_message);
-                scrollToBottom(container);
+                // Voice mode: send the transcript and speak the reply as it streams
+                await sendMessage(result.transcript, { speak: true });
                 
-                // Play TTS and continue loop
-                await playTextToSpeechWithCallback(result.ai_message.MessageID, () => {
-                    // After TTS finishes, start recording again if voice mode still on
-                    if (window.isVoiceMode) {
+                // After the reply has been spoken, start recording again if voice mode still on
+                onSpeechFinished(() => {
+                    if (isVoiceMode) {
                         setTimeout(() => startRecording(), 500); // Small delay for better UX
                     }
                 });
@@ -113,29 +107,21 @@ async function processAudio(audioBlob) {
 
 // Transcript modal functions removed - now auto-fill to input box
 
+// Audio is streamed from the server, so playback starts before synthesis finishes
+function ttsStreamUrl(messageId) {
+    return `${API_BASE_URL}/api/conversation/message/tts/${messageId}/stream`;
+}
+
 async function playTextToSpeech(messageId) {
     try {
-        const result = await api.get(`/api/conversation/message/tts/${messageId}`);
+        const audio = new Audio(ttsStreamUrl(messageId));
         
-        if (result.success) {
-            // Decode base64 audio
-            const audioData = atob(result.audio);
-            const arrayBuffer = new ArrayBuffer(audioData.length);
-            const view = new Uint8Array(arrayBuffer);
-            
-            for (let i = 0; i < audioData.length; i++) {
-                view[i] = audioData.charCodeAt(i);
-            }
-            
-            const blob = new Blob([arrayBuffer], { type: 'audio/mp3' });
-            const audioUrl = URL.createObjectURL(blob);
-            
-            const audio = new Audio(audioUrl);
-            audio.play();
-            
-        } else {
-            alert('Lỗi: ' + result.error);
-        }
+        audio.onerror = () => {
+            console.error('Error playing TTS:', audio.error);
+            alert('Lỗi khi phát âm thanh');
+        };
+        
+        await audio.play();
         
     } catch (error) {
         console.error('Error playing TTS:', error);
@@ -144,40 +130,75 @@ async function playTextToSpeech(messageId) {
 }
 
 async function playTextToSpeechWithCallback(messageId, callback) {
+    let finished = false;
+    const done = () => {
+        if (finished) return;
+        finished = true;
+        if (callback) callback();
+    };
+    
     try {
-        const result = await api.get(`/api/conversation/message/tts/${messageId}`);
+        const audio = new Audio(ttsStreamUrl(messageId));
         
-        if (result.success) {
-            // Decode base64 audio
-            const audioData = atob(result.audio);
-            const arrayBuffer = new ArrayBuffer(audioData.length);
-            const view = new Uint8Array(arrayBuffer);
-            
-            for (let i = 0; i < audioData.length; i++) {
-                view[i] = audioData.charCodeAt(i);
-            }
-            
-            const blob = new Blob([arrayBuffer], { type: 'audio/mp3' });
-            const audioUrl = URL.createObjectURL(blob);
-            
-            const audio = new Audio(audioUrl);
-            
-            // Execute callback when audio finishes playing
-            audio.onended = () => {
-                if (callback) callback();
-            };
-            
-            audio.play();
-            
-        } else {
-            alert('Lỗi: ' + result.error);
-            if (callback) callback(); // Still call callback even on error
-        }
+        // Execute callback when audio finishes playing
+        audio.onended = done;
+        
+        audio.onerror = () => {
+            console.error('Error playing TTS:', audio.error);
+            alert('Lỗi khi phát âm thanh');
+            done(); // Still call callback even on error
+        };
+        
+        await audio.play();
         
     } catch (error) {
         console.error('Error playing TTS:', error);
         alert('Lỗi khi phát âm thanh: ' + error.message);
-        if (callback) callback(); // Still call callback even on error
+        done(); // Still call callback even on error
+    }
+}
+
+// Queue of reply segments played back to back in voice mode
+const speechQueue = [];
+let speechPlaying = false;
+let speechFinishedCallbacks = [];
+
+function enqueueSpeech(url) {
+    speechQueue.push(url);
+    if (!speechPlaying) {
+        playNextSpeech();
+    }
+}
+
+function playNextSpeech() {
+    const url = speechQueue.shift();
+    if (!url) {
+        speechPlaying = false;
+        const callbacks = speechFinishedCallbacks;
+        speechFinishedCallbacks = [];
+        callbacks.forEach(callback => callback());
+        return;
+    }
+    
+    speechPlaying = true;
+    const audio = new Audio(url);
+    audio.onended = playNextSpeech;
+    audio.onerror = () => {
+        console.error('Error playing speech segment:', audio.error);
+        playNextSpeech();
+    };
+    audio.play().catch(error => {
+        console.error('Error playing speech segment:', error);
+        playNextSpeech();
+    });
+}
+
+// Call back once every queued segment has been played
+function onSpeechFinished(callback) {
+    if (!speechPlaying && speechQueue.length === 0) {
+        callback();
+    } else {
+        speechFinishedCallbacks.push(callback);
     }
 }
 
@@ -3,6 +3,10 @@
 let currentConversationId = null;
 let conversations = [];
 let isVoiceMode = false;
+// Definitions from batch lookups, so clicking a word needs no request
+const vocabCache = {};
+// Words per batch request (server limit: VOCAB_BATCH_MAX_WORDS)
+const VOCAB_BATCH_SIZE = 200;
 
 // Initialize
 window.addEventListener('DOMContentLoaded', async () => {
@@ -180,6 +184,9 @@ function addMessageToUI(type, message) {
                     <button class="btn-small" onclick="playTextToSpeech(${message.MessageID})">
                         🔊 Nghe
                     </button>
+                    <button class="btn-small" onclick="translateMessage(this)">
+                        📖 Dịch từ
+                    </button>
                 </div>
                 <div class="message-time">${formatTime(message.Createtime)}</div>
             </div>
@@ -206,7 +213,8 @@ async function sendTextMessage() {
     await sendMessage(message);
 }
 
-async function sendMessage(message) {
+// options.speak: also play the reply sentence by sentence as it is generated
+async function sendMessage(message, options = {}) {
     const container = document.getElementById('messages-container');
     
     // Add user message to UI
@@ -215,32 +223,72 @@ async function sendMessage(message) {
         Createtime: new Date().toISOString()
     });
     
-    // Show loading
-    const loading = showLoading(container);
+    // Show loading until the first token arrives
+    let loading = showLoading(container);
+    let streamingText = null;
+    let reply = '';
     
     try {
-        const result = await api.post('/api/conversation/message/send', {
+        await api.stream('/api/conversation/message/stream', {
             conversation_id: currentConversationId,
-            message: message
+            message: message,
+            speak: Boolean(options.speak)
+        }, (event) => {
+            if (event.type === 'token') {
+                if (!streamingText) {
+                    removeLoading(loading);
+                    loading = null;
+                    streamingText = addStreamingMessageToUI();
+                }
+                reply += event.content;
+                streamingText.textContent = reply;
+                scrollToBottom(container);
+            } else if (event.type === 'done') {
+                removeStreamingMessage(streamingText);
+                streamingText = null;
+                // Replace the plain-text draft with the saved, clickable message
+                addMessageToUI('ai', event.ai_message);
+                scrollToBottom(container);
+            } else if (event.type === 'audio') {
+                enqueueSpeech(event.url);
+            } else if (event.type === 'audio_error') {
+                console.error('Error synthesizing sentence:', event.error);
+            } else if (event.type === 'error') {
+                throw new Error(event.error);
+            }
         });
         
         removeLoading(loading);
         
-        if (result.success) {
-            // Add AI message to UI
-            addMessageToUI('ai', result.ai_message);
-            scrollToBottom(container);
-        } else {
-            alert('Lỗi: ' + result.error);
-        }
-        
     } catch (error) {
         removeLoading(loading);
+        removeStreamingMessage(streamingText);
         console.error('Error sending message:', error);
         alert('Lỗi khi gửi tin nhắn: ' + error.message);
     }
 }
 
+// AI message bubble that is filled in while the reply streams
+function addStreamingMessageToUI() {
+    const container = document.getElementById('messages-container');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message ai streaming-message';
+    messageDiv.innerHTML = `
+        <div class="message-bubble">
+            <div class="message-text"></div>
+        </div>
+    `;
+    container.appendChild(messageDiv);
+    return messageDiv.querySelector('.message-text');
+}
+
+function removeStreamingMessage(textElement) {
+    const messageDiv = textElement && textElement.closest('.message');
+    if (messageDiv && messageDiv.parentNode) {
+        messageDiv.parentNode.removeChild(messageDiv);
+    }
+}
+
 function handleKeyPress(event) {
     if (event.key === 'Enter') {
         sendTextMessage();
@@ -249,6 +297,12 @@ function handleKeyPress(event) {
 
 // Vocabulary lookup
 async function lookupWord(word) {
+    const cached = vocabCache[word.toLowerCase()];
+    if (cached) {
+        showVocabModal(cached);
+        return;
+    }
+    
     try {
         const result = await api.post('/api/vocab/lookup', { word });
         
@@ -264,6 +318,42 @@ async function lookupWord(word) {
     }
 }
 
+// Look up every word of an AI message at once and underline the ones found
+async function translateMessage(button) {
+    const spans = button.closest('.message-bubble').querySelectorAll('.message-text span.word');
+    const words = [...new Set(Array.from(spans, span => span.dataset.word.toLowerCase()))]
+        .filter(word => !vocabCache[word]);
+    
+    button.disabled = true;
+    try {
+        for (let i = 0; i < words.length; i += VOCAB_BATCH_SIZE) {
+            const result = await api.post('/api/vocab/lookup/batch', {
+                words: words.slice(i, i + VOCAB_BATCH_SIZE)
+            });
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+            Object.entries(result.results).forEach(([word, data]) => {
+                vocabCache[word] = { word, ...data };
+            });
+        }
+        
+        spans.forEach(span => {
+            const data = vocabCache[span.dataset.word.toLowerCase()];
+            if (data && data.meaning) {
+                span.title = data.meaning;
+                span.classList.add('annotated');
+            }
+        });
+        
+    } catch (error) {
+        console.error('Error translating message:', error);
+        alert('Lỗi khi dịch tin nhắn: ' + error.message);
+    } finally {
+        button.disabled = false;
+    }
+}
+
 function showVocabModal(data) {
     document.getElementById('vocab-word').textContent = data.word;
     document.getElementById('vocab-pronunciation').textContent = data.pronunciation || 'N/A';
@@ -34,7 +34,7 @@ function makeWordsClickable(text) {
         if (word.trim() && /[a-zA-Z]/.test(word)) {
             const cleanWord = word.replace(/[^a-zA-Z]/g, '');
             if (cleanWord) {
-                return `<span class="word" onclick="lookupWord('${cleanWord}')">${escapeHtml(word)}</span>`;
+                return `<span class="word" data-word="${cleanWord}" onclick="lookupWord('${cleanWord}')">${escapeHtml(word)}</span>`;
             }
         }
         return escapeHtml(word);
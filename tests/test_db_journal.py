@@ -0,0 +1,150 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import unittest
+
+from database.db_manager import CSVDatabase
+
+FILENAME = 'words.csv'
+FIELDNAMES = ['ID', 'Group', 'Text']
+
+def open_table(data_dir: str, compact_threshold: int = 1000) -> CSVDatabase:
+    db = CSVDatabase(data_dir)
+    db.enable_journal(FILENAME, compact_threshold)
+    db.create_index(FILENAME, 'ID')
+    db.create_index(FILENAME, 'Group')
+    return db
+
+def allocate_ids(data_dir: str, count: int) -> list:
+    db = CSVDatabase(data_dir)
+    return [db.get_next_id(FILENAME, 'ID') for _ in range(count)]
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix='test_journal_')
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        
+        self.db = open_table(self.data_dir)
+        self.db.write(FILENAME, [
+            {'ID': '1', 'Group': 'a', 'Text': 'one'},
+            {'ID': '2', 'Group': 'b', 'Text': 'two'},
+            {'ID': '3', 'Group': 'a', 'Text': 'three'},
+        ], FIELDNAMES)
+    
+    def reloaded(self, compact_threshold: int = 1000) -> list:
+        return open_table(self.data_dir, compact_threshold).read(FILENAME)
+    
+    def test_updates_are_logged_not_rewritten(self):
+        with open(os.path.join(self.data_dir, FILENAME), 'rb') as f:
+            before = f.read()
+        
+        self.db.update_by_field(FILENAME, 'ID', '2', {'ID': '2', 'Group': 'b', 'Text': 'deux'}, FIELDNAMES)
+        
+        with open(os.path.join(self.data_dir, FILENAME), 'rb') as f:
+            self.assertEqual(f.read(), before)
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, '.journal', f"{FILENAME}.log")))
+        self.assertEqual(self.reloaded(), self.db.read(FILENAME))
+    
+    def test_keyed_update_on_non_unique_field_replays_to_same_row(self):
+        # Row 1 moves into group b after row 2 was already there; an update
+        # keyed on the group must hit the first row of the file both live
+        # and on replay
+        self.db.update_by_field(FILENAME, 'ID', '1', {'ID': '1', 'Group': 'b', 'Text': 'one'}, FIELDNAMES)
+        self.db.update_by_field(FILENAME, 'Group', 'b', {'ID': '1', 'Group': 'b', 'Text': 'first'}, FIELDNAMES)
+        
+        live = self.db.read(FILENAME)
+        self.assertEqual(live[0], {'ID': '1', 'Group': 'b', 'Text': 'first'})
+        self.assertEqual(live[1], {'ID': '2', 'Group': 'b', 'Text': 'two'})
+        self.assertEqual(self.db.find_by_field(FILENAME, 'Group', 'b')['ID'], '1')
+        self.assertEqual(self.reloaded(), live)
+    
+    def test_upsert_updates_first_match_or_appends(self):
+        self.db.upsert_by_field(FILENAME, 'Group', 'a', {'ID': '1', 'Group': 'a', 'Text': 'uno'}, FIELDNAMES)
+        self.db.upsert_by_field(FILENAME, 'Group', 'c', {'ID': '4', 'Group': 'c', 'Text': 'four'}, FIELDNAMES)
+        
+        live = self.db.read(FILENAME)
+        self.assertEqual([row['Text'] for row in live], ['uno', 'two', 'three', 'four'])
+        self.assertEqual(self.reloaded(), live)
+    
+    def test_delete_replays(self):
+        self.db.append(FILENAME, {'ID': '4', 'Group': 'a', 'Text': 'four'}, FIELDNAMES)
+        self.assertTrue(self.db.delete_by_field(FILENAME, 'Group', 'a', FIELDNAMES))
+        self.assertFalse(self.db.delete_by_field(FILENAME, 'Group', 'a', FIELDNAMES))
+        
+        live = self.db.read(FILENAME)
+        self.assertEqual([row['ID'] for row in live], ['2'])
+        self.assertEqual(self.reloaded(), live)
+    
+    def test_torn_last_line_is_ignored(self):
+        self.db.update_by_field(FILENAME, 'ID', '3', {'ID': '3', 'Group': 'a', 'Text': 'trois'}, FIELDNAMES)
+        live = self.db.read(FILENAME)
+        
+        with open(os.path.join(self.data_dir, '.journal', f"{FILENAME}.log"), 'a', encoding='utf-8') as f:
+            f.write('{"op": "update", "field": "ID"')
+        
+        self.assertEqual(self.reloaded(), live)
+    
+    def test_compaction_folds_log_into_csv(self):
+        db = open_table(self.data_dir, compact_threshold=2)
+        for i in range(4):
+            db.update_by_field(FILENAME, 'ID', '2', {'ID': '2', 'Group': 'b', 'Text': f"v{i}"}, FIELDNAMES)
+        db.compact(FILENAME, FIELDNAMES)
+        
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, '.journal', f"{FILENAME}.log")))
+        self.assertEqual(CSVDatabase(self.data_dir).read(FILENAME), db.read(FILENAME))
+        self.assertEqual(db.find_by_field(FILENAME, 'ID', '2')['Text'], 'v3')
+
+class NextIdTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix='test_next_id_')
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        
+        CSVDatabase(self.data_dir).write(FILENAME, [
+            {'ID': '1', 'Group': 'a', 'Text': 'one'},
+            {'ID': '5', 'Group': 'a', 'Text': 'five'},
+        ], FIELDNAMES)
+    
+    def test_seeds_from_table(self):
+        self.assertEqual(allocate_ids(self.data_dir, 2), [6, 7])
+    
+    def test_ids_of_deleted_rows_are_not_reused(self):
+        db = CSVDatabase(self.data_dir)
+        self.assertEqual(db.get_next_id(FILENAME, 'ID'), 6)
+        db.append(FILENAME, {'ID': '6', 'Group': 'a', 'Text': 'six'}, FIELDNAMES)
+        db.delete_by_field(FILENAME, 'ID', '6', FIELDNAMES)
+        db.delete_by_field(FILENAME, 'ID', '5', FIELDNAMES)
+        
+        self.assertEqual(allocate_ids(self.data_dir, 1), [7])
+    
+    def test_threads_get_distinct_ids(self):
+        db = CSVDatabase(self.data_dir)
+        allocated = []
+        lock = threading.Lock()
+        
+        def worker():
+            ids = [db.get_next_id(FILENAME, 'ID') for _ in range(50)]
+            with lock:
+                allocated.extend(ids)
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sorted(allocated), list(range(6, 6 + 400)))
+    
+    def test_processes_get_distinct_ids(self):
+        with multiprocessing.get_context().Pool(4) as pool:
+            results = pool.starmap(allocate_ids, [(self.data_dir, 25)] * 4)
+        
+        allocated = [i for ids in results for i in ids]
+        self.assertEqual(sorted(allocated), list(range(6, 6 + 100)))
+
+if __name__ == '__main__':
+    unittest.main()
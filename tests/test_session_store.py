@@ -0,0 +1,225 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from backend.services.session_store import MemorySessionStore, SQLiteSessionStore, RedisSessionStore
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+class Clock:
+    """Settable stand-in for the time module used by session_store"""
+    
+    def __init__(self):
+        self.now = time.time()
+    
+    def time(self) -> float:
+        return self.now
+
+class StandInRedis:
+    """
+    The redis-py methods RedisSessionStore uses, over dicts.
+    
+    Values come back as bytes like redis-py's, and keys expire on the
+    given clock.
+    """
+    
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.data = {}
+        self.expiry = {}
+    
+    def _alive(self, key: str) -> bool:
+        when = self.expiry.get(key)
+        if when is not None and when <= self.clock.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+    
+    def _zset(self, key: str) -> dict:
+        if not self._alive(key):
+            self.data[key] = {}
+        return self.data[key]
+    
+    @staticmethod
+    def _encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+    
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        if not self._alive(key):
+            self.data[key] = {}
+        self.data[key].update({name: self._encode(v) for name, v in values.items()})
+        return len(values)
+    
+    def hmget(self, key, *fields):
+        values = self.data[key] if self._alive(key) else {}
+        return [values.get(field) for field in fields]
+    
+    def hget(self, key, field):
+        return self.hmget(key, field)[0]
+    
+    def expireat(self, key, when):
+        if not self._alive(key):
+            return False
+        self.expiry[key] = when
+        return True
+    
+    def exists(self, key):
+        return int(self._alive(key))
+    
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expiry.pop(key, None)
+                removed += 1
+        return removed
+    
+    def zadd(self, key, mapping):
+        zset = self._zset(key)
+        added = len([member for member in mapping if member not in zset])
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+    
+    def zrem(self, key, *members):
+        zset = self._zset(key)
+        return len([zset.pop(member) for member in members if member in zset])
+    
+    def zrange(self, key, start, end):
+        members = sorted(self._zset(key).items(), key=lambda item: (item[1], item[0]))
+        end = len(members) if end == -1 else end + 1
+        return [self._encode(member) for member, _ in members[start:end]]
+    
+    def zcount(self, key, low, high):
+        low, high = float(low), float(high)
+        return len([s for s in self._zset(key).values() if low <= s <= high])
+    
+    def zremrangebyscore(self, key, low, high):
+        low, high = float(low), float(high)
+        zset = self._zset(key)
+        due = [member for member, score in zset.items() if low <= score <= high]
+        for member in due:
+            del zset[member]
+        return len(due)
+    
+    def pipeline(self):
+        return StandInPipeline(self)
+    
+    def close(self):
+        pass
+
+class StandInPipeline:
+    def __init__(self, client: StandInRedis):
+        self.client = client
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return record
+    
+    def execute(self):
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+class SessionStoreChecks:
+    """Behaviour every store must have; subclasses provide make_store"""
+    
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('backend.services.session_store.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def make_store(self, ttl: float, max_age: float = None, max_per_user: int = 0):
+        raise NotImplementedError
+    
+    def test_create_get_delete(self):
+        store = self.make_store(ttl=60)
+        store.create('token-a', 7)
+        self.assertEqual(store.get('token-a'), 7)
+        self.assertIsNone(store.get('token-b'))
+        
+        store.delete('token-a')
+        self.assertIsNone(store.get('token-a'))
+    
+    def test_idle_expiry_is_pushed_back_by_use(self):
+        store = self.make_store(ttl=60)
+        store.create('token-a', 1)
+        
+        self.clock.now += 50
+        self.assertEqual(store.get('token-a'), 1)
+        self.clock.now += 50
+        self.assertEqual(store.get('token-a'), 1)
+        self.clock.now += 61
+        self.assertIsNone(store.get('token-a'))
+    
+    def test_max_age_ends_an_active_session(self):
+        store = self.make_store(ttl=60, max_age=100)
+        store.create('token-a', 1)
+        
+        self.clock.now += 50
+        self.assertEqual(store.get('token-a'), 1)
+        self.clock.now += 51
+        self.assertIsNone(store.get('token-a'))
+    
+    def test_per_user_cap_drops_oldest(self):
+        store = self.make_store(ttl=60, max_per_user=2)
+        for token in ('token-a', 'token-b', 'token-c'):
+            store.create(token, 1)
+            self.clock.now += 1
+        store.create('token-d', 2)
+        
+        self.assertIsNone(store.get('token-a'))
+        self.assertEqual(store.get('token-b'), 1)
+        self.assertEqual(store.get('token-c'), 1)
+        self.assertEqual(store.get('token-d'), 2)
+        self.assertEqual(store.evicted, 1)
+    
+    def test_count_and_sweep(self):
+        store = self.make_store(ttl=60)
+        store.create('token-a', 1)
+        store.create('token-b', 2)
+        self.assertEqual(store.count(), 2)
+        
+        self.clock.now += 61
+        self.assertEqual(store.sweep(), 2)
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(store.stats()['live'], 0)
+
+class MemorySessionStoreTest(SessionStoreChecks, unittest.TestCase):
+    def make_store(self, ttl, max_age=None, max_per_user=0):
+        return MemorySessionStore(ttl, max_age, max_per_user)
+
+class SQLiteSessionStoreTest(SessionStoreChecks, unittest.TestCase):
+    def make_store(self, ttl, max_age=None, max_per_user=0):
+        data_dir = tempfile.mkdtemp(prefix='test_sessions_')
+        self.addCleanup(shutil.rmtree, data_dir, True)
+        return SQLiteSessionStore(os.path.join(data_dir, 'sessions.db'), ttl, max_age, max_per_user)
+
+class RedisSessionStoreTest(SessionStoreChecks, unittest.TestCase):
+    def make_store(self, ttl, max_age=None, max_per_user=0):
+        return RedisSessionStore(ttl, max_age, max_per_user, client=StandInRedis(self.clock))
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, 'fakeredis not installed')
+class FakeRedisSessionStoreTest(SessionStoreChecks, unittest.TestCase):
+    def make_store(self, ttl, max_age=None, max_per_user=0):
+        return RedisSessionStore(ttl, max_age, max_per_user, client=fakeredis.FakeRedis())
+
+if __name__ == '__main__':
+    unittest.main()